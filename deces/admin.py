@@ -1,9 +1,19 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ImportHistory, Deces, DecesImportError
+from .models import ImportHistory, ImportChunk, Deces, DecesImportError
+from .tasks import resume_import
+
+class ImportChunkInline(admin.TabularInline):
+    model = ImportChunk
+    extra = 0
+    can_delete = False
+    fields = ('start_offset', 'end_offset', 'committed_offset', 'status', 'batch_count', 'records_read', 'records_processed', 'error_message', 'updated_at')
+    readonly_fields = fields
 
 @admin.register(ImportHistory)
 class ImportHistoryAdmin(admin.ModelAdmin):
+    inlines = [ImportChunkInline]
+    actions = ['resume_import_action']
     list_display = ('zip_filename', 'csv_filename', 'status', 'progress_bar', 'pending_errors_display', 'started_at', 'completed_at')
     
     def pending_errors_display(self, obj):
@@ -32,10 +42,16 @@ class ImportHistoryAdmin(admin.ModelAdmin):
     search_fields = ('zip_filename', 'csv_filename', 'md5_hash')
     ordering = ('-started_at',)
 
+    @admin.action(description='Reprendre les imports interrompus')
+    def resume_import_action(self, request, queryset):
+        for import_history in queryset.filter(status__in=['processing', 'failed']):
+            resume_import.delay(import_history.pk)
+        self.message_user(request, 'Reprise des imports demandée.')
+
 @admin.register(DecesImportError)
 class DecesImportErrorAdmin(admin.ModelAdmin):
-    list_display = ('import_history', 'error_message', 'resolved', 'resolution_date', 'nom', 'prenoms', 'date_naissance', 'date_deces')
-    list_filter = ('resolved', 'resolution_date', 'import_history')
+    list_display = ('import_history', 'reason', 'error_message', 'resolved', 'resolution_date', 'nom', 'prenoms', 'date_naissance', 'date_deces')
+    list_filter = ('resolved', 'reason', 'resolution_date', 'import_history')
     search_fields = ('error_message', 'nom', 'prenoms')
     readonly_fields = ('raw_data', 'error_message', 'import_history')
     ordering = ('-import_history__started_at', '-resolution_date')
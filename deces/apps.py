@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class DecesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deces'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_recorder
+
+        # Mesure des requêtes SQL par requête HTTP, quel que soit le thread qui les exécute
+        connection_created.connect(install_query_recorder, dispatch_uid='deces_query_recorder')
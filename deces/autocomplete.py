@@ -0,0 +1,108 @@
+import bisect
+import threading
+from .geography import geography
+from .phonetics import normalize
+
+# Pays exclu des suggestions : la France est couverte par les communes, départements et régions
+FRANCE_COG = '99100'
+# Ordre d'affichage des types de lieu à pertinence égale
+TYPE_ORDER = ('commune', 'departement', 'region', 'pays')
+KEY_SEPARATOR = '\n'
+
+
+class AutocompleteIndex:
+    """Index en mémoire des lieux du COG pour l'autocomplétion.
+
+    Chaque lieu a un libellé préformaté et des clés de recherche normalisées
+    (sans accents, espaces ni tirets). Les correspondances par préfixe sont
+    trouvées par dichotomie dans un tableau trié des clés ; les
+    correspondances par sous-chaîne sont cherchées dans la concaténation des
+    clés, rangées dans l'ordre d'affichage. Les préfixes sont classés avant
+    les sous-chaînes, puis par type et libellé : le classement est stable et
+    permet une pagination par position.
+    """
+
+    def __init__(self, registry):
+        entries = []
+        for commune in registry.communes.values():
+            if commune.dep and commune.reg:
+                text = f'{commune.libelle}, {commune.dep.libelle}, {commune.reg.libelle}, France'
+                entries.append(('commune', commune.com, text, (commune.libelle, commune.ncc)))
+        for dept in registry.departements.values():
+            if dept.reg:
+                entries.append(('departement', dept.dep, f'{dept.libelle}, {dept.reg.libelle}, France', (dept.libelle, dept.ncc)))
+        for region in registry.regions.values():
+            entries.append(('region', region.reg, f'{region.libelle}, France', (region.libelle, region.ncc)))
+        for pays in registry.pays.values():
+            if pays.cog != FRANCE_COG:
+                entries.append(('pays', pays.cog, pays.libcog, (pays.libcog, pays.libenr)))
+        entries.sort(key=lambda entry: (TYPE_ORDER.index(entry[0]), entry[2]))
+
+        self.results = [{'id': code, 'text': text, 'type': lieu_type} for lieu_type, code, text, _ in entries]
+
+        keys = []
+        for rank, (_, _, _, names) in enumerate(entries):
+            for key in {normalize(name) for name in names if name} - {None}:
+                keys.append((key, rank))
+        # Clés triées pour la recherche par préfixe
+        keys_by_prefix = sorted(keys)
+        self.prefix_keys = [key for key, _ in keys_by_prefix]
+        self.prefix_ranks = [rank for _, rank in keys_by_prefix]
+        # Clés dans l'ordre d'affichage pour la recherche par sous-chaîne
+        keys_by_rank = sorted(keys, key=lambda item: item[1])
+        self.haystack = KEY_SEPARATOR.join(key for key, _ in keys_by_rank)
+        self.key_offsets = []
+        offset = 0
+        for key, _ in keys_by_rank:
+            self.key_offsets.append(offset)
+            offset += len(key) + len(KEY_SEPARATOR)
+        self.key_ranks = [rank for _, rank in keys_by_rank]
+
+    def prefix_matches(self, key):
+        start = bisect.bisect_left(self.prefix_keys, key)
+        end = bisect.bisect_left(self.prefix_keys, key + '￿', start)
+        return sorted(set(self.prefix_ranks[start:end]))
+
+    def substring_matches(self, key, exclude, limit):
+        """Rangs des lieux dont une clé contient key, dans l'ordre d'affichage (au plus limit)."""
+        ranks = []
+        seen = set(exclude)
+        position = self.haystack.find(key)
+        while position != -1 and len(ranks) < limit:
+            index = bisect.bisect_right(self.key_offsets, position) - 1
+            rank = self.key_ranks[index]
+            if rank not in seen:
+                seen.add(rank)
+                ranks.append(rank)
+            # Passer à la clé suivante
+            next_key = self.key_offsets[index + 1] if index + 1 < len(self.key_offsets) else len(self.haystack)
+            position = self.haystack.find(key, next_key)
+        return ranks
+
+    def search(self, query, offset=0, limit=30):
+        """Retourne (résultats, plus de résultats disponibles) pour une saisie."""
+        key = normalize(query)
+        if not key:
+            return [], False
+        ranks = self.prefix_matches(key)
+        wanted = offset + limit + 1
+        if len(ranks) < wanted:
+            ranks += self.substring_matches(key, ranks, wanted - len(ranks))
+        page = ranks[offset:offset + limit]
+        return [self.results[rank] for rank in page], len(ranks) > offset + limit
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def get_autocomplete_index():
+    """Index d'autocomplétion du processus, reconstruit quand le référentiel change de version."""
+    global _index, _index_version
+    geography.ensure_loaded()
+    if _index is None or _index_version != geography.version:
+        with _lock:
+            if _index is None or _index_version != geography.version:
+                _index = AutocompleteIndex(geography)
+                _index_version = geography.version
+    return _index
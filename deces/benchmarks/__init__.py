@@ -0,0 +1,7 @@
+"""Bancs d'essai reproductibles de l'import et de la recherche.
+
+Les données (fichiers de décès au format INSEE et référentiel COG) sont
+générées de façon déterministe à partir d'une graine ; les scénarios
+s'exécutent dans une base de test créée pour l'occasion et produisent des
+résultats JSON comparables d'un commit à l'autre (commande run_benchmarks).
+"""
@@ -0,0 +1,227 @@
+import csv
+import os
+import random
+import unicodedata
+import zipfile
+from datetime import date, timedelta
+
+# En-tête des fichiers de décès de l'INSEE
+INSEE_HEADER = ('nomprenom', 'sexe', 'datenaiss', 'lieunaiss', 'commnaiss', 'paysnaiss', 'datedeces', 'lieudeces', 'actedeces')
+
+# Noms et prénoms fréquents, du plus courant au moins courant (tirés selon une loi de Zipf)
+NOMS = (
+    'MARTIN', 'BERNARD', 'THOMAS', 'PETIT', 'ROBERT', 'RICHARD', 'DURAND', 'DUBOIS', 'MOREAU', 'LAURENT',
+    'SIMON', 'MICHEL', 'LEFEBVRE', 'LEROY', 'ROUX', 'DAVID', 'BERTRAND', 'MOREL', 'FOURNIER', 'GIRARD',
+    'BONNET', 'DUPONT', 'LAMBERT', 'FONTAINE', 'ROUSSEAU', 'VINCENT', 'MULLER', 'LEFÈVRE', 'FAURE', 'ANDRÉ',
+    'MERCIER', 'BLANC', 'GUÉRIN', 'BOYER', 'GARNIER', 'CHEVALIER', 'FRANÇOIS', 'LEGRAND', 'GAUTHIER', 'GARCIA',
+    'PERRIN', 'ROBIN', 'CLÉMENT', 'MORIN', 'NICOLAS', 'HENRY', 'ROUSSEL', 'MATHIEU', 'GAUTIER', 'MASSON',
+    'LE GALL', 'DE LA FONTAINE', 'SAINT-MARTIN', 'NGUYEN', 'LOPEZ', 'MÉNARD', 'BÉNARD', 'DUPUIS', 'LUCAS', 'DENIS',
+)
+PRENOMS = {
+    '1': (
+        'JEAN', 'PIERRE', 'MICHEL', 'ANDRÉ', 'PHILIPPE', 'RENÉ', 'LOUIS', 'ALAIN', 'JACQUES', 'BERNARD',
+        'MARCEL', 'DANIEL', 'ROGER', 'ROBERT', 'PAUL', 'CLAUDE', 'FRANÇOIS', 'HENRI', 'GEORGES', 'JOSEPH',
+    ),
+    '2': (
+        'MARIE', 'JEANNE', 'FRANÇOISE', 'MONIQUE', 'CATHERINE', 'NATHALIE', 'ISABELLE', 'JACQUELINE', 'ANNE', 'SYLVIE',
+        'MARTINE', 'MADELEINE', 'NICOLE', 'SUZANNE', 'HÉLÈNE', 'CHRISTINE', 'MARGUERITE', 'DENISE', 'LOUISE', 'GENEVIÈVE',
+    ),
+}
+# Pays de naissance (code COG, libellé COG, nom officiel, ISO2, ISO3, numérique)
+PAYS = (
+    ('99109', 'ALLEMAGNE', 'République fédérale d\'Allemagne', 'DE', 'DEU', '276'),
+    ('99127', 'ITALIE', 'République italienne', 'IT', 'ITA', '380'),
+    ('99131', 'BELGIQUE', 'Royaume de Belgique', 'BE', 'BEL', '056'),
+    ('99132', 'ROYAUME-UNI', 'Royaume-Uni de Grande-Bretagne et d\'Irlande du Nord', 'GB', 'GBR', '826'),
+    ('99134', 'ESPAGNE', 'Royaume d\'Espagne', 'ES', 'ESP', '724'),
+    ('99139', 'PORTUGAL', 'République portugaise', 'PT', 'PRT', '620'),
+    ('99140', 'SUISSE', 'Confédération suisse', 'CH', 'CHE', '756'),
+    ('99122', 'POLOGNE', 'République de Pologne', 'PL', 'POL', '616'),
+    ('99350', 'MAROC', 'Royaume du Maroc', 'MA', 'MAR', '504'),
+    ('99351', 'TUNISIE', 'République tunisienne', 'TN', 'TUN', '788'),
+    ('99352', 'ALGERIE', 'République algérienne démocratique et populaire', 'DZ', 'DZA', '012'),
+    ('99208', 'TURQUIE', 'République de Turquie', 'TR', 'TUR', '792'),
+    ('99243', 'VIET NAM', 'République socialiste du Viêt Nam', 'VN', 'VNM', '704'),
+)
+VILLES_ETRANGERES = {
+    '99109': ('BERLIN', 'MUNICH'), '99127': ('ROME', 'TURIN'), '99131': ('BRUXELLES', 'LIEGE'),
+    '99132': ('LONDRES',), '99134': ('MADRID', 'BARCELONE'), '99139': ('LISBONNE', 'PORTO'),
+    '99140': ('GENEVE',), '99122': ('VARSOVIE',), '99350': ('CASABLANCA', 'RABAT'), '99351': ('TUNIS',),
+    '99352': ('ALGER', 'ORAN'), '99208': ('ISTANBUL',), '99243': ('HANOI', 'SAIGON'),
+}
+# Syllabes des noms de communes synthétiques
+SYLLABES = ('BEL', 'MONT', 'VAL', 'CHA', 'TEAU', 'VILLE', 'COURT', 'BOIS', 'ROCHE', 'FON', 'TAINE', 'SAINT', 'MARS', 'LON', 'GNY', 'AC', 'ANS', 'ON')
+PREFIXES_COMMUNES = ('', '', '', 'SAINT-', 'SAINTE-', 'LE ', 'LA ', 'LES ')
+
+# Part des naissances à l'étranger, des dates de naissance au jour inconnu (00) et au mois inconnu
+FOREIGN_BIRTH_RATE = 0.08
+UNKNOWN_DAY_RATE = 0.01
+UNKNOWN_MONTH_RATE = 0.003
+# Types d'erreurs injectées : sexe, date de décès et nomprenom invalides
+ERROR_KINDS = ('sexe', 'datedeces', 'nomprenom')
+
+
+def _weights(count):
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def _strip_accents(value):
+    return ''.join(c for c in unicodedata.normalize('NFKD', value) if not unicodedata.combining(c))
+
+
+class CogReference:
+    """Référentiel COG synthétique : régions, départements, communes et pays."""
+
+    def __init__(self, seed=0, regions=13, departements_per_region=8, communes_per_departement=120):
+        rng = random.Random(seed)
+        self.regions = []
+        self.departements = []
+        self.communes = []
+        used_names = set()
+        dep_number = 1
+        for reg_index in range(regions):
+            reg = f'{11 + reg_index * 3:02d}'
+            reg_name = self._name(rng, used_names)
+            self.regions.append({'reg': reg, 'ncc': reg_name})
+            for _ in range(departements_per_region):
+                dep = f'{dep_number:02d}'
+                dep_number += 1
+                dep_name = self._name(rng, used_names)
+                self.departements.append({'dep': dep, 'reg': reg, 'ncc': dep_name})
+                for com_index in range(1, communes_per_departement + 1):
+                    self.communes.append({
+                        'com': f'{dep}{com_index:03d}', 'dep': dep, 'reg': reg, 'ncc': self._name(rng, used_names)
+                    })
+        self.pays = PAYS
+
+    @staticmethod
+    def _name(rng, used_names):
+        while True:
+            name = rng.choice(PREFIXES_COMMUNES) + ''.join(rng.choice(SYLLABES) for _ in range(rng.randint(2, 3)))
+            if name not in used_names:
+                used_names.add(name)
+                return name
+
+    @staticmethod
+    def _libelle(ncc):
+        return ncc.title().replace(' De ', ' de ').replace('-Sur-', '-sur-')
+
+    def write(self, directory):
+        """Écrit les fichiers CSV au format des fichiers COG de l'INSEE.
+
+        Returns:
+            Dictionnaire des chemins par référentiel (regions, departements, communes, pays)
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = {name: os.path.join(directory, f'{name}.csv') for name in ('regions', 'departements', 'communes', 'pays')}
+        cheflieu = {dep['dep']: f'{dep["dep"]}001' for dep in self.departements}
+
+        self._write_csv(paths['regions'], ('REG', 'CHEFLIEU', 'TNCC', 'NCC', 'NCCENR', 'LIBELLE'), (
+            (r['reg'], cheflieu[next(d['dep'] for d in self.departements if d['reg'] == r['reg'])], '0',
+             r['ncc'], self._libelle(r['ncc']), self._libelle(r['ncc']))
+            for r in self.regions
+        ))
+        self._write_csv(paths['departements'], ('DEP', 'REG', 'CHEFLIEU', 'TNCC', 'NCC', 'NCCENR', 'LIBELLE'), (
+            (d['dep'], d['reg'], cheflieu[d['dep']], '0', d['ncc'], self._libelle(d['ncc']), self._libelle(d['ncc']))
+            for d in self.departements
+        ))
+        self._write_csv(paths['communes'], ('TYPECOM', 'COM', 'REG', 'DEP', 'CTCD', 'ARR', 'TNCC', 'NCC', 'NCCENR', 'LIBELLE', 'CAN', 'COMPARENT'), (
+            ('COM', c['com'], c['reg'], c['dep'], f'{c["dep"]}D', f'{c["dep"]}1', '0', c['ncc'],
+             self._libelle(c['ncc']), self._libelle(c['ncc']), f'{c["dep"]}01', '')
+            for c in self.communes
+        ))
+        self._write_csv(paths['pays'], ('COG', 'ACTUAL', 'CRPAY', 'ANI', 'LIBCOG', 'LIBENR', 'ANCNOM', 'CODEISO2', 'CODEISO3', 'CODENUM3'), (
+            (cog, '1', '', '', libcog, libenr, '', iso2, iso3, num3)
+            for cog, libcog, libenr, iso2, iso3, num3 in self.pays
+        ))
+        return paths
+
+    @staticmethod
+    def _write_csv(path, header, rows):
+        with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def _insee_date(value, rng):
+    text = value.strftime('%Y%m%d')
+    draw = rng.random()
+    if draw < UNKNOWN_MONTH_RATE:
+        return text[:4] + '0000'
+    if draw < UNKNOWN_MONTH_RATE + UNKNOWN_DAY_RATE:
+        return text[:6] + '00'
+    return text
+
+
+def generate_rows(count, reference, seed=0, error_rate=0.001, first_year=2000, last_year=2024):
+    """Lignes (listes de champs) d'un fichier de décès INSEE, identiques pour une même graine."""
+    rng = random.Random(seed)
+    noms_weights = _weights(len(NOMS))
+    prenoms_weights = _weights(len(PRENOMS['1']))
+    communes = [commune['com'] for commune in reference.communes]
+    communes_weights = _weights(len(communes))
+    names = {commune['com']: commune['ncc'] for commune in reference.communes}
+    pays_codes = [pays[0] for pays in reference.pays]
+    pays_names = {pays[0]: pays[1] for pays in reference.pays}
+    start = date(first_year, 1, 1)
+    span = (date(last_year, 12, 31) - start).days
+    actes = {}
+
+    for _ in range(count):
+        sexe = rng.choice('12')
+        nom = rng.choices(NOMS, noms_weights)[0]
+        prenoms = ' '.join(rng.choices(PRENOMS[sexe], prenoms_weights, k=rng.choice((1, 1, 2, 2, 3))))
+        date_deces = start + timedelta(days=rng.randrange(span + 1))
+        age = min(int(rng.triangular(0, 105, 85)), 110)
+        date_naissance = date_deces - timedelta(days=age * 365 + rng.randrange(365))
+        if rng.random() < FOREIGN_BIRTH_RATE:
+            lieu_naissance = rng.choice(pays_codes)
+            commnaiss = rng.choice(VILLES_ETRANGERES[lieu_naissance])
+            paysnaiss = pays_names[lieu_naissance]
+        else:
+            lieu_naissance = rng.choices(communes, communes_weights)[0]
+            commnaiss = names[lieu_naissance]
+            paysnaiss = ''
+        lieu_deces = rng.choices(communes, communes_weights)[0]
+        # Numéro d'acte unique par commune et date de décès, comme dans les registres
+        acte = actes.get((lieu_deces, date_deces), 0) + 1
+        actes[(lieu_deces, date_deces)] = acte
+
+        row = [
+            f'{nom}*{prenoms}/', sexe, _insee_date(date_naissance, rng), lieu_naissance, commnaiss, paysnaiss,
+            date_deces.strftime('%Y%m%d'), lieu_deces, str(acte),
+        ]
+        if rng.random() < error_rate:
+            kind = rng.choice(ERROR_KINDS)
+            if kind == 'sexe':
+                row[1] = '9'
+            elif kind == 'datedeces':
+                row[6] = date_deces.strftime('%Y') + '1399'
+            else:
+                row[0] = _strip_accents(nom + ' ' + prenoms)
+        yield row
+
+
+def write_insee_csv(path, rows):
+    """Écrit un fichier de décès au format INSEE (séparateur ;, champs entre guillemets). Retourne le nombre de lignes."""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.writer(csv_file, delimiter=';', quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerow(INSEE_HEADER)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_insee_zip(path, count, reference, seed=0, error_rate=0.001, csv_name='deces-benchmark.csv'):
+    """Écrit un ZIP contenant un fichier de décès généré, comme ceux publiés par l'INSEE."""
+    csv_path = path + '.csv'
+    write_insee_csv(csv_path, generate_rows(count, reference, seed, error_rate))
+    try:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.write(csv_path, csv_name)
+    finally:
+        os.unlink(csv_path)
+    return path
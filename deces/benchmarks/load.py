@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+import requests
+from .generator import NOMS, PRENOMS
+from .scenarios import latency
+
+# Recherches par sous-chaîne : les plus coûteuses pour la base, elles occupent les workers
+SLOW_QUERIES = [
+    {'nom': NOMS[2][1:5], 'nom_flexible': 'on'},
+    {'prenoms': PRENOMS['2'][0][:4], 'prenoms_flexible': 'on'},
+    {'nom': NOMS[5][1:4], 'nom_flexible': 'on', 'prenoms': PRENOMS['1'][1][:3], 'prenoms_flexible': 'on'},
+]
+# Saisies de l'autocomplétion des lieux : réponses servies depuis l'index en mémoire
+AUTOCOMPLETE_TERMS = ['pa', 'mar', 'lyo', 'bor', 'sai', 'nan', 'lil', 'tou', 'ren', 'str']
+
+
+class LoadTest:
+    """Charge mixte contre un serveur déployé (WSGI ou ASGI), pour comparer les deux modèles.
+
+    Les clients « lents » enchaînent des recherches par sous-chaîne ; les
+    clients « rapides » appellent l'autocomplétion et, si une session est
+    fournie, le suivi d'un import. Sous WSGI, les recherches lentes occupent
+    les workers et font grimper la latence des requêtes rapides ; sous ASGI,
+    celles-ci doivent rester stables. client_timeout fait abandonner les
+    recherches trop longues, ce qui exerce l'annulation côté serveur.
+    """
+
+    def __init__(self, url, duration=30, slow_clients=8, fast_clients=8, client_timeout=30, session_id=None, import_id=None, seed=0):
+        self.url = url.rstrip('/')
+        self.duration = duration
+        self.slow_clients = slow_clients
+        self.fast_clients = fast_clients
+        self.client_timeout = client_timeout
+        self.session_id = session_id
+        self.import_id = import_id
+        self.seed = seed
+        self.durations = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, started, status):
+        with self.lock:
+            self.durations[endpoint].append(time.perf_counter() - started)
+            self.statuses[endpoint][str(status)] += 1
+
+    def call(self, session, endpoint, path, params):
+        started = time.perf_counter()
+        try:
+            response = session.get(f'{self.url}{path}', params=params, timeout=self.client_timeout)
+            status = response.status_code
+        except requests.Timeout:
+            status = 'timeout'
+        except requests.RequestException:
+            status = 'error'
+        self.record(endpoint, started, status)
+
+    def slow_client(self, number, deadline):
+        rng = random.Random(self.seed * 1000 + number)
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                self.call(session, 'search', '/search/', rng.choice(SLOW_QUERIES))
+
+    def fast_client(self, number, deadline):
+        rng = random.Random(self.seed * 1000 + self.slow_clients + number)
+        with requests.Session() as session:
+            if self.session_id:
+                session.cookies.set('sessionid', self.session_id)
+            while time.monotonic() < deadline:
+                if self.session_id and self.import_id and rng.random() < 0.5:
+                    self.call(session, 'import_status', f'/import/{self.import_id}/status/', None)
+                else:
+                    self.call(session, 'autocomplete', '/autocomplete/lieu/', {'q': rng.choice(AUTOCOMPLETE_TERMS)})
+
+    def run(self):
+        deadline = time.monotonic() + self.duration
+        threads = [
+            threading.Thread(target=self.slow_client, args=(number, deadline)) for number in range(self.slow_clients)
+        ] + [
+            threading.Thread(target=self.fast_client, args=(number, deadline)) for number in range(self.fast_clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        results = {}
+        for endpoint, durations in sorted(self.durations.items()):
+            results[endpoint] = {
+                **latency(durations),
+                'qps': round(len(durations) / elapsed, 1),
+                'statuses': dict(self.statuses[endpoint]),
+            }
+        results['duration'] = round(elapsed, 1)
+        return results
@@ -0,0 +1,63 @@
+import platform
+import subprocess
+from datetime import datetime, timezone
+import django
+from django.conf import settings
+from django.db import connection
+
+# Écart relatif au-delà duquel une mesure est signalée par --compare
+COMPARE_THRESHOLD = 0.1
+
+
+def meta(parameters):
+    """Contexte d'une exécution (commit, date, versions, machine) joint aux résultats JSON."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'parameters': parameters,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare(baseline, results, path=''):
+    """Écarts entre deux résultats : (mesure, référence, valeur, écart relatif, verdict).
+
+    Débits (per_second, qps) : plus c'est haut, mieux c'est ; latences (_ms,
+    seconds) : l'inverse. Le verdict vaut None sous COMPARE_THRESHOLD.
+    """
+    for key, value in results.items():
+        name = f'{path}.{key}' if path else key
+        previous = baseline.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            yield from compare(previous, value, name)
+            continue
+        higher_is_better = key.endswith(('per_second', 'qps'))
+        if not (higher_is_better or key.endswith(('_ms', 'seconds'))) or not previous:
+            continue
+        change = (value - previous) / previous
+        if abs(change) < COMPARE_THRESHOLD:
+            verdict = None
+        else:
+            verdict = (change > 0) == higher_is_better
+        yield name, previous, value, change, verdict
+
+
+def write_comparison(command, baseline, results):
+    """Affiche la comparaison sur la sortie d'erreur d'une commande de gestion."""
+    for name, previous, value, change, verdict in compare(baseline, results):
+        line = f'{name:<50} {previous:>12} → {value:>12} ({change:+.1%})'
+        if verdict is None:
+            command.stderr.write(line)
+        elif verdict:
+            command.stderr.write(command.style.SUCCESS(line))
+        else:
+            command.stderr.write(command.style.ERROR(line))
@@ -0,0 +1,285 @@
+import functools
+import http.server
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from deces import search_cache, tasks, views
+from deces.metrics import quantile
+from deces.models import Deces, DecesImportError, ImportHistory
+from deces.phonetics import name_keys, name_keys_frame
+from .generator import NOMS, PRENOMS, CogReference, write_insee_zip
+
+SCENARIOS = ('parse', 'import', 'search', 'autocomplete')
+# Scénarios qui ont besoin d'une base de test contenant le fichier généré
+DATABASE_SCENARIOS = ('import', 'search', 'autocomplete')
+# Lignes parsées une à une par parse_row (chemin de repli des lignes rejetées par parse_chunk)
+ROW_PARSE_SAMPLE = 10000
+# Exécutions mesurées par combinaison de filtres, sans cache puis avec cache
+SEARCH_REPEAT = 20
+AUTOCOMPLETE_REQUESTS = 2000
+
+# Combinaisons de filtres du formulaire de recherche ; les lieux sont complétés avec le référentiel généré
+FILTER_MIXES = {
+    'nom': {'nom': NOMS[0]},
+    'nom_prenoms': {'nom': NOMS[0], 'prenoms': PRENOMS['1'][0]},
+    'nom_date_naissance': {'nom': NOMS[1], 'date_naissance_debut': '1930-01-01', 'date_naissance_fin': '1939-12-31'},
+    'prenoms_flexible': {'prenoms': PRENOMS['2'][0][:4], 'prenoms_flexible': 'on'},
+    'nom_flexible': {'nom': NOMS[2][1:5], 'nom_flexible': 'on'},
+    'commune_date_deces': {'lieu_deces_type': 'commune', 'date_deces_debut': '2020-01-01', 'date_deces_fin': '2020-12-31'},
+    'departement': {'lieu_deces_type': 'departement', 'sexe': '2'},
+    'phonetique': {'nom': 'MARTAIN', 'nom_mode': 'phonetique'},
+    'sans_accents': {'nom': 'LEFEVRE', 'nom_mode': 'sans_accents'},
+    'tri_date_deces': {'nom': NOMS[3], 'order_by': 'date_deces', 'order_dir': 'desc'},
+}
+
+
+def latency(durations):
+    """Quantiles (ms) d'une série de durées en secondes."""
+    values = sorted(durations)
+    return {
+        'count': len(values),
+        'p50_ms': round(quantile(values, 0.5) * 1000, 3),
+        'p95_ms': round(quantile(values, 0.95) * 1000, 3),
+        'p99_ms': round(quantile(values, 0.99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+    }
+
+
+def run_parse(csv_path):
+    """Débit du parsing : lecture par blocs et parse_chunk (avec les clés de recherche), puis parse_row.
+
+    Returns:
+        Lignes par seconde de chaque chemin de parsing
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        start = len(f.readline())
+
+    rows = rejected = 0
+    began = time.perf_counter()
+    for chunk, _ in tasks.iter_csv_range(csv_path, start, size):
+        parsed, fallback_index = tasks.parse_chunk(chunk)
+        parsed.join(name_keys_frame(parsed['nom'], parsed['prenoms']))
+        rows += len(chunk)
+        rejected += len(fallback_index)
+    vectorized = time.perf_counter() - began
+
+    sample = next(tasks.iter_csv_range(csv_path, start, size))[0].head(ROW_PARSE_SAMPLE)
+    began = time.perf_counter()
+    for _, row in sample.iterrows():
+        try:
+            parsed_data = tasks.parse_row(row)
+            parsed_data.update(name_keys(parsed_data['nom'], parsed_data['prenoms']))
+        except tasks.ParseError:
+            pass
+    by_row = time.perf_counter() - began
+
+    return {
+        'rows': rows,
+        'rejected': rejected,
+        'vectorized_seconds': round(vectorized, 3),
+        'vectorized_rows_per_second': round(rows / vectorized),
+        'row_rows_per_second': round(len(sample) / by_row),
+    }
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def http_server(directory):
+    """Serveur HTTP local servant le ZIP généré, à la place du site de l'INSEE."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def benchmark_database(work_dir):
+    """Base de test vide et migrée, répertoires de travail temporaires, cache local et tâches Celery synchrones.
+
+    La base configurée n'est jamais modifiée : les scénarios s'exécutent dans
+    la base de test de Django (préfixe test_), détruite à la sortie.
+    """
+    from insee_deces.celery import app
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    celery_conf = (app.conf.task_always_eager, app.conf.task_eager_propagates)
+    app.conf.task_always_eager = app.conf.task_eager_propagates = True
+    try:
+        with override_settings(
+            IMPORT_WORK_DIR=os.path.join(work_dir, 'import'),
+            ZIP_CACHE_DIR=os.path.join(work_dir, 'zip_cache'),
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'deces-benchmarks'}},
+        ):
+            yield
+    finally:
+        app.conf.task_always_eager, app.conf.task_eager_propagates = celery_conf
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def load_reference(paths):
+    for name in ('regions', 'departements', 'communes', 'pays'):
+        call_command(f'import_{name}', paths[name], stdout=io.StringIO())
+
+
+def run_import(zip_path, engine='orm'):
+    """Débit de bout en bout de process_insee_file : téléchargement local, empreinte, découpage, parsing et insertion."""
+    directory, filename = os.path.split(zip_path)
+    with http_server(directory) as base_url:
+        began = time.perf_counter()
+        tasks.process_insee_file.run(f'{base_url}/{filename}', filename, engine)
+        elapsed = time.perf_counter() - began
+
+    import_history = ImportHistory.objects.exclude(csv_filename='unknown.csv').latest('pk')
+    return {
+        'engine': engine,
+        'status': import_history.status,
+        'rows': import_history.total_records,
+        'inserted': Deces.objects.count(),
+        'errors': DecesImportError.objects.count(),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(import_history.total_records / elapsed),
+    }
+
+
+def _search_mixes(reference):
+    communes = [commune['com'] for commune in reference.communes]
+    mixes = {}
+    for name, params in FILTER_MIXES.items():
+        params = dict(params)
+        # Lieux les plus fréquents du fichier généré (tirage de Zipf sur l'ordre du référentiel)
+        if params.get('lieu_deces_type') == 'commune':
+            params['lieu_deces'] = communes[0]
+        elif params.get('lieu_deces_type') == 'departement':
+            params['lieu_deces'] = reference.departements[0]['dep']
+        mixes[name] = params
+    return mixes
+
+
+def run_search(reference, repeat=SEARCH_REPEAT):
+    """Latence de la vue de recherche (requête, pagination et rendu) par combinaison de filtres.
+
+    Les mesures « cold » invalident le cache des pages de résultats avant
+    chaque appel, comme après un import ; les mesures « warm » relisent la
+    page en cache.
+    """
+    factory = RequestFactory()
+    results = {}
+    for name, params in _search_mixes(reference).items():
+        cold, warm = [], []
+        for _ in range(repeat):
+            cache.delete(search_cache.DATA_VERSION_CACHE_KEY)
+            cold.append(_timed_search(factory, params))
+        for _ in range(repeat):
+            warm.append(_timed_search(factory, params))
+        results[name] = {'cold': latency(cold), 'warm': latency(warm)}
+    return results
+
+
+def _timed_search(factory, params):
+    request = factory.get('/search/', params)
+    request.user = AnonymousUser()
+    began = time.perf_counter()
+    response = async_to_sync(views.search)(request)
+    elapsed = time.perf_counter() - began
+    if response.status_code != 200:
+        raise RuntimeError(f'Recherche {params} : statut {response.status_code}')
+    return elapsed
+
+
+def run_autocomplete(reference, requests=AUTOCOMPLETE_REQUESTS, seed=0):
+    """Débit de autocomplete_lieu sur des préfixes et sous-chaînes tirés du référentiel généré."""
+    rng = random.Random(seed)
+    names = [commune['ncc'] for commune in reference.communes] + [pays[1] for pays in reference.pays]
+    queries = []
+    for _ in range(requests):
+        name = rng.choice(names)
+        start = 0 if rng.random() < 0.8 else rng.randrange(len(name) - 2)
+        queries.append(name[start:start + rng.randint(2, 6)].lower())
+
+    factory = RequestFactory()
+    # Vue asynchrone, appelée comme le fait le gestionnaire WSGI
+    autocomplete = async_to_sync(views.autocomplete_lieu)
+    # Premier appel : chargement du référentiel et construction de l'index en mémoire
+    began = time.perf_counter()
+    autocomplete(factory.get('/autocomplete-lieu/', {'q': queries[0]}))
+    build = time.perf_counter() - began
+
+    durations = []
+    began = time.perf_counter()
+    for query in queries:
+        start = time.perf_counter()
+        autocomplete(factory.get('/autocomplete-lieu/', {'q': query}))
+        durations.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - began
+    return {
+        'index_build_ms': round(build * 1000, 3),
+        'qps': round(len(queries) / elapsed),
+        **latency(durations),
+    }
+
+
+def run(scenarios, rows, seed=0, error_rate=0.001, engine='orm', log=None):
+    """Génère les données puis exécute les scénarios demandés.
+
+    Returns:
+        Résultats par scénario
+    """
+    log = log or (lambda message: None)
+    work_dir = tempfile.mkdtemp(prefix='deces-benchmarks-')
+    results = {}
+    try:
+        reference = CogReference(seed)
+        paths = reference.write(os.path.join(work_dir, 'cog'))
+        zip_path = write_insee_zip(os.path.join(work_dir, 'deces-benchmark.zip'), rows, reference, seed, error_rate)
+        log(f'{rows} lignes générées (graine {seed}, taux d\'erreur {error_rate})')
+
+        if 'parse' in scenarios:
+            csv_path = os.path.join(work_dir, 'deces-benchmark.csv')
+            write_csv_from_zip(zip_path, csv_path)
+            results['parse'] = run_parse(csv_path)
+            log(f'parse : {results["parse"]["vectorized_rows_per_second"]} lignes/s')
+
+        if any(scenario in scenarios for scenario in DATABASE_SCENARIOS):
+            with benchmark_database(work_dir):
+                load_reference(paths)
+                # La recherche et l'autocomplétion portent sur le fichier importé, mesuré ou non
+                imported = run_import(zip_path, engine)
+                if 'import' in scenarios:
+                    results['import'] = imported
+                    log(f'import : {imported["rows_per_second"]} lignes/s ({imported["status"]})')
+                if 'search' in scenarios:
+                    results['search'] = run_search(reference)
+                    log(f'search : {len(results["search"])} combinaisons de filtres')
+                if 'autocomplete' in scenarios:
+                    results['autocomplete'] = run_autocomplete(reference, seed=seed)
+                    log(f'autocomplete : {results["autocomplete"]["qps"]} requêtes/s')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def write_csv_from_zip(zip_path, csv_path):
+    with zipfile.ZipFile(zip_path) as zip_file, zip_file.open(zip_file.namelist()[0]) as source, open(csv_path, 'wb') as target:
+        shutil.copyfileobj(source, target)
@@ -0,0 +1,238 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+import zipfile
+from contextlib import contextmanager
+import requests
+from django.conf import settings
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+DOWNLOAD_BLOCK_SIZE = 64 * 1024  # Taille des blocs écrits sur disque (un bloc interrompu est perdu)
+DOWNLOAD_TIMEOUT = 60  # Délai (secondes) de connexion et entre deux blocs reçus
+DOWNLOAD_MAX_ATTEMPTS = 5  # Tentatives par téléchargement, chacune reprenant là où la précédente s'est arrêtée
+PROGRESS_LOG_EVERY = 50 * 1024 * 1024  # Octets reçus entre deux messages de progression
+
+
+class DownloadError(Exception):
+    """Téléchargement impossible ou incomplet après toutes les tentatives."""
+
+
+def cache_dir():
+    return settings.ZIP_CACHE_DIR
+
+
+def entry_key(url):
+    """Nom des fichiers d'une URL dans le cache."""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+
+
+def _paths(key):
+    base = os.path.join(cache_dir(), key)
+    return {
+        'zip': base + '.zip',
+        'part': base + '.part',
+        'meta': base + '.json',
+        'lock': base + '.lock',
+    }
+
+
+def _read_meta(paths):
+    try:
+        with open(paths['meta'], encoding='utf-8') as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(paths, meta):
+    temp_path = paths['meta'] + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temp_path, paths['meta'])
+
+
+@contextmanager
+def _locked(paths):
+    """Verrou exclusif sur une entrée : deux workers ne téléchargent pas la même URL en même temps."""
+    with open(paths['lock'], 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _validators(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def _total_size(response, offset):
+    """Taille totale annoncée par le serveur (Content-Range d'une réponse partielle ou Content-Length)."""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if 'Content-Length' in response.headers:
+        return offset + int(response.headers['Content-Length'])
+    return None
+
+
+def _request_headers(paths, meta):
+    """En-têtes conditionnels : revalidation d'une archive complète ou reprise d'un fichier partiel."""
+    headers = {}
+    if os.path.exists(paths['zip']):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers, 0
+
+    offset = os.path.getsize(paths['part']) if os.path.exists(paths['part']) else 0
+    validator = meta.get('etag') or meta.get('last_modified')
+    if offset and validator:
+        # If-Range : le serveur renvoie tout le fichier (200) s'il a changé depuis le début du téléchargement
+        headers['Range'] = f'bytes={offset}-'
+        headers['If-Range'] = validator
+        return headers, offset
+    return headers, 0
+
+
+def _download(url, paths, meta):
+    """Une tentative : revalide l'archive en cache ou reprend le téléchargement.
+
+    Returns:
+        True si l'archive en cache est à jour (complète et non modifiée)
+    """
+    headers, offset = _request_headers(paths, meta)
+    with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code == 304:
+            logger.info(f'Archive en cache à jour pour {url}')
+            return True
+        if response.status_code == 416:
+            # Plage refusée : fichier partiel incohérent avec le fichier distant
+            os.unlink(paths['part'])
+            _write_meta(paths, {'url': url})
+            raise requests.ConnectionError('Reprise refusée par le serveur, nouveau téléchargement')
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            logger.info(f'Reprise du téléchargement de {url} à l\'octet {offset}')
+            mode = 'ab'
+        else:
+            offset = 0
+            mode = 'wb'
+        total_size = _total_size(response, offset)
+        meta = {'url': url, 'size': total_size, **_validators(response)}
+        _write_meta(paths, meta)
+
+        downloaded = offset
+        next_log = downloaded + PROGRESS_LOG_EVERY
+        with open(paths['part'], mode) as part_file:
+            for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE):
+                part_file.write(block)
+                downloaded += len(block)
+                if downloaded >= next_log:
+                    progress = f' ({downloaded / total_size:.0%})' if total_size else ''
+                    logger.info(f'Téléchargement : {downloaded // (1024 * 1024)} Mo reçus{progress}')
+                    next_log += PROGRESS_LOG_EVERY
+
+    if total_size is not None and downloaded != total_size:
+        raise requests.ConnectionError(f'Téléchargement interrompu à {downloaded}/{total_size} octets')
+    if not zipfile.is_zipfile(paths['part']):
+        os.unlink(paths['part'])
+        raise DownloadError(f'Le fichier téléchargé depuis {url} n\'est pas une archive ZIP')
+    os.replace(paths['part'], paths['zip'])
+    meta['size'] = downloaded
+    _write_meta(paths, meta)
+    logger.info(f'Fichier ZIP téléchargé avec succès ({downloaded} octets)')
+    return False
+
+
+def fetch(url):
+    """Retourne le chemin de l'archive ZIP d'une URL dans le cache, téléchargée si nécessaire.
+
+    Une archive déjà en cache est revalidée par une requête conditionnelle
+    (If-None-Match / If-Modified-Since) : elle n'est téléchargée à nouveau que
+    si le serveur la signale modifiée. Un téléchargement interrompu reprend
+    là où il s'est arrêté (Range / If-Range), y compris lors d'une tâche
+    ultérieure. Le cache est ensuite ramené à ZIP_CACHE_MAX_SIZE en
+    supprimant les archives les moins récemment utilisées.
+    """
+    os.makedirs(cache_dir(), exist_ok=True)
+    key = entry_key(url)
+    paths = _paths(key)
+    with _locked(paths):
+        for attempt in range(1, DOWNLOAD_MAX_ATTEMPTS + 1):
+            try:
+                _download(url, paths, _read_meta(paths))
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == DOWNLOAD_MAX_ATTEMPTS:
+                    raise DownloadError(f'Téléchargement de {url} impossible : {str(e)}') from e
+                logger.warning(f'Téléchargement de {url} interrompu (tentative {attempt}/{DOWNLOAD_MAX_ATTEMPTS}) : {str(e)}')
+        # Date de dernière utilisation, pour l'éviction LRU
+        os.utime(paths['zip'])
+    evict(keep=key)
+    return paths['zip']
+
+
+def entries():
+    """Archives et fichiers partiels du cache, du moins récemment utilisé au plus récent."""
+    if not os.path.isdir(cache_dir()):
+        return []
+    result = []
+    for name in os.listdir(cache_dir()):
+        key, extension = os.path.splitext(name)
+        if extension not in ('.zip', '.part'):
+            continue
+        stat = os.stat(os.path.join(cache_dir(), name))
+        meta = _read_meta(_paths(key))
+        result.append({
+            'key': key,
+            'url': meta.get('url'),
+            'complete': extension == '.zip',
+            'size': stat.st_size,
+            'last_used': stat.st_mtime,
+        })
+    return sorted(result, key=lambda entry: entry['last_used'])
+
+
+def remove(key):
+    for path in _paths(key).values():
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def evict(keep=None, max_size=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à ce que le cache tienne dans max_size octets.
+
+    Returns:
+        Le nombre d'entrées supprimées
+    """
+    max_size = settings.ZIP_CACHE_MAX_SIZE if max_size is None else max_size
+    cached = entries()
+    total = sum(entry['size'] for entry in cached)
+    removed = 0
+    for entry in cached:
+        if total <= max_size:
+            break
+        if entry['key'] == keep:
+            continue
+        paths = _paths(entry['key'])
+        with open(paths['lock'], 'w') as lock_file:
+            try:
+                # Entrée en cours de téléchargement par un autre worker : conservée
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            remove(entry['key'])
+        total -= entry['size']
+        removed += 1
+        logger.info(f'Archive {entry["url"] or entry["key"]} retirée du cache ({entry["size"]} octets, {time.ctime(entry["last_used"])})')
+    return removed
@@ -0,0 +1,173 @@
+import csv
+import io
+import zlib
+from datetime import date
+from asgiref.sync import sync_to_async
+from .pagination import KEY_FIELDS, seek_filter
+
+# Colonnes exportées, dans l'ordre du fichier
+EXPORT_FIELDS = (
+    'nom', 'prenoms', 'sexe',
+    'date_naissance', 'lieu_naissance', 'lieu_naissance_nom', 'lieu_naissance_libelle',
+    'date_deces', 'lieu_deces', 'lieu_deces_libelle', 'acte_deces',
+)
+DATE_FIELDS = ('date_naissance', 'date_deces')
+# Nombre de lignes lues par requête (et par groupe de lignes Parquet)
+EXPORT_BATCH_SIZE = 5000
+CSV_DELIMITER = ';'
+# Taille des blocs lus dans un fichier d'export déjà écrit
+FILE_BLOCK_SIZE = 64 * 1024
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'csv.gz': 'application/gzip',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def parquet_supported():
+    """L'export Parquet nécessite pyarrow (requirements.txt) ; sans lui, le format n'est pas proposé."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def extension(format, compress=False):
+    return 'csv.gz' if format == 'csv' and compress else format
+
+
+def iter_batches(queryset, limit=None, batch_size=EXPORT_BATCH_SIZE):
+    """Lit les lignes à exporter par lots de taille fixe, dans l'ordre de la clé primaire.
+
+    Chaque lot est une requête indépendante qui reprend après la dernière clé
+    du lot précédent (pagination par clé) : la mémoire utilisée ne dépend pas
+    du nombre de résultats, sans dépendre d'un curseur serveur (que
+    mysqlclient ne fournit pas à Django).
+    """
+    key_positions = [EXPORT_FIELDS.index(field) for field in KEY_FIELDS]
+    rows_queryset = queryset.order_by(*KEY_FIELDS).values_list(*EXPORT_FIELDS)
+    last_key = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        batch_queryset = rows_queryset
+        if last_key is not None:
+            batch_queryset = batch_queryset.filter(seek_filter(list(zip(KEY_FIELDS, last_key)), False))
+        rows = list(batch_queryset[:size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < size:
+            return
+        last_key = [rows[-1][position] for position in key_positions]
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def csv_stream(batches, compress=False):
+    """Génère le CSV (séparateur ;) lot par lot, éventuellement compressé en gzip."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITER, lineterminator='\n')
+
+    def drain():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(EXPORT_FIELDS)
+    yield drain()
+    for rows in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        data = drain()
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+class _StreamSink(io.RawIOBase):
+    """Fichier en écriture seule dont le contenu est récupéré au fur et à mesure."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_stream(batches):
+    """Génère un fichier Parquet avec un groupe de lignes par lot."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (field, pa.date32() if field in DATE_FIELDS else pa.string())
+        for field in EXPORT_FIELDS
+    ])
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=schema.field(i).type) for i, column in enumerate(columns)],
+                schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def export_stream(batches, format, compress=False):
+    if format == 'parquet':
+        return parquet_stream(batches)
+    return csv_stream(batches, compress)
+
+
+def file_chunks(path, block_size=FILE_BLOCK_SIZE):
+    """Lit un fichier d'export par blocs de taille fixe."""
+    with open(path, 'rb') as f:
+        while data := f.read(block_size):
+            yield data
+
+
+async def async_chunks(iterator):
+    """Itérateur asynchrone sur un générateur synchrone, pour les réponses servies en ASGI.
+
+    Sous ASGI, Django lit un itérateur synchrone en entier avant d'envoyer le
+    premier octet, ce qui chargerait tout l'export en mémoire. Ici, chaque
+    bloc est produit à la demande dans le thread de la requête
+    (sync_to_async, qui garde sa connexion à la base) puis envoyé aussitôt.
+    """
+    iterator = iter(iterator)
+    try:
+        while (data := await sync_to_async(next)(iterator, None)) is not None:
+            yield data
+    finally:
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
@@ -0,0 +1,120 @@
+from .models import Deces
+from .ngrams import contains_filter
+from .partitions import prune_partitions
+from .phonetics import normalize, phonetic, first_prenom
+
+# Critères de recherche : sans au moins l'un d'eux, aucun résultat n'est chargé
+CRITERIA_PARAMS = (
+    'nom', 'prenoms', 'sexe', 'date_naissance_debut', 'date_naissance_fin',
+    'date_deces_debut', 'date_deces_fin', 'lieu_naissance', 'lieu_deces'
+)
+
+# Colonnes de tri proposées par le formulaire (paramètre order_by)
+ORDER_FIELDS = {
+    'nom': 'nom',
+    'prenoms': 'prenoms',
+    'date_naissance': 'date_naissance',
+    'date_deces': 'date_deces',
+    # Libellés dénormalisés (tri des lignes filtrées, sans index)
+    'lieu_deces': 'lieu_deces_libelle',
+    'lieu_naissance': 'lieu_naissance_libelle'
+}
+
+
+def has_search_criteria(params):
+    return any(params.get(name) for name in CRITERIA_PARAMS)
+
+
+def search_queryset(params):
+    """Décès correspondant aux paramètres du formulaire de recherche (request.GET).
+
+    Utilisé par la recherche et par l'export des résultats.
+
+    Returns:
+        (queryset non trié, justifications des bornes implicites sur date_deces)
+    """
+    nom = params.get('nom', '')
+    nom_flexible = params.get('nom_flexible')
+    prenoms = params.get('prenoms', '')
+    prenoms_flexible = params.get('prenoms_flexible')
+    # Correspondance des noms et prénoms : exacte, sans accents ou phonétique
+    nom_mode = params.get('nom_mode', '')
+    sexe = params.get('sexe', '')
+    date_naissance_debut = params.get('date_naissance_debut', '')
+    date_naissance_fin = params.get('date_naissance_fin', '')
+    date_deces_debut = params.get('date_deces_debut', '')
+    date_deces_fin = params.get('date_deces_fin', '')
+    lieu_naissance_id = params.get('lieu_naissance')
+    lieu_naissance_type = params.get('lieu_naissance_type')
+    lieu_deces_id = params.get('lieu_deces')
+    lieu_deces_type = params.get('lieu_deces_type')
+
+    results = Deces.objects.all()
+
+    # Appliquer les filtres si présents
+    if nom:
+        if nom_flexible == 'on':
+            results = results.filter(contains_filter('nom', nom.upper()))
+        elif nom_mode == 'phonetique':
+            results = results.filter(nom_phonetique=phonetic(nom))
+        elif nom_mode == 'sans_accents':
+            results = results.filter(nom_normalise=normalize(nom))
+        else:
+            results = results.filter(nom=nom.upper())
+    if prenoms:
+        # Les modes phonétique et sans accents portent sur le premier prénom
+        if prenoms_flexible == 'on':
+            results = results.filter(contains_filter('prenoms', prenoms.upper()))
+        elif nom_mode == 'phonetique':
+            results = results.filter(prenom_phonetique=phonetic(first_prenom(prenoms)))
+        elif nom_mode == 'sans_accents':
+            results = results.filter(prenom_normalise=normalize(first_prenom(prenoms)))
+        else:
+            results = results.filter(prenoms=prenoms.upper())
+    if sexe:
+        results = results.filter(sexe=sexe)
+
+    # Filtres de date de naissance
+    if date_naissance_debut:
+        results = results.filter(date_naissance__gte=date_naissance_debut)
+    if date_naissance_fin:
+        results = results.filter(date_naissance__lte=date_naissance_fin)
+
+    # Filtres de date de décès
+    if date_deces_debut:
+        results = results.filter(date_deces__gte=date_deces_debut)
+    if date_deces_fin:
+        results = results.filter(date_deces__lte=date_deces_fin)
+
+    # Filtres de lieu de naissance
+    if lieu_naissance_id and lieu_naissance_type:
+        if lieu_naissance_type == 'commune':
+            results = results.filter(lieu_naissance=lieu_naissance_id)
+        elif lieu_naissance_type == 'departement':
+            # Département et région sont dénormalisés sur chaque décès
+            results = results.filter(lieu_naissance_dep=lieu_naissance_id)
+        elif lieu_naissance_type == 'region':
+            results = results.filter(lieu_naissance_reg=lieu_naissance_id)
+        elif lieu_naissance_type == 'pays':
+            results = results.filter(lieu_naissance=lieu_naissance_id)
+
+    # Filtres de lieu de décès
+    if lieu_deces_id and lieu_deces_type:
+        if lieu_deces_type == 'commune':
+            results = results.filter(lieu_deces=lieu_deces_id)
+        elif lieu_deces_type == 'departement':
+            # Département et région sont dénormalisés sur chaque décès
+            results = results.filter(lieu_deces_dep=lieu_deces_id)
+        elif lieu_deces_type == 'region':
+            results = results.filter(lieu_deces_reg=lieu_deces_id)
+        elif lieu_deces_type == 'pays':
+            results = results.filter(lieu_deces=lieu_deces_id)
+
+    # Bornes implicites sur date_deces pour limiter les partitions parcourues
+    results, pruning_reasons = prune_partitions(
+        results,
+        nom=nom.upper() if nom and nom_flexible != 'on' and not nom_mode else None,
+        date_naissance_debut=date_naissance_debut,
+        date_naissance_fin=date_naissance_fin
+    )
+    return results, pruning_reasons
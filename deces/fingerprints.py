@@ -0,0 +1,25 @@
+import hashlib
+from datetime import date
+
+# Champs du fichier INSEE couverts par l'empreinte d'une ligne ; les champs
+# dérivés (libellés, clés de recherche) en dépendent et n'y figurent pas
+FINGERPRINT_FIELDS = (
+    'nom', 'prenoms', 'sexe', 'date_naissance', 'lieu_naissance',
+    'lieu_naissance_nom', 'date_deces', 'lieu_deces', 'acte_deces'
+)
+FIELD_SEPARATOR = '\x1f'
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def row_fingerprint(data):
+    """Empreinte 64 bits (entier signé) des champs d'une ligne de décès (dictionnaire)."""
+    text = FIELD_SEPARATOR.join(_text(data.get(field)) for field in FINGERPRINT_FIELDS)
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
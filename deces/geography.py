@@ -0,0 +1,153 @@
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+from django.core.cache import cache
+
+# Clé Redis de la version du référentiel, changée à chaque import COG
+VERSION_CACHE_KEY = 'geography:version'
+# Intervalle minimal (secondes) entre deux vérifications de la version dans Redis
+VERSION_CHECK_INTERVAL = 30
+# Longueur des libellés de lieu dénormalisés sur Deces
+LIBELLE_MAX_LENGTH = 255
+
+
+class RegionEntry(NamedTuple):
+    reg: str
+    libelle: str
+    ncc: str = ''
+
+
+class DepartementEntry(NamedTuple):
+    dep: str
+    libelle: str
+    reg: Optional[RegionEntry]
+    ncc: str = ''
+
+
+class CommuneEntry(NamedTuple):
+    com: str
+    libelle: str
+    dep: Optional[DepartementEntry]
+    reg: Optional[RegionEntry]
+    ncc: str = ''
+
+
+class PaysEntry(NamedTuple):
+    cog: str
+    libcog: str
+    libenr: str = ''
+
+
+class GeographyRegistry:
+    """Référentiel géographique (COG) chargé une fois par processus.
+
+    Les quelque 40 000 communes, départements, régions et pays sont conservés
+    dans des dictionnaires indexés par code, avec les libellés des départements
+    et régions de rattachement. Le référentiel est rechargé lorsque la version
+    stockée dans le cache partagé change (voir invalidate_geography).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked_at = 0
+        self.regions = {}
+        self.departements = {}
+        self.communes = {}
+        self.pays = {}
+
+    def load(self):
+        from deces.models import Commune, Departement, Pays, Region
+
+        regions = {
+            reg: RegionEntry(reg, libelle, ncc)
+            for reg, libelle, ncc in Region.objects.values_list('reg', 'libelle', 'ncc')
+        }
+        departements = {
+            dep: DepartementEntry(dep, libelle, regions.get(reg), ncc)
+            for dep, libelle, reg, ncc in Departement.objects.values_list('dep', 'libelle', 'reg_id', 'ncc')
+        }
+        communes = {
+            com: CommuneEntry(com, libelle, departements.get(dep), regions.get(reg), ncc)
+            for com, libelle, dep, reg, ncc in Commune.objects.values_list('com', 'libelle', 'dep_id', 'reg_id', 'ncc')
+        }
+        pays = {
+            cog: PaysEntry(cog, libcog, libenr)
+            for cog, libcog, libenr in Pays.objects.values_list('cog', 'libcog', 'libenr')
+        }
+        self.regions, self.departements, self.communes, self.pays = regions, departements, communes, pays
+
+    def ensure_loaded(self):
+        """Charge le référentiel au premier accès, ou le recharge si sa version a changé."""
+        now = time.monotonic()
+        if self.version is not None and now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        with self.lock:
+            if self.version is not None and now - self.checked_at < VERSION_CHECK_INTERVAL:
+                return
+            version = cache.get(VERSION_CACHE_KEY)
+            if version is None:
+                version = uuid.uuid4().hex
+                # add : ne pas écraser une version posée entre-temps par un autre processus
+                cache.add(VERSION_CACHE_KEY, version, None)
+                version = cache.get(VERSION_CACHE_KEY, version)
+            if version != self.version:
+                self.load()
+                self.version = version
+            self.checked_at = now
+
+    def get_commune(self, code):
+        self.ensure_loaded()
+        return self.communes.get(code)
+
+    def get_departement(self, code):
+        self.ensure_loaded()
+        return self.departements.get(code)
+
+    def get_region(self, code):
+        self.ensure_loaded()
+        return self.regions.get(code)
+
+    def get_pays(self, code):
+        self.ensure_loaded()
+        return self.pays.get(code)
+
+    def get_lieu(self, code):
+        """Retourne le pays (codes 99xxx) ou la commune correspondant à un code de lieu."""
+        if code.startswith('99'):
+            return self.get_pays(code)
+        return self.get_commune(code)
+
+
+geography = GeographyRegistry()
+
+
+def invalidate_geography():
+    """Change la version du référentiel pour forcer son rechargement dans tous les processus."""
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    geography.version = None
+
+
+def resolve_lieux(lieu_naissance, lieu_naissance_nom, lieu_deces):
+    """Retourne les libellés et codes département/région dénormalisés d'un décès.
+
+    Les libellés reprennent ceux affichés dans les résultats de recherche :
+    « commune, département » pour une commune, « ville, pays » pour une
+    naissance à l'étranger et le pays seul pour un décès à l'étranger.
+    Les codes absents du référentiel restent à None.
+    """
+    fields = {}
+    for prefix, code, nom in (('lieu_naissance', lieu_naissance, lieu_naissance_nom), ('lieu_deces', lieu_deces, None)):
+        libelle = dep = reg = None
+        lieu = geography.get_lieu(code) if code else None
+        if isinstance(lieu, PaysEntry):
+            libelle = f'{nom}, {lieu.libcog}' if nom else lieu.libcog
+        elif lieu is not None:
+            libelle = f'{lieu.libelle}, {lieu.dep.libelle}' if lieu.dep else lieu.libelle
+            dep = lieu.dep.dep if lieu.dep else None
+            reg = lieu.reg.reg if lieu.reg else None
+        fields[f'{prefix}_libelle'] = libelle[:LIBELLE_MAX_LENGTH] if libelle else None
+        fields[f'{prefix}_dep'] = dep
+        fields[f'{prefix}_reg'] = reg
+    return fields
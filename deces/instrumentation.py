@@ -0,0 +1,175 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Longueur maximale d'une requête SQL conservée dans les mesures et les journaux
+SQL_MAX_LENGTH = 500
+# Requêtes SQL les plus fréquentes journalisées en cas de dépassement du budget
+BUDGET_LOG_STATEMENTS = 5
+
+_current_recorder = ContextVar('deces_request_recorder', default=None)
+
+
+class RequestRecorder:
+    """Mesures d'une requête HTTP : requêtes SQL (via record_query) et temps de rendu."""
+
+    def __init__(self, keep_statements=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_sql = None
+        self.slowest_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        # Texte des requêtes (sans paramètres), conservé seulement si un budget est surveillé
+        self.statements = Counter() if keep_statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            if elapsed > self.slowest_time:
+                self.slowest_time = elapsed
+                self.slowest_sql = sql[:SQL_MAX_LENGTH]
+            if self.statements is not None:
+                self.statements[sql[:SQL_MAX_LENGTH]] += 1
+
+    def sample(self, status, duration):
+        return {
+            'status': status,
+            'duration': round(duration, 6),
+            'queries': self.queries,
+            'db_time': round(self.db_time, 6),
+            'render_time': round(self.render_time, 6),
+            'slowest_sql': self.slowest_sql,
+            'slowest_time': round(self.slowest_time, 6),
+            'at': time.time(),
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    """Wrapper d'exécution installé sur chaque connexion : mesure la requête SQL pour la requête HTTP en cours.
+
+    La requête HTTP en cours est portée par une ContextVar, copiée dans les
+    threads où Django exécute le code synchrone d'une vue servie en ASGI.
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Récepteur de connection_created (voir DecesConfig.ready)."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def query_budget(view_name):
+    """Budget de requêtes SQL d'une vue (METRICS_QUERY_BUDGETS, sinon METRICS_QUERY_BUDGET), 0 si aucun."""
+    return settings.METRICS_QUERY_BUDGETS.get(view_name, settings.METRICS_QUERY_BUDGET)
+
+
+class QueryMetricsMiddleware:
+    """Enregistre pour chaque requête HTTP la vue, le nombre de requêtes SQL, le temps passé
+    en base, la requête SQL la plus lente et le temps de rendu des gabarits.
+
+    Les mesures alimentent les fenêtres glissantes de deces.metrics. Le corps
+    des réponses en flux (exports) est produit après la mesure et n'est pas compté.
+    Le middleware fonctionne en WSGI comme en ASGI, sans faire passer les vues
+    asynchrones par un thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets_enabled = bool(settings.METRICS_QUERY_BUDGET or settings.METRICS_QUERY_BUDGETS)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = RequestRecorder(keep_statements=self.budgets_enabled)
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.record(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        recorder = RequestRecorder(keep_statements=self.budgets_enabled)
+        token = _current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        # Écriture Redis hors de la boucle d'événements
+        await sync_to_async(self.record, thread_sensitive=False)(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, recorder, duration):
+        match = request.resolver_match
+        if match is not None:
+            view_name = match.view_name
+            metrics.record('request', view_name, recorder.sample(response.status_code, duration))
+            budget = query_budget(view_name)
+            if budget and recorder.queries > budget:
+                self.log_budget_exceeded(request, view_name, budget, recorder)
+
+    def log_budget_exceeded(self, request, view_name, budget, recorder):
+        # Une même requête répétée (N+1) apparaît en tête avec son nombre d'exécutions
+        statements = '\n'.join(
+            f'  {count} × {sql}' for sql, count in recorder.statements.most_common(BUDGET_LOG_STATEMENTS)
+        )
+        logger.warning(
+            f'{view_name} ({request.path}) : {recorder.queries} requêtes SQL pour un budget de {budget}, '
+            f'{recorder.db_time * 1000:.1f} ms en base\n{statements}'
+        )
+
+
+class InstrumentedTemplate(Template):
+    """Gabarit dont le temps de rendu est ajouté aux mesures de la requête HTTP en cours."""
+
+    def render(self, context=None, request=None):
+        recorder = _current_recorder.get()
+        if recorder is None:
+            return super().render(context, request)
+        # Un gabarit rendu pendant le rendu d'un autre n'est compté qu'une fois
+        recorder.render_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            recorder.render_depth -= 1
+            if not recorder.render_depth:
+                recorder.render_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Moteur de gabarits Django mesurant le temps de rendu (voir QueryMetricsMiddleware)."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
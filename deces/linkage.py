@@ -0,0 +1,169 @@
+import csv
+import io
+from datetime import date, datetime
+from django.db.models import Q
+from .models import Deces
+from .phonetics import normalize, phonetic, first_prenom
+
+# Nombre d'identités rapprochées par requête
+LINKAGE_BATCH_SIZE = 500
+# Score à partir duquel une personne est considérée comme décédée
+MATCH_THRESHOLD = 0.7
+# Poids des critères dans le score de confiance (le blocage garantit nom phonétique et date de naissance)
+BLOCKING_SCORE = 0.5
+WEIGHTS = {
+    'nom': 0.15,
+    'prenom': 0.2,
+    'prenom_phonetique': 0.1,
+    'lieu_naissance': 0.1,
+    'sexe': 0.05,
+}
+INPUT_FIELDS = ('id', 'nom', 'prenoms', 'sexe', 'date_naissance', 'lieu_naissance')
+DATE_FORMATS = ('%Y-%m-%d', '%Y%m%d', '%d/%m/%Y')
+RESULT_FIELDS = (
+    'id', 'nom', 'prenoms', 'date_naissance', 'statut', 'score', 'candidats',
+    'deces_nom', 'deces_prenoms', 'deces_sexe', 'deces_date_naissance', 'deces_lieu_naissance',
+    'date_deces', 'lieu_deces', 'acte_deces',
+)
+
+
+def parse_date(value):
+    """Date de naissance saisie (AAAA-MM-JJ, AAAAMMJJ ou JJ/MM/AAAA), jour ou mois 00 ramené à 01 comme à l'import."""
+    if isinstance(value, date):
+        return value
+    value = (value or '').strip()
+    if len(value) == 8 and value.isdigit():
+        value = value[:4] + (value[4:6] if value[4:6] != '00' else '01') + (value[6:8] if value[6:8] != '00' else '01')
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def prepare_identity(record, position):
+    """Normalise une identité et calcule sa clé de blocage (nom phonétique, date de naissance)."""
+    identity = {field: (str(record.get(field) or '').strip()) for field in INPUT_FIELDS}
+    if not identity['id']:
+        identity['id'] = str(position)
+    prenom = first_prenom(identity['prenoms'])
+    identity.update({
+        'date': parse_date(identity['date_naissance']),
+        'nom_normalise': normalize(identity['nom']),
+        'nom_phonetique': phonetic(identity['nom']),
+        'prenom_normalise': normalize(prenom),
+        'prenom_phonetique': phonetic(prenom),
+        'prenoms_normalises': {normalize(p) for p in identity['prenoms'].split()} - {None},
+    })
+    return identity
+
+
+def score(identity, deces):
+    """Score de confiance (0 à 1) du rapprochement d'une identité avec un décès du même bloc."""
+    total = BLOCKING_SCORE
+    if identity['nom_normalise'] == deces.nom_normalise:
+        total += WEIGHTS['nom']
+    if identity['prenom_normalise']:
+        if identity['prenom_normalise'] == deces.prenom_normalise:
+            total += WEIGHTS['prenom'] + WEIGHTS['prenom_phonetique']
+        elif identity['prenom_phonetique'] == deces.prenom_phonetique:
+            total += WEIGHTS['prenom_phonetique']
+        elif not identity['prenoms_normalises'] & {normalize(p) for p in (deces.prenoms or '').split()}:
+            # Aucun prénom commun : homonyme probable
+            total -= WEIGHTS['prenom']
+    if identity['lieu_naissance'] and identity['lieu_naissance'] == deces.lieu_naissance:
+        total += WEIGHTS['lieu_naissance']
+    if identity['sexe']:
+        total += WEIGHTS['sexe'] if identity['sexe'] == deces.sexe else -WEIGHTS['sexe']
+    return round(max(0.0, min(total, 1.0)), 3)
+
+
+def result(identity, deces=None, best_score=None, candidates=0):
+    row = {
+        'id': identity['id'],
+        'nom': identity['nom'],
+        'prenoms': identity['prenoms'],
+        'date_naissance': identity['date'].isoformat() if identity['date'] else identity['date_naissance'],
+        'candidats': candidates,
+        'score': best_score,
+    }
+    if not identity['nom_phonetique'] or not identity['date']:
+        row['statut'] = 'incomplet'
+    elif deces is None or best_score < MATCH_THRESHOLD:
+        row['statut'] = 'non_trouve'
+    else:
+        row['statut'] = 'trouve'
+    if deces is not None:
+        row.update({
+            'deces_nom': deces.nom,
+            'deces_prenoms': deces.prenoms,
+            'deces_sexe': deces.sexe,
+            'deces_date_naissance': deces.date_naissance.isoformat() if deces.date_naissance else None,
+            'deces_lieu_naissance': deces.lieu_naissance,
+            'date_deces': deces.date_deces.isoformat(),
+            'lieu_deces': deces.lieu_deces,
+            'acte_deces': deces.acte_deces,
+        })
+    return row
+
+
+def match_batch(identities):
+    """Rapproche un lot d'identités avec une seule requête sur la clé de blocage.
+
+    La requête sélectionne les décès dont le couple (nom_phonetique,
+    date_naissance) est celui d'une des identités (index composite) ; les
+    candidats sont ensuite répartis par bloc et notés en mémoire.
+    """
+    keys = {(i['nom_phonetique'], i['date']) for i in identities if i['nom_phonetique'] and i['date']}
+    blocks = {}
+    if keys:
+        condition = Q()
+        for nom_phonetique, date_naissance in keys:
+            condition |= Q(nom_phonetique=nom_phonetique, date_naissance=date_naissance)
+        for deces in Deces.objects.filter(condition):
+            blocks.setdefault((deces.nom_phonetique, deces.date_naissance), []).append(deces)
+
+    results = []
+    for identity in identities:
+        candidates = blocks.get((identity['nom_phonetique'], identity['date']), [])
+        scored = [(score(identity, deces), deces) for deces in candidates]
+        if scored:
+            best_score, best = max(scored, key=lambda item: item[0])
+            results.append(result(identity, best, best_score, len(candidates)))
+        else:
+            results.append(result(identity))
+    return results
+
+
+def match_identities(records, batch_size=LINKAGE_BATCH_SIZE):
+    """Rapproche des identités (dictionnaires) avec les décès, lot par lot, dans l'ordre d'entrée."""
+    batch = []
+    for position, record in enumerate(records, start=1):
+        batch.append(prepare_identity(record, position))
+        if len(batch) >= batch_size:
+            yield from match_batch(batch)
+            batch = []
+    if batch:
+        yield from match_batch(batch)
+
+
+def read_identities_csv(fileobj):
+    """Lit des identités depuis un CSV (séparateur ; ou , détecté), avec une ligne d'en-tête."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig') if isinstance(fileobj.read(0), bytes) else fileobj
+    first_line = text.readline()
+    delimiter = ';' if first_line.count(';') >= first_line.count(',') else ','
+    header = next(csv.reader([first_line], delimiter=delimiter))
+    reader = csv.DictReader(text, fieldnames=[name.strip().lower() for name in header], delimiter=delimiter)
+    yield from reader
+
+
+def write_results_csv(results, fileobj):
+    """Écrit les résultats au fur et à mesure ; retourne le nombre de lignes écrites."""
+    writer = csv.DictWriter(fileobj, fieldnames=RESULT_FIELDS, delimiter=';', lineterminator='\n', extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for row in results:
+        writer.writerow(row)
+        count += 1
+    return count
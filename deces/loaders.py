@@ -0,0 +1,254 @@
+import os
+import tempfile
+import time
+from django.db import connection
+from celery.utils.log import get_task_logger
+from deces.models import Deces
+from deces.geography import resolve_lieux
+from deces.fingerprints import row_fingerprint
+from deces.ngrams import NGRAM_FIELDS, index_values, uses_database_trigrams
+
+logger = get_task_logger(__name__)
+
+# Colonnes de Deces alimentées par l'import, dans l'ordre du fichier de staging
+DECES_FIELDS = [
+    'nom', 'prenoms', 'sexe', 'date_naissance', 'lieu_naissance',
+    'lieu_naissance_nom', 'date_deces', 'lieu_deces', 'acte_deces',
+    'lieu_naissance_libelle', 'lieu_naissance_dep', 'lieu_naissance_reg',
+    'lieu_deces_libelle', 'lieu_deces_dep', 'lieu_deces_reg',
+    'nom_normalise', 'nom_phonetique', 'prenom_normalise', 'prenom_phonetique',
+    'empreinte'
+]
+# Colonnes de la clé primaire composite
+KEY_FIELDS = ['date_deces', 'lieu_deces', 'acte_deces']
+# Colonnes mises à jour quand la ligne existe déjà : seules les lignes dont
+# l'empreinte a changé sont réécrites, avec toutes leurs colonnes
+UPDATE_FIELDS = [field for field in DECES_FIELDS if field not in KEY_FIELDS]
+
+STAGING_TABLE = 'deces_deces_staging'
+# Clés dont l'empreinte est lue par requête (SQLite développe la comparaison de tuples en OR)
+FINGERPRINT_LOOKUP_SIZE = 200
+
+
+class OrmLoader:
+    """Insère les décès par lots avec bulk_create (INSERT ... ON DUPLICATE KEY UPDATE).
+
+    Avant chaque lot, les empreintes des lignes déjà en base sont lues par
+    clé primaire : seules les lignes nouvelles ou modifiées sont écrites, ce qui
+    rend quasi gratuite la réimportation d'un fichier déjà chargé.
+    """
+
+    engine = 'orm'
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.batch = []
+        self.batch_count = 0
+        # Lignes insérées, mises à jour et inchangées depuis la création du chargeur
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        # Mois de décès des lignes écrites, dont les statistiques sont à recalculer
+        self.months = set()
+        # Temps passé à écrire les lots (comparaison des empreintes comprise), en secondes
+        self.flush_seconds = 0.0
+        # Valeurs déjà ajoutées à l'index de trigrammes par ce chargeur
+        self.indexed = {field: set() for field in NGRAM_FIELDS}
+
+    def add(self, data):
+        """Ajoute une ligne parsée et insère le lot quand il est plein."""
+        # Libellés et rattachements des lieux résolus depuis le référentiel en mémoire
+        data.update(resolve_lieux(data['lieu_naissance'], data['lieu_naissance_nom'], data['lieu_deces']))
+        data['empreinte'] = row_fingerprint(data)
+        self.batch.append(data)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insère ou met à jour les lignes en attente qui diffèrent de la base."""
+        if not self.batch:
+            return
+        start = time.perf_counter()
+        rows = self.changed_rows()
+        if rows:
+            self.write(rows)
+            self.index_names(rows)
+            self.months |= {data['date_deces'] for data in rows}
+        self.batch = []
+        self.batch_count += 1
+        self.flush_seconds += time.perf_counter() - start
+
+    def changed_rows(self):
+        """Compare les empreintes du lot à celles de la base et retourne les lignes à écrire."""
+        keys = list({tuple(data[field] for field in KEY_FIELDS) for data in self.batch})
+        fingerprints = {}
+        for start in range(0, len(keys), FINGERPRINT_LOOKUP_SIZE):
+            lookup_keys = keys[start:start + FINGERPRINT_LOOKUP_SIZE]
+            # Le filtre sur date_deces permet l'élagage des partitions
+            existing = Deces.objects.filter(
+                date_deces__in={key[0] for key in lookup_keys}, pk__in=lookup_keys
+            ).values_list(*KEY_FIELDS, 'empreinte')
+            fingerprints.update((tuple(row[:-1]), row[-1]) for row in existing)
+
+        rows = []
+        for data in self.batch:
+            key = tuple(data[field] for field in KEY_FIELDS)
+            if key not in fingerprints:
+                self.inserted += 1
+            elif fingerprints[key] != data['empreinte']:
+                # Empreinte différente ou absente (ligne antérieure aux empreintes)
+                self.updated += 1
+            else:
+                self.unchanged += 1
+                continue
+            # Un doublon dans le fichier est comparé à la ligne qui le précède
+            fingerprints[key] = data['empreinte']
+            rows.append(data)
+        return rows
+
+    def write(self, rows):
+        options = {}
+        # SQLite et PostgreSQL exigent la cible du conflit, MariaDB la refuse
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = KEY_FIELDS
+        Deces.objects.bulk_create(
+            [Deces(**data) for data in rows], update_conflicts=True, update_fields=UPDATE_FIELDS, **options
+        )
+
+    def index_names(self, rows):
+        """Ajoute les noms et prénoms écrits à l'index de trigrammes (recherche par sous-chaîne)."""
+        if uses_database_trigrams():
+            return
+        for field in NGRAM_FIELDS:
+            values = {data[field] for data in rows if data[field]} - self.indexed[field]
+            index_values(field, values)
+            self.indexed[field] |= values
+
+
+class BulkLoader(OrmLoader):
+    """Charge les décès via une table de staging et le chargement natif du SGBD.
+
+    Chaque lot est écrit dans un fichier au format texte de COPY (identique à
+    celui attendu par LOAD DATA), chargé dans une table temporaire sans index,
+    puis fusionné dans deces_deces par un upsert ensembliste par partition
+    (année de décès). Comme pour l'ORM, seules les lignes nouvelles ou
+    modifiées sont chargées.
+    """
+
+    engine = 'bulk'
+
+    def write(self, rows):
+        rows = last_by_key(rows)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False) as staging_file:
+            for data in rows:
+                staging_file.write('\t'.join(format_staging_value(data[field]) for field in DECES_FIELDS))
+                staging_file.write('\n')
+        try:
+            with connection.cursor() as cursor:
+                self.prepare_staging_table(cursor)
+                self.load_staging_file(cursor, staging_file.name)
+                years = sorted({data['date_deces'].year for data in rows})
+                for year in years:
+                    self.merge_partition(cursor, year)
+        finally:
+            os.unlink(staging_file.name)
+
+    def prepare_staging_table(self, cursor):
+        """Crée la table temporaire (propre à la connexion) si nécessaire et la vide.
+
+        DELETE plutôt que TRUNCATE, qui provoque un commit implicite sur MariaDB
+        alors que le chargement s'exécute dans la transaction du point de contrôle.
+        """
+        columns = ', '.join(DECES_FIELDS)
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} AS SELECT {columns} FROM deces_deces LIMIT 0')
+        cursor.execute(f'DELETE FROM {STAGING_TABLE}')
+
+    def load_staging_file(self, cursor, path):
+        columns = ', '.join(DECES_FIELDS)
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {STAGING_TABLE} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({columns})",
+                [path]
+            )
+            return
+
+        sql = f'COPY {STAGING_TABLE} ({columns}) FROM STDIN'
+        raw_cursor = cursor.cursor
+        with open(path, 'r', encoding='utf-8') as staging_file:
+            if hasattr(raw_cursor, 'copy_expert'):
+                # psycopg2
+                raw_cursor.copy_expert(sql, staging_file)
+            else:
+                # psycopg 3
+                with raw_cursor.copy(sql) as copy:
+                    for block in iter(lambda: staging_file.read(1024 * 1024), ''):
+                        copy.write(block)
+
+    def merge_partition(self, cursor, year):
+        """Fusionne les lignes d'une année de décès (une partition) dans deces_deces."""
+        columns = ', '.join(DECES_FIELDS)
+        bounds = [f'{year:04d}-01-01', f'{year + 1:04d}-01-01']
+        if connection.vendor == 'mysql':
+            updates = ', '.join(f'{field} = VALUES({field})' for field in UPDATE_FIELDS)
+            cursor.execute(
+                f'INSERT INTO deces_deces ({columns}) '
+                f'SELECT {columns} FROM {STAGING_TABLE} WHERE date_deces >= %s AND date_deces < %s '
+                f'ON DUPLICATE KEY UPDATE {updates}',
+                bounds
+            )
+        else:
+            keys = ', '.join(KEY_FIELDS)
+            updates = ', '.join(f'{field} = EXCLUDED.{field}' for field in UPDATE_FIELDS)
+            # Clés uniques dans la table de staging (last_by_key) : un seul INSERT ne
+            # peut pas mettre à jour deux fois la même ligne
+            cursor.execute(
+                f'INSERT INTO deces_deces ({columns}) '
+                f'SELECT {columns} FROM {STAGING_TABLE} '
+                f'WHERE date_deces >= %s AND date_deces < %s '
+                f'ON CONFLICT ({keys}) DO UPDATE SET {updates}',
+                bounds
+            )
+
+
+def last_by_key(rows):
+    """Garde la dernière ligne lue pour chaque clé primaire, comme l'ORM et ON DUPLICATE KEY UPDATE."""
+    return list({tuple(data[field] for field in KEY_FIELDS): data for data in rows}.values())
+
+
+def format_staging_value(value):
+    """Formate une valeur pour le format texte de COPY / LOAD DATA."""
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def bulk_load_supported():
+    """Indique si la base courante dispose d'un chargement natif (MariaDB/MySQL ou PostgreSQL)."""
+    return connection.vendor in ('mysql', 'postgresql')
+
+
+def resolve_engine(engine):
+    """Retourne le moteur réellement utilisable pour le moteur demandé.
+
+    Le moteur natif n'est disponible que sur MariaDB/MySQL et PostgreSQL ;
+    sur les autres bases (SQLite) l'import repasse par l'ORM.
+    """
+    if engine == BulkLoader.engine:
+        if bulk_load_supported():
+            return BulkLoader.engine
+        logger.warning(f'Chargement natif indisponible sur {connection.vendor}, utilisation de l\'ORM')
+    return OrmLoader.engine
+
+
+def get_loader(engine, batch_size):
+    """Retourne le chargeur correspondant au moteur demandé."""
+    if resolve_engine(engine) == BulkLoader.engine:
+        return BulkLoader(batch_size)
+    return OrmLoader(batch_size)
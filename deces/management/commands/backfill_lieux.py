@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q, F, Value, Case, When, CharField
+from django.db.models.functions import Concat, Left
+from deces.models import Deces
+from deces.geography import geography, resolve_lieux, PaysEntry, LIBELLE_MAX_LENGTH
+from deces.search_cache import bump_data_version
+
+class Command(BaseCommand):
+    help = 'Renseigne les libellés et codes département/région dénormalisés des décès (à relancer après une mise à jour du COG)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Ne traiter que les décès dont le libellé n\'est pas encore renseigné')
+
+    def handle(self, *args, **options):
+        geography.ensure_loaded()
+        total = self.backfill('lieu_naissance', options['missing'])
+        total += self.backfill('lieu_deces', options['missing'])
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'Backfill terminé : {total} codes de lieu traités'))
+
+    def backfill(self, prefix, missing):
+        """Met à jour les décès code par code (un UPDATE indexé par code de lieu présent)."""
+        queryset = Deces.objects.all()
+        if missing:
+            queryset = queryset.filter(**{f'{prefix}_libelle__isnull': True})
+        codes = list(queryset.order_by().values_list(prefix, flat=True).distinct())
+        self.stdout.write(f'{prefix} : {len(codes)} codes à traiter...')
+
+        updated = 0
+        for i, code in enumerate(codes, 1):
+            lieu = geography.get_lieu(code) if code else None
+            if lieu is None:
+                # Code absent du référentiel : rien à dénormaliser
+                continue
+            if prefix == 'lieu_naissance':
+                fields = resolve_lieux(code, None, None)
+            else:
+                fields = resolve_lieux(None, None, code)
+            values = {field: value for field, value in fields.items() if field.startswith(prefix)}
+            if prefix == 'lieu_naissance' and isinstance(lieu, PaysEntry):
+                # Le libellé d'une naissance à l'étranger dépend de la ville de chaque ligne
+                values[f'{prefix}_libelle'] = Case(
+                    When(Q(lieu_naissance_nom__isnull=True) | Q(lieu_naissance_nom=''), then=Value(lieu.libcog)),
+                    default=Left(Concat(F('lieu_naissance_nom'), Value(f', {lieu.libcog}')), LIBELLE_MAX_LENGTH),
+                    output_field=CharField()
+                )
+            queryset.filter(**{prefix: code}).update(**values)
+            updated += 1
+            if i % 1000 == 0:
+                self.stdout.write(f'{prefix} : {i}/{len(codes)} codes traités')
+        return updated
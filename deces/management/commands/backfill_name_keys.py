@@ -0,0 +1,40 @@
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from deces.models import Deces
+from deces.phonetics import normalize_series, phonetic_series
+from deces.search_cache import bump_data_version
+
+VALUES_BATCH_SIZE = 5000
+
+class Command(BaseCommand):
+    help = 'Calcule les formes normalisées et les clés phonétiques du nom et du premier prénom des décès existants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Ne traiter que les décès dont les clés ne sont pas renseignées')
+
+    def handle(self, *args, **options):
+        total = self.backfill('nom', 'nom_normalise', 'nom_phonetique', options['missing'])
+        total += self.backfill('prenoms', 'prenom_normalise', 'prenom_phonetique', options['missing'])
+        bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'Backfill terminé : {total} valeurs distinctes traitées'))
+
+    def backfill(self, field, normalise_field, phonetique_field, missing):
+        """Met à jour les décès valeur distincte par valeur distincte (UPDATE indexé sur le champ)."""
+        queryset = Deces.objects.exclude(**{f'{field}__isnull': True})
+        if missing:
+            queryset = queryset.filter(**{f'{normalise_field}__isnull': True})
+        values = list(queryset.order_by().values_list(field, flat=True).distinct())
+        self.stdout.write(f'{field} : {len(values)} valeurs distinctes à traiter...')
+
+        for start in range(0, len(values), VALUES_BATCH_SIZE):
+            batch = pd.Series(values[start:start + VALUES_BATCH_SIZE], dtype=object)
+            # Les clés de prénom portent sur le premier prénom
+            source = batch.str.split().str[0] if field == 'prenoms' else batch
+            keys = pd.DataFrame({'normalise': normalize_series(source), 'phonetique': phonetic_series(source)}).astype(object)
+            keys = keys.where(keys.notna(), None)
+            with transaction.atomic():
+                for value, normalise, phonetique in zip(batch, keys['normalise'], keys['phonetique']):
+                    Deces.objects.filter(**{field: value}).update(**{normalise_field: normalise, phonetique_field: phonetique})
+            self.stdout.write(f'{field} : {min(start + VALUES_BATCH_SIZE, len(values))}/{len(values)} valeurs traitées')
+        return len(values)
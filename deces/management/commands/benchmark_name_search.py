@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from deces.models import Deces
+from deces.ngrams import contains_filter, index_ready
+
+class Command(BaseCommand):
+    help = 'Compare la recherche par sous-chaîne LIKE \'%...%\' et l\'index de trigrammes sur la base courante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('substrings', nargs='+', help='Sous-chaînes recherchées (ex. : ART ESCU NDRE)')
+        parser.add_argument('--field', default='nom', choices=['nom', 'prenoms'], help='Champ recherché')
+        parser.add_argument('--repeat', type=int, default=3, help='Nombre d\'exécutions par requête (le meilleur temps est retenu)')
+        parser.add_argument('--explain', action='store_true', help='Afficher les plans d\'exécution')
+
+    def handle(self, *args, **options):
+        if not index_ready():
+            self.stdout.write(self.style.WARNING('Index de trigrammes non construit (rebuild_ngram_index) : les deux requêtes utiliseront LIKE'))
+        field = options['field']
+        self.stdout.write(f'{"Sous-chaîne":<15} {"Lignes":>10} {"LIKE (ms)":>10} {"Trigrammes (ms)":>16}')
+        for substring in options['substrings']:
+            substring = substring.upper()
+            like = Deces.objects.filter(Q(**{f'{field}__contains': substring}))
+            ngram = Deces.objects.filter(contains_filter(field, substring))
+            rows, like_time = self.measure(like, options['repeat'])
+            ngram_rows, ngram_time = self.measure(ngram, options['repeat'])
+            if rows != ngram_rows:
+                self.stdout.write(self.style.ERROR(f'{substring} : résultats différents ({rows} / {ngram_rows})'))
+            self.stdout.write(f'{substring:<15} {rows:>10} {like_time * 1000:>10.1f} {ngram_time * 1000:>16.1f}')
+            if options['explain']:
+                self.stdout.write(f'LIKE :\n{like.explain()}\nTrigrammes :\n{ngram.explain()}')
+
+    def measure(self, queryset, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = queryset.count()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rows, best
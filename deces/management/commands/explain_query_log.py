@@ -0,0 +1,62 @@
+import json
+from collections import Counter
+from django.core.management.base import BaseCommand
+from deces.query_audit import replay
+
+class Command(BaseCommand):
+    help = (
+        'Rejoue un journal de requêtes (URL ou paramètres de recherche, ou requêtes SQL, une par ligne) '
+        'avec EXPLAIN et indique pour chacune l\'index utilisé et le nombre de lignes examinées'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Journal de requêtes (journal d\'accès du serveur web, fichier de paramètres ou de requêtes SQL)')
+        parser.add_argument('--analyze', action='store_true', help='Exécuter les requêtes pour obtenir le nombre réel de lignes lues (MariaDB, PostgreSQL)')
+        parser.add_argument('--table', default='deces_deces', help='Table dont les accès sont rapportés (par défaut : deces_deces)')
+        parser.add_argument('--json', action='store_true', help='Une ligne JSON par requête')
+
+    def handle(self, *args, **options):
+        index_usage = Counter()
+        full_scans = 0
+        statements = 0
+        rows_examined = 0
+
+        with open(options['log'], encoding='utf-8', errors='replace') as log:
+            for entry in replay(log, analyze=options['analyze']):
+                statements += 1
+                steps = [step for step in entry['steps'] if step['table'] == options['table']]
+                if options['json']:
+                    self.stdout.write(json.dumps({**entry, 'steps': steps}, default=str))
+                else:
+                    self.report(entry, steps)
+                for step in steps:
+                    index_usage[step['index'] or 'aucun'] += 1
+                    full_scans += step['index'] is None
+                    rows_examined += step['rows'] or 0
+
+        if options['json']:
+            return
+        self.stdout.write('')
+        self.stdout.write(f'{statements} requête(s) rejouée(s), {rows_examined} ligne(s) examinée(s) au total (estimation sauf --analyze)')
+        for index, count in index_usage.most_common():
+            self.stdout.write(f'  {index:<45} {count:>6}')
+        if full_scans:
+            self.stdout.write(self.style.WARNING(f'{full_scans} lecture(s) sans index de {options["table"]}'))
+
+    def report(self, entry, steps):
+        header = f'#{entry["line"]} [{entry["label"]}] {entry["source"][:120]}'
+        if entry['error']:
+            self.stdout.write(self.style.ERROR(f'{header}\n    {entry["error"]}'))
+            return
+        self.stdout.write(header)
+        if not steps:
+            self.stdout.write('    table non lue')
+        for step in steps:
+            rows = step['rows'] if step['rows'] is not None else '?'
+            line = f'    index={step["index"] or "aucun"} accès={step["access"]} lignes={rows}'
+            if step['partitions']:
+                line += f' partitions={step["partitions"]}'
+            if step['index'] is None:
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,23 @@
+import os
+from django.core.management.base import BaseCommand
+from deces.benchmarks.generator import CogReference, write_insee_zip
+
+class Command(BaseCommand):
+    help = 'Génère un fichier de décès au format INSEE (ZIP) et un référentiel COG synthétique, identiques pour une même graine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Répertoire de destination')
+        parser.add_argument('--rows', type=int, default=100000, help='Nombre de lignes du fichier de décès')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du générateur')
+        parser.add_argument('--error-rate', type=float, default=0.001, help='Part des lignes invalides (sexe, date de décès ou nom)')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        reference = CogReference(options['seed'])
+        paths = reference.write(os.path.join(directory, 'cog'))
+        for name, path in paths.items():
+            self.stdout.write(f'{name:<13} {path}')
+        zip_path = write_insee_zip(
+            os.path.join(directory, 'deces-benchmark.zip'), options['rows'], reference, options['seed'], options['error_rate']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{options["rows"]} lignes générées dans {zip_path}'))
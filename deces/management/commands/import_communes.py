@@ -2,6 +2,7 @@ import csv
 from django.core.management.base import BaseCommand
 from deces.models import Commune, Region, Departement
 from django.db import transaction
+from deces.geography import invalidate_geography
 from django.core.exceptions import ObjectDoesNotExist
 
 class Command(BaseCommand):
@@ -111,6 +112,9 @@ class Command(BaseCommand):
                     for error in errors:
                         self.stdout.write(self.style.WARNING(error))
                 
+                # Recharger le référentiel en mémoire des processus web une fois l'import validé
+                transaction.on_commit(invalidate_geography)
+
                 total = len(communes_principales) + len(communes_secondaires)
                 self.stdout.write(self.style.SUCCESS(f'Import terminé. Total : {total} communes'))
                 
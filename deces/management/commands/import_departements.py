@@ -2,6 +2,7 @@ import csv
 from django.core.management.base import BaseCommand
 from deces.models import Departement, Region
 from django.db import transaction
+from deces.geography import invalidate_geography
 from django.core.exceptions import ObjectDoesNotExist
 
 class Command(BaseCommand):
@@ -53,6 +54,9 @@ class Command(BaseCommand):
                     # Bulk create pour de meilleures performances
                     Departement.objects.bulk_create(departements_list)
                     
+                # Recharger le référentiel en mémoire des processus web une fois l'import validé
+                transaction.on_commit(invalidate_geography)
+
                 self.stdout.write(self.style.SUCCESS(f'{len(departements_list)} départements importés avec succès'))
                 
         except Exception as e:
@@ -2,6 +2,7 @@ import csv
 from django.core.management.base import BaseCommand
 from deces.models import Pays
 from django.db import transaction
+from deces.geography import invalidate_geography
 
 class Command(BaseCommand):
     help = 'Importe les pays depuis un fichier CSV'
@@ -41,6 +42,9 @@ class Command(BaseCommand):
                     # Bulk create pour de meilleures performances
                     Pays.objects.bulk_create(pays_list)
                     
+                # Recharger le référentiel en mémoire des processus web une fois l'import validé
+                transaction.on_commit(invalidate_geography)
+
                 self.stdout.write(self.style.SUCCESS(f'{len(pays_list)} pays importés avec succès'))
                 
         except Exception as e:
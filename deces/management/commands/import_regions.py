@@ -2,6 +2,7 @@ import csv
 from django.core.management.base import BaseCommand
 from deces.models import Region
 from django.db import transaction
+from deces.geography import invalidate_geography
 
 class Command(BaseCommand):
     help = 'Importe les régions depuis un fichier CSV'
@@ -38,6 +39,9 @@ class Command(BaseCommand):
                     # Bulk create pour de meilleures performances
                     Region.objects.bulk_create(regions_list)
                     
+                # Recharger le référentiel en mémoire des processus web une fois l'import validé
+                transaction.on_commit(invalidate_geography)
+
                 self.stdout.write(self.style.SUCCESS(f'{len(regions_list)} régions importées avec succès'))
                 
         except Exception as e:
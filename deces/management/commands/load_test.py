@@ -0,0 +1,58 @@
+import json
+from django.core.management.base import BaseCommand
+from deces.benchmarks import report as benchmark_report
+from deces.benchmarks.load import LoadTest
+
+class Command(BaseCommand):
+    help = (
+        'Charge mixte (recherches lentes et autocomplétion) contre un serveur déployé, '
+        'pour comparer les latences sous WSGI et sous ASGI'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Adresse du serveur testé')
+        parser.add_argument('--label', default='', help='Modèle de serveur testé (wsgi, asgi), repris dans les résultats')
+        parser.add_argument('--duration', type=float, default=30, help='Durée du test en secondes')
+        parser.add_argument('--slow-clients', type=int, default=8, help='Clients enchaînant des recherches par sous-chaîne')
+        parser.add_argument('--fast-clients', type=int, default=8, help='Clients enchaînant des requêtes rapides')
+        parser.add_argument('--client-timeout', type=float, default=30, help='Délai après lequel un client abandonne sa requête')
+        parser.add_argument('--session-id', help='Cookie de session d\'un utilisateur connecté, pour inclure le suivi d\'import')
+        parser.add_argument('--import-id', type=int, help='Import interrogé par le suivi d\'import')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du choix des requêtes')
+        parser.add_argument('--output', help='Fichier JSON des résultats (par défaut : sortie standard)')
+        parser.add_argument('--compare', help='Résultats JSON d\'une exécution précédente à comparer (par exemple sous WSGI)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        self.stderr.write(f'Charge contre {options["url"]} pendant {options["duration"]:g}s...')
+        load_test = LoadTest(
+            options['url'], duration=options['duration'],
+            slow_clients=options['slow_clients'], fast_clients=options['fast_clients'],
+            client_timeout=options['client_timeout'], session_id=options['session_id'],
+            import_id=options['import_id'], seed=options['seed'],
+        )
+        report = {
+            'meta': benchmark_report.meta({
+                'label': options['label'], 'duration': options['duration'],
+                'slow_clients': options['slow_clients'], 'fast_clients': options['fast_clients'],
+                'client_timeout': options['client_timeout'], 'import_status': bool(options['session_id'] and options['import_id']),
+                'seed': options['seed'],
+            }),
+            'results': load_test.run(),
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Résultats écrits dans {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        if baseline:
+            self.stderr.write(f'Comparaison avec {baseline["meta"]["parameters"].get("label") or options["compare"]} :')
+            benchmark_report.write_comparison(self, baseline['results'], report['results'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from deces.partitions import ensure_partitions, list_partitions
+
+class Command(BaseCommand):
+    help = 'Découpe la partition p_future de deces_deces en partitions annuelles et affiche l\'état des partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Afficher la requête sans la lancer')
+        parser.add_argument('--through-year', type=int, help='Dernière année devant disposer de sa partition (par défaut : année suivante)')
+
+    def handle(self, *args, **options):
+        partitions, sql = ensure_partitions(options['through_year'], dry_run=options['dry_run'])
+        if not partitions:
+            self.stdout.write(self.style.WARNING('La table deces_deces n\'est pas partitionnée'))
+            return
+
+        if sql is None:
+            self.stdout.write(self.style.SUCCESS('Toutes les partitions annuelles nécessaires existent'))
+        elif options['dry_run']:
+            self.stdout.write(f'Requête prévue (dry-run) :\n{sql}')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Partitions créées :\n{sql}'))
+            partitions = list_partitions()
+
+        self.report(partitions)
+
+    def report(self, partitions):
+        self.stdout.write(f'{"Partition":<12} {"Années <":>9} {"Lignes (est.)":>14} {"Données (Mo)":>13} {"Index (Mo)":>11}')
+        for partition in partitions:
+            self.stdout.write(
+                f'{partition["name"]:<12} {partition["less_than"]:>9} {partition["rows"]:>14} '
+                f'{partition["data_length"] / 1024 / 1024:>13.1f} {partition["index_length"] / 1024 / 1024:>11.1f}'
+            )
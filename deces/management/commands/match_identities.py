@@ -0,0 +1,35 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from deces.linkage import match_identities, read_identities_csv, write_results_csv
+
+class Command(BaseCommand):
+    help = 'Rapproche un fichier CSV d\'identités (nom, prenoms, date_naissance, lieu_naissance, sexe, id) avec les décès'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Fichier CSV d\'identités (séparateur ; ou ,)')
+        parser.add_argument('-o', '--output', help='Fichier CSV de résultats (sortie standard par défaut)')
+
+    def handle(self, *args, **options):
+        counts = {'identities': 0, 'matched': 0}
+
+        def counted(results):
+            for row in results:
+                counts['identities'] += 1
+                counts['matched'] += row['statut'] == 'trouve'
+                yield row
+
+        started = time.monotonic()
+        with open(options['input'], 'rb') as source:
+            results = counted(match_identities(read_identities_csv(source)))
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                    write_results_csv(results, output)
+            else:
+                write_results_csv(results, sys.stdout)
+        elapsed = time.monotonic() - started
+
+        self.stderr.write(self.style.SUCCESS(
+            f'{counts["matched"]}/{counts["identities"]} identités trouvées en {elapsed:.1f}s '
+            f'({counts["identities"] / max(elapsed, 1e-6):.0f} identités/s)'
+        ))
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from deces.models import Deces, NameTrigram
+from deces.ngrams import NGRAM_FIELDS, INDEX_READY_CACHE_KEY, index_values, uses_database_trigrams
+
+VALUES_BATCH_SIZE = 5000
+
+class Command(BaseCommand):
+    help = 'Reconstruit l\'index de trigrammes des noms et prénoms utilisé par la recherche approximative'
+
+    def handle(self, *args, **options):
+        if uses_database_trigrams():
+            self.stdout.write(self.style.SUCCESS('PostgreSQL : la recherche utilise les index pg_trgm, rien à reconstruire'))
+            return
+
+        cache.delete(INDEX_READY_CACHE_KEY)
+        self.stdout.write('Suppression de l\'index existant...')
+        NameTrigram.objects.all().delete()
+
+        for field in NGRAM_FIELDS:
+            values = Deces.objects.exclude(**{f'{field}__isnull': True}).order_by().values_list(field, flat=True).distinct()
+            count = 0
+            batch = set()
+            for value in values.iterator(chunk_size=VALUES_BATCH_SIZE):
+                batch.add(value)
+                if len(batch) >= VALUES_BATCH_SIZE:
+                    index_values(field, batch)
+                    count += len(batch)
+                    batch = set()
+                    if count % 100000 == 0:
+                        self.stdout.write(f'{field} : {count} valeurs indexées')
+            index_values(field, batch)
+            count += len(batch)
+            self.stdout.write(self.style.SUCCESS(f'{field} : {count} valeurs distinctes indexées'))
+
+        cache.set(INDEX_READY_CACHE_KEY, True, None)
+        self.stdout.write(self.style.SUCCESS(f'Index reconstruit : {NameTrigram.objects.count()} trigrammes'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from deces.partitions import imports_running, rebuild_summary
+
+class Command(BaseCommand):
+    help = 'Reconstruit le résumé des années de décès par nom utilisé pour l\'élagage des partitions'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruction du résumé par nom...')
+        count = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(f'{count} noms résumés'))
+        if imports_running():
+            self.stdout.write(self.style.WARNING('Imports en cours : le résumé ne sera utilisé qu\'après la clôture du dernier import'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from deces.stats import rebuild_stats, refresh_pending
+from deces.search_cache import bump_data_version
+
+class Command(BaseCommand):
+    help = 'Reconstruit les tables de statistiques des décès (par mois, département, sexe et tranche d\'âge)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending', action='store_true', help='Ne recalculer que les mois signalés par les imports')
+
+    def handle(self, *args, **options):
+        if options['pending']:
+            months = refresh_pending()
+            self.stdout.write(self.style.SUCCESS(f'{months} mois recalculés'))
+        else:
+            years = rebuild_stats(self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'Statistiques reconstruites pour {years} années'))
+        bump_data_version()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from deces.models import ImportHistory
+from deces.tasks import resume_import, is_resumable
+
+class Command(BaseCommand):
+    help = 'Reprend les imports interrompus à partir du dernier point de contrôle de leurs tranches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('import_ids', nargs='*', type=int, help='Identifiants des imports (ImportHistory) à reprendre')
+        parser.add_argument('--all', action='store_true', help='Reprendre tous les imports en cours ou en échec')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            imports = ImportHistory.objects.filter(status__in=['processing', 'failed'])
+        elif options['import_ids']:
+            imports = ImportHistory.objects.filter(pk__in=options['import_ids'])
+        else:
+            raise CommandError('Indiquer des identifiants d\'import ou --all')
+
+        resumed = 0
+        for import_history in imports:
+            if not is_resumable(import_history):
+                self.stdout.write(self.style.WARNING(f'Import {import_history.pk} ({import_history.status}) non repris'))
+                continue
+            resume_import.delay(import_history.pk)
+            resumed += 1
+            self.stdout.write(f'Reprise de l\'import {import_history.pk} : {import_history.csv_filename}')
+
+        self.stdout.write(self.style.SUCCESS(f'{resumed} import(s) relancé(s)'))
@@ -0,0 +1,58 @@
+import json
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from deces import tasks
+from deces.benchmarks import report as benchmark_report
+from deces.benchmarks.scenarios import SCENARIOS, run
+
+class Command(BaseCommand):
+    help = (
+        'Mesure le parsing, l\'import de bout en bout, la recherche et l\'autocomplétion sur des données générées, '
+        'dans une base de test ; les résultats JSON sont comparables d\'un commit à l\'autre'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Nombre de lignes du fichier de décès généré')
+        parser.add_argument('--seed', type=int, default=0, help='Graine du générateur')
+        parser.add_argument('--error-rate', type=float, default=0.001, help='Part des lignes invalides')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Scénarios séparés par des virgules ({", ".join(SCENARIOS)})')
+        parser.add_argument('--engine', default='orm', choices=['orm', 'bulk'], help='Moteur d\'insertion de l\'import')
+        parser.add_argument('--output', help='Fichier JSON des résultats (par défaut : sortie standard)')
+        parser.add_argument('--compare', help='Résultats JSON d\'une exécution précédente à comparer')
+
+    def handle(self, *args, **options):
+        scenarios = [scenario.strip() for scenario in options['scenarios'].split(',') if scenario.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Scénario(s) inconnu(s) : {", ".join(sorted(unknown))}')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        log = lambda message: self.stderr.write(message)
+        report = {
+            'meta': self.meta(options),
+            'results': run(scenarios, options['rows'], options['seed'], options['error_rate'], options['engine'], log),
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Résultats écrits dans {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        if baseline:
+            if baseline['meta']['parameters'] != report['meta']['parameters']:
+                self.stderr.write(self.style.WARNING('Paramètres différents de ceux de la référence, comparaison indicative'))
+            benchmark_report.write_comparison(self, baseline['results'], report['results'])
+
+    def meta(self, options):
+        meta = benchmark_report.meta({
+            'rows': options['rows'], 'seed': options['seed'], 'error_rate': options['error_rate'], 'engine': options['engine'],
+            'batch_size': tasks.BATCH_SIZE, 'chunk_size': tasks.CHUNK_SIZE,
+        })
+        meta['pandas'] = pd.__version__
+        return meta
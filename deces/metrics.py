@@ -0,0 +1,191 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics'
+# Séries mesurées : requêtes HTTP par vue, étapes de l'import par étape
+KINDS = ('request', 'stage')
+# Mesures des requêtes HTTP résumées en quantiles, avec leur nom Prometheus et leur aide
+REQUEST_MEASURES = {
+    'duration': ('deces_http_request_duration_seconds', 'Durée des requêtes HTTP par vue'),
+    'queries': ('deces_http_request_queries', 'Nombre de requêtes SQL par requête HTTP'),
+    'db_time': ('deces_http_request_db_seconds', 'Temps passé en base par requête HTTP'),
+    'render_time': ('deces_http_request_render_seconds', 'Temps de rendu des gabarits par requête HTTP'),
+}
+STAGE_MEASURES = {
+    'duration': ('deces_import_stage_duration_seconds', 'Durée des étapes de l\'import (téléchargement, empreinte, parsing, insertion)'),
+}
+MEASURES = {'request': REQUEST_MEASURES, 'stage': STAGE_MEASURES}
+QUANTILES = (0.5, 0.95, 0.99)
+# Nombre de requêtes les plus lentes détaillées dans le résumé JSON
+SLOWEST_COUNT = 10
+# Délais courts : une mesure perdue vaut mieux qu'une requête HTTP ralentie
+REDIS_TIMEOUT = 0.2
+
+_client = None
+
+
+def redis_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.METRICS_REDIS_URL, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+        )
+    return _client
+
+
+def _series_key(kind, name):
+    return f'{KEY_PREFIX}:{kind}:{name}'
+
+
+def _totals_key(kind, name):
+    return f'{KEY_PREFIX}:totals:{kind}:{name}'
+
+
+def record(kind, name, sample):
+    """Ajoute une mesure à la fenêtre glissante (liste Redis bornée à METRICS_BUFFER_SIZE) de la série.
+
+    Les sommes et nombres de mesures sont aussi cumulés dans un hash, sans
+    fenêtre : les _sum et _count exposés à Prometheus ne décroissent jamais.
+    """
+    key = _series_key(kind, name)
+    totals_key = _totals_key(kind, name)
+    try:
+        pipeline = redis_client().pipeline(transaction=False)
+        pipeline.lpush(key, json.dumps(sample))
+        pipeline.ltrim(key, 0, settings.METRICS_BUFFER_SIZE - 1)
+        pipeline.sadd(f'{KEY_PREFIX}:{kind}', name)
+        for measure in MEASURES[kind]:
+            if sample.get(measure) is not None:
+                pipeline.hincrbyfloat(totals_key, f'{measure}:sum', sample[measure])
+                pipeline.hincrby(totals_key, f'{measure}:count', 1)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.debug(f'Mesure {key} perdue : {str(e)}')
+
+
+def record_stage(name, duration, **extra):
+    record('stage', name, {'duration': round(duration, 6), 'at': time.time(), **extra})
+
+
+class StageTimer:
+    duration = None
+
+
+@contextmanager
+def stage(name):
+    """Mesure la durée d'une étape de l'import ; une étape en échec n'est pas enregistrée."""
+    timer = StageTimer()
+    start = time.perf_counter()
+    yield timer
+    timer.duration = time.perf_counter() - start
+    record_stage(name, timer.duration)
+
+
+def samples(kind):
+    """Mesures de la fenêtre glissante, par nom de série."""
+    client = redis_client()
+    names = sorted(name.decode() for name in client.smembers(f'{KEY_PREFIX}:{kind}'))
+    pipeline = client.pipeline(transaction=False)
+    for name in names:
+        pipeline.lrange(_series_key(kind, name), 0, -1)
+    return {name: [json.loads(value) for value in values] for name, values in zip(names, pipeline.execute())}
+
+
+def totals(kind, names):
+    """Sommes et nombres cumulés de mesures, par nom de série."""
+    pipeline = redis_client().pipeline(transaction=False)
+    for name in names:
+        pipeline.hgetall(_totals_key(kind, name))
+    return {
+        name: {field.decode(): float(value) for field, value in values.items()}
+        for name, values in zip(names, pipeline.execute())
+    }
+
+
+def quantile(values, q):
+    """Quantile par rang le plus proche d'une liste triée."""
+    if not values:
+        return None
+    rank = max(int(q * len(values) + 0.5) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def _describe(series, measures, series_totals):
+    """Quantiles de la fenêtre glissante, somme et nombre cumulés depuis la remise à zéro."""
+    result = {}
+    for measure in measures:
+        values = sorted(sample[measure] for sample in series if sample.get(measure) is not None)
+        result[measure] = {
+            **{f'p{int(q * 100)}': quantile(values, q) for q in QUANTILES},
+            'sum': round(series_totals.get(f'{measure}:sum', 0.0), 6),
+            'count': int(series_totals.get(f'{measure}:count', 0)),
+        }
+    return result
+
+
+def summary():
+    """Quantiles par vue et par étape, et détail des requêtes HTTP les plus lentes en base."""
+    requests_by_view = samples('request')
+    stages = samples('stage')
+    request_totals = totals('request', list(requests_by_view))
+    stage_totals = totals('stage', list(stages))
+    slowest = sorted(
+        ({'view': view, **sample} for view, series in requests_by_view.items() for sample in series if sample.get('slowest_sql')),
+        key=lambda sample: sample['slowest_time'], reverse=True
+    )[:SLOWEST_COUNT]
+    return {
+        'requests': {view: _describe(series, REQUEST_MEASURES, request_totals[view]) for view, series in requests_by_view.items()},
+        'stages': {name: _describe(series, STAGE_MEASURES, stage_totals[name]) for name, series in stages.items()},
+        'slowest': slowest,
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    if value is None:
+        return 'NaN'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text():
+    """Résumés au format texte d'exposition de Prometheus.
+
+    Les quantiles portent sur la fenêtre glissante ; _sum et _count sont des
+    compteurs cumulés (rate() reste juste quand la fenêtre se renouvelle).
+    """
+    data = summary()
+    lines = []
+    for kind, label, measures in (('requests', 'view', REQUEST_MEASURES), ('stages', 'stage', STAGE_MEASURES)):
+        for measure, (metric, help_text) in measures.items():
+            lines.append(f'# HELP {metric} {help_text} (quantiles sur la fenêtre glissante)')
+            lines.append(f'# TYPE {metric} summary')
+            for name, described in data[kind].items():
+                values = described[measure]
+                if not values['count']:
+                    continue
+                name = _label(name)
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{label}="{name}",quantile="{q}"}} {_format_number(values[f"p{int(q * 100)}"])}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {_format_number(values["sum"])}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {values["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    client = redis_client()
+    for kind in KINDS:
+        names = [name.decode() for name in client.smembers(f'{KEY_PREFIX}:{kind}')]
+        client.delete(
+            f'{KEY_PREFIX}:{kind}',
+            *[_series_key(kind, name) for name in names],
+            *[_totals_key(kind, name) for name in names],
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0007_fix_import_history_relation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importhistory',
+            name='engine',
+            field=models.CharField(choices=[('orm', 'ORM (bulk_create)'), ('bulk', 'Chargement natif (LOAD DATA / COPY)')], default='orm', help_text='Moteur de chargement utilisé', max_length=10),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0008_importhistory_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_offset', models.BigIntegerField(help_text='Position de début de la tranche dans le CSV (octets)')),
+                ('end_offset', models.BigIntegerField(help_text='Position de fin de la tranche dans le CSV (octets)')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours'), ('completed', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('records_read', models.IntegerField(default=0)),
+                ('records_processed', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('import_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='deces.importhistory')),
+            ],
+            options={
+                'verbose_name': "Tranche d'import",
+                'verbose_name_plural': "Tranches d'import",
+                'ordering': ['import_history', 'start_offset'],
+            },
+        ),
+        migrations.AddField(
+            model_name='decesimporterror',
+            name='import_chunk',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='deces.importchunk'),
+        ),
+        migrations.AddIndex(
+            model_name='importchunk',
+            index=models.Index(fields=['import_history', 'status'], name='deces_impor_import__466bfc_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0009_importchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importchunk',
+            name='batch_count',
+            field=models.IntegerField(default=0, help_text='Nombre de lots insérés'),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='committed_offset',
+            field=models.BigIntegerField(blank=True, help_text='Position dans le CSV du dernier bloc validé (point de contrôle)', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0010_importchunk_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decesimporterror',
+            name='reason',
+            field=models.CharField(choices=[('nomprenom', 'Nom/prénoms invalides'), ('date_naissance', 'Date de naissance invalide'), ('date_deces', 'Date de décès invalide'), ('champs_obligatoires', 'Champs obligatoires manquants'), ('format', 'Ligne mal formée'), ('inattendue', 'Erreur inattendue')], default='inattendue', help_text='Cause du rejet', max_length=20),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0011_decesimporterror_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_deces_dep',
+            field=models.CharField(blank=True, max_length=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_deces_libelle',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_deces_reg',
+            field=models.CharField(blank=True, max_length=2, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_naissance_dep',
+            field=models.CharField(blank=True, max_length=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_naissance_libelle',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='lieu_naissance_reg',
+            field=models.CharField(blank=True, max_length=2, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_naissance_libelle'], name='deces_deces_lieu_na_f29029_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_naissance_dep'], name='deces_deces_lieu_na_cdaec5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_naissance_reg'], name='deces_deces_lieu_na_24b74f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_deces_libelle'], name='deces_deces_lieu_de_c4eae2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_deces_dep'], name='deces_deces_lieu_de_4be9c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_deces_reg'], name='deces_deces_lieu_de_9824ce_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0012_deces_lieux_denormalises'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NomPartitionSummary',
+            fields=[
+                ('nom', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('annee_min', models.IntegerField(help_text='Année du premier décès portant ce nom')),
+                ('annee_max', models.IntegerField(help_text='Année du dernier décès portant ce nom')),
+                ('total', models.IntegerField(help_text='Nombre de décès portant ce nom')),
+            ],
+            options={
+                'verbose_name': 'Résumé par nom',
+                'verbose_name_plural': 'Résumés par nom',
+            },
+        ),
+    ]
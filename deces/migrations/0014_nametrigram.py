@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+def create_pg_trgm_indexes(apps, schema_editor):
+    # Sur PostgreSQL, LIKE '%...%' est indexé directement par pg_trgm
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS deces_nom_trgm ON deces_deces USING gin (nom gin_trgm_ops)')
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS deces_prenoms_trgm ON deces_deces USING gin (prenoms gin_trgm_ops)')
+
+
+def drop_pg_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS deces_nom_trgm')
+        schema_editor.execute('DROP INDEX IF EXISTS deces_prenoms_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0013_nompartitionsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(help_text='Champ de Deces indexé (nom ou prenoms)', max_length=10)),
+                ('trigram', models.CharField(max_length=3)),
+                ('value', models.CharField(help_text='Valeur distincte du champ contenant le trigramme', max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Trigramme de nom',
+                'verbose_name_plural': 'Trigrammes de noms',
+                'unique_together': {('field', 'trigram', 'value')},
+            },
+        ),
+        migrations.RunPython(create_pg_trgm_indexes, drop_pg_trgm_indexes),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0014_nametrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deces',
+            name='nom_normalise',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='nom_phonetique',
+            field=models.CharField(blank=True, max_length=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='prenom_normalise',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='deces',
+            name='prenom_phonetique',
+            field=models.CharField(blank=True, max_length=8, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['nom_normalise', 'prenom_normalise'], name='deces_deces_nom_nor_34fcc5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['nom_phonetique', 'prenom_phonetique'], name='deces_deces_nom_pho_a5bcf2_idx'),
+        ),
+    ]
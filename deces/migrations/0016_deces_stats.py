@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0015_deces_name_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DecesStatPending',
+            fields=[
+                ('mois', models.DateField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'verbose_name': 'Mois de statistiques à recalculer',
+                'verbose_name_plural': 'Mois de statistiques à recalculer',
+            },
+        ),
+        migrations.CreateModel(
+            name='DecesStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois de décès')),
+                ('dep', models.CharField(blank=True, help_text="Département de décès (vide pour un décès à l'étranger)", max_length=3, null=True)),
+                ('sexe', models.CharField(max_length=1)),
+                ('tranche_age', models.SmallIntegerField(blank=True, help_text="Borne inférieure de la tranche d'âge au décès (vide si la date de naissance est inconnue)", null=True)),
+                ('total', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Statistique de décès',
+                'verbose_name_plural': 'Statistiques de décès',
+                'indexes': [models.Index(fields=['mois'], name='deces_deces_mois_491fef_idx'), models.Index(fields=['dep', 'mois'], name='deces_deces_dep_59c81a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0018_linkage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deces',
+            name='empreinte',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='records_inserted',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='records_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importchunk',
+            name='records_updated',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importhistory',
+            name='records_inserted',
+            field=models.IntegerField(default=0, help_text='Lignes absentes de la base, insérées'),
+        ),
+        migrations.AddField(
+            model_name='importhistory',
+            name='records_unchanged',
+            field=models.IntegerField(default=0, help_text="Lignes déjà présentes à l'identique, non réécrites"),
+        ),
+        migrations.AddField(
+            model_name='importhistory',
+            name='records_updated',
+            field=models.IntegerField(default=0, help_text='Lignes existantes modifiées (empreinte différente)'),
+        ),
+    ]
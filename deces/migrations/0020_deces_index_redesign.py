@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0019_row_fingerprints'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_nom_ef37bb_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_sexe_bb3a1c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_na_8ab466_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_date_de_eefd85_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_de_8a0327_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_na_ab4483_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_na_f29029_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_na_cdaec5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_na_24b74f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_de_c4eae2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_de_4be9c2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_lieu_de_9824ce_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deces',
+            name='deces_deces_nom_pho_a5bcf2_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='deces',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['nom', 'prenoms'], name='deces_deces_nom_7da3f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_naissance', 'date_naissance'], name='deces_deces_lieu_na_13fd9f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_deces', 'date_deces'], name='deces_deces_lieu_de_6e5e68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_naissance_dep', 'date_naissance'], name='deces_deces_lieu_na_00b29d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deces',
+            index=models.Index(fields=['lieu_deces_dep', 'date_deces'], name='deces_deces_lieu_de_8b1565_idx'),
+        ),
+    ]
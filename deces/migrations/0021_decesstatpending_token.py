@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:45
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deces', '0020_deces_index_redesign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='decesstatpending',
+            name='token',
+            field=models.UUIDField(default=uuid.uuid4, help_text='Renouvelé à chaque signalement du mois'),
+        ),
+    ]
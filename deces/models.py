@@ -1,7 +1,14 @@
+import uuid
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.urls import reverse
+from .geography import geography, resolve_lieux, LIBELLE_MAX_LENGTH
+from .phonetics import name_keys, PHONETIC_LENGTH
+from .search_cache import bump_data_version
+from . import progress
+from .fingerprints import row_fingerprint, FINGERPRINT_FIELDS
 
 class Deces(models.Model):
     # Define composite primary key from these three fields
@@ -22,61 +29,147 @@ class Deces(models.Model):
     date_deces = models.DateField()
     lieu_deces = models.CharField(max_length=5)
     acte_deces = models.CharField(max_length=10)
+
+    # Libellés et rattachements des lieux, dénormalisés pour le tri et les filtres de recherche
+    lieu_naissance_libelle = models.CharField(max_length=LIBELLE_MAX_LENGTH, null=True, blank=True)
+    lieu_naissance_dep = models.CharField(max_length=3, null=True, blank=True)
+    lieu_naissance_reg = models.CharField(max_length=2, null=True, blank=True)
+    lieu_deces_libelle = models.CharField(max_length=LIBELLE_MAX_LENGTH, null=True, blank=True)
+    lieu_deces_dep = models.CharField(max_length=3, null=True, blank=True)
+    lieu_deces_reg = models.CharField(max_length=2, null=True, blank=True)
+
+    # Nom et premier prénom sans accents ni séparateurs, et leurs clés phonétiques
+    nom_normalise = models.CharField(max_length=100, null=True, blank=True)
+    nom_phonetique = models.CharField(max_length=PHONETIC_LENGTH, null=True, blank=True)
+    prenom_normalise = models.CharField(max_length=100, null=True, blank=True)
+    prenom_phonetique = models.CharField(max_length=PHONETIC_LENGTH, null=True, blank=True)
+
+    # Empreinte des champs du fichier INSEE, pour n'écrire que les lignes nouvelles ou modifiées
+    empreinte = models.BigIntegerField(null=True, blank=True)
     
     @property
     def lieu_naissance_detail(self):
         if not self.lieu_naissance:
             return None
-
-        # Si le code commence par 99, c'est un pays
-        if self.lieu_naissance.startswith('99'):
-            try:
-                return Pays.objects.get(cog=self.lieu_naissance)
-            except Pays.DoesNotExist:
-                return self.lieu_naissance
-
-        # Sinon c'est une commune
-        try:
-            return Commune.objects.get(com=self.lieu_naissance)
-        except Commune.DoesNotExist:
-            return self.lieu_naissance
+        # Pays si le code commence par 99, sinon commune (référentiel en mémoire)
+        return geography.get_lieu(self.lieu_naissance) or self.lieu_naissance
 
     @property
     def lieu_deces_detail(self):
         if not self.lieu_deces:
             return None
-
-        # Si le code commence par 99, c'est un pays
-        if self.lieu_deces.startswith('99'):
-            try:
-                return Pays.objects.get(cog=self.lieu_deces)
-            except Pays.DoesNotExist:
-                return self.lieu_deces
-
-        # Sinon c'est une commune
-        try:
-            return Commune.objects.get(com=self.lieu_deces)
-        except Commune.DoesNotExist:
-            return self.lieu_deces
+        # Pays si le code commence par 99, sinon commune (référentiel en mémoire)
+        return geography.get_lieu(self.lieu_deces) or self.lieu_deces
 
     class Meta:
         verbose_name = 'Décès'
         verbose_name_plural = 'Décès'
-        unique_together = ['nom', 'prenoms', 'date_naissance', 'sexe', 'date_deces', 'lieu_deces', 'acte_deces']
+        # Un index par chemin de recherche (voir la commande explain_query_log) : chacun
+        # est maintenu à chaque lot inséré par l'import. La clé primaire (date_deces,
+        # lieu_deces, acte_deces) assure l'unicité et sert les filtres sur date_deces
+        # seule. Les colonnes peu sélectives (sexe, régions) et les tris n'ont pas
+        # d'index : ils s'appliquent aux lignes trouvées par un autre critère.
         indexes = [
-            models.Index(fields=['nom']),
+            # Nom exact, seul ou avec les prénoms ou des bornes de date de naissance
+            models.Index(fields=['nom', 'prenoms']),
+            # Prénoms seuls (recherche par sous-chaîne, critère par défaut du formulaire)
             models.Index(fields=['prenoms']),
-            models.Index(fields=['sexe']),
+            # Bornes de date de naissance seules
             models.Index(fields=['date_naissance']),
-            models.Index(fields=['lieu_naissance']),
-            models.Index(fields=['lieu_naissance_nom']),
-            models.Index(fields=['date_deces']),
-            models.Index(fields=['lieu_deces'])
+            # Commune ou pays de naissance, avec ou sans bornes de date de naissance
+            models.Index(fields=['lieu_naissance', 'date_naissance']),
+            # Commune ou pays de décès, avec ou sans bornes de date de décès
+            models.Index(fields=['lieu_deces', 'date_deces']),
+            # Département de naissance ou de décès (une centaine de valeurs), avec les bornes de date
+            models.Index(fields=['lieu_naissance_dep', 'date_naissance']),
+            models.Index(fields=['lieu_deces_dep', 'date_deces']),
+            # Mode « sans accents » du nom et du premier prénom
+            models.Index(fields=['nom_normalise', 'prenom_normalise']),
+            # Mode « phonétique » du nom et clé de blocage du rapprochement par lots (deces.linkage)
+            models.Index(fields=['nom_phonetique', 'date_naissance'])
         ]
 
+    def save(self, *args, **kwargs):
+        # Tenir à jour les libellés et rattachements dénormalisés
+        for field, value in resolve_lieux(self.lieu_naissance, self.lieu_naissance_nom, self.lieu_deces).items():
+            setattr(self, field, value)
+        for field, value in name_keys(self.nom, self.prenoms).items():
+            setattr(self, field, value)
+        self.empreinte = row_fingerprint({field: getattr(self, field) for field in FINGERPRINT_FIELDS})
+        super().save(*args, **kwargs)
+        # Le résumé par nom ne reflète plus la table (import local : partitions dépend des modèles)
+        from .partitions import invalidate_summary
+        invalidate_summary()
+        # Index de recherche par sous-chaîne (import local : ngrams dépend des modèles)
+        from .ngrams import NGRAM_FIELDS, index_values, uses_database_trigrams
+        if not uses_database_trigrams():
+            for field in NGRAM_FIELDS:
+                index_values(field, {getattr(self, field)})
+
+    def delete(self, *args, **kwargs):
+        from .partitions import invalidate_summary
+        invalidate_summary()
+        return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nom} {self.prenoms} ({self.date_naissance} - {self.date_deces})"
 
+class NomPartitionSummary(models.Model):
+    """Années de décès extrêmes par nom, pour borner date_deces et élaguer les partitions."""
+    nom = models.CharField(max_length=100, primary_key=True)
+    annee_min = models.IntegerField(help_text='Année du premier décès portant ce nom')
+    annee_max = models.IntegerField(help_text='Année du dernier décès portant ce nom')
+    total = models.IntegerField(help_text='Nombre de décès portant ce nom')
+
+    class Meta:
+        verbose_name = 'Résumé par nom'
+        verbose_name_plural = 'Résumés par nom'
+
+    def __str__(self):
+        return f'{self.nom} ({self.annee_min}-{self.annee_max})'
+
+class NameTrigram(models.Model):
+    """Index de trigrammes des valeurs distinctes de nom et prenoms, pour la recherche par sous-chaîne."""
+    field = models.CharField(max_length=10, help_text='Champ de Deces indexé (nom ou prenoms)')
+    trigram = models.CharField(max_length=3)
+    value = models.CharField(max_length=200, help_text='Valeur distincte du champ contenant le trigramme')
+
+    class Meta:
+        verbose_name = 'Trigramme de nom'
+        verbose_name_plural = 'Trigrammes de noms'
+        unique_together = ['field', 'trigram', 'value']
+
+    def __str__(self):
+        return f'{self.field}:{self.trigram} → {self.value}'
+
+class DecesStat(models.Model):
+    """Nombre de décès par mois, département de décès, sexe et tranche d'âge (table d'agrégats)."""
+    mois = models.DateField(help_text='Premier jour du mois de décès')
+    dep = models.CharField(max_length=3, null=True, blank=True, help_text='Département de décès (vide pour un décès à l\'étranger)')
+    sexe = models.CharField(max_length=1)
+    tranche_age = models.SmallIntegerField(null=True, blank=True, help_text='Borne inférieure de la tranche d\'âge au décès (vide si la date de naissance est inconnue)')
+    total = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Statistique de décès'
+        verbose_name_plural = 'Statistiques de décès'
+        indexes = [
+            models.Index(fields=['mois']),
+            models.Index(fields=['dep', 'mois']),
+        ]
+
+    def __str__(self):
+        return f'{self.mois:%Y-%m} {self.dep} {self.sexe} {self.tranche_age} : {self.total}'
+
+class DecesStatPending(models.Model):
+    """Mois de décès modifiés par un import dont les agrégats restent à recalculer."""
+    mois = models.DateField(primary_key=True)
+    token = models.UUIDField(default=uuid.uuid4, help_text='Renouvelé à chaque signalement du mois')
+
+    class Meta:
+        verbose_name = 'Mois de statistiques à recalculer'
+        verbose_name_plural = 'Mois de statistiques à recalculer'
+
 class Pays(models.Model):
     # Clé primaire
     cog = models.CharField(max_length=5, primary_key=True, help_text='Code du pays ou territoire')
@@ -220,14 +313,22 @@ class ImportHistory(models.Model):
         ('completed', 'Terminé'),
         ('failed', 'Échec')
     ]
+    ENGINE_CHOICES = [
+        ('orm', 'ORM (bulk_create)'),
+        ('bulk', 'Chargement natif (LOAD DATA / COPY)')
+    ]
 
     zip_url = models.URLField(max_length=500)
     zip_filename = models.CharField(max_length=255, default='unknown.zip')
     csv_filename = models.CharField(max_length=255)
     md5_hash = models.CharField(max_length=32, help_text='MD5 hash du fichier CSV')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    engine = models.CharField(max_length=10, choices=ENGINE_CHOICES, default='orm', help_text='Moteur de chargement utilisé')
     records_processed = models.IntegerField(default=0)
     total_records = models.IntegerField(default=0)
+    records_inserted = models.IntegerField(default=0, help_text='Lignes absentes de la base, insérées')
+    records_updated = models.IntegerField(default=0, help_text='Lignes existantes modifiées (empreinte différente)')
+    records_unchanged = models.IntegerField(default=0, help_text='Lignes déjà présentes à l\'identique, non réécrites')
     error_message = models.TextField(blank=True)
     started_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
@@ -246,19 +347,77 @@ class ImportHistory(models.Model):
         """Retourne le nombre d'erreurs non résolues pour cet import"""
         return self.decesimporterror_set.filter(resolved=False).count()
 
-    def update_status(self, status, error_message=None):
+    def update_status(self, status, error_message=None, fields=()):
+        """Enregistre le statut (et les champs supplémentaires fields) et le publie aux navigateurs abonnés."""
         self.status = status
         if error_message:
             self.error_message = error_message
         if status in ['completed', 'failed']:
             self.completed_at = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'error_message', 'completed_at', *fields])
+        if status in ['completed', 'failed']:
+            # Nouvelles données, y compris les blocs validés d'un import en échec :
+            # les pages de résultats en cache sont périmées
+            bump_data_version()
+        self.publish_progress(pending_errors=self.pending_errors if status == 'completed' else None)
+
+    def publish_progress(self, **extra):
+        """Publie l'état enregistré de l'import (statut et compteurs), qui remplace la progression en direct."""
+        progress.publish(
+            self.pk, status=self.status, total_records=self.total_records,
+            **{field: getattr(self, field) for field in progress.COUNTERS}, **extra
+        )
+
+class ImportChunk(models.Model):
+    """Tranche d'un fichier CSV (plage d'octets alignée sur les lignes) importée par un worker."""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processing', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échec')
+    ]
+
+    import_history = models.ForeignKey(ImportHistory, on_delete=models.CASCADE)
+    start_offset = models.BigIntegerField(help_text='Position de début de la tranche dans le CSV (octets)')
+    end_offset = models.BigIntegerField(help_text='Position de fin de la tranche dans le CSV (octets)')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    committed_offset = models.BigIntegerField(null=True, blank=True, help_text='Position dans le CSV du dernier bloc validé (point de contrôle)')
+    batch_count = models.IntegerField(default=0, help_text='Nombre de lots insérés')
+    records_read = models.IntegerField(default=0)
+    records_processed = models.IntegerField(default=0)
+    records_inserted = models.IntegerField(default=0)
+    records_updated = models.IntegerField(default=0)
+    records_unchanged = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Tranche d\'import'
+        verbose_name_plural = 'Tranches d\'import'
+        ordering = ['import_history', 'start_offset']
+        indexes = [
+            models.Index(fields=['import_history', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.import_history.csv_filename} [{self.start_offset}-{self.end_offset}] ({self.status})"
 
 class DecesImportError(models.Model):
+    REASON_CHOICES = [
+        ('nomprenom', 'Nom/prénoms invalides'),
+        ('date_naissance', 'Date de naissance invalide'),
+        ('date_deces', 'Date de décès invalide'),
+        ('champs_obligatoires', 'Champs obligatoires manquants'),
+        ('format', 'Ligne mal formée'),
+        ('inattendue', 'Erreur inattendue'),
+    ]
+
     # Données brutes de la ligne en erreur
     import_history = models.ForeignKey(ImportHistory, on_delete=models.CASCADE)
+    import_chunk = models.ForeignKey(ImportChunk, on_delete=models.SET_NULL, null=True, blank=True)
     raw_data = models.JSONField(help_text='Données brutes de la ligne en erreur')
     error_message = models.TextField(help_text='Message d\'erreur lors de l\'import')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default='inattendue', help_text='Cause du rejet')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     resolved = models.BooleanField(default=False)
@@ -329,10 +488,79 @@ class DecesImportError(models.Model):
                 deces = Deces(**data)
                 deces.full_clean()
                 deces.save()
-            
+
+            # Statistiques du mois de décès, recalculées par une tâche Celery
+            # (imports locaux : stats et tasks dépendent des modèles)
+            from .stats import mark_months
+            from .tasks import refresh_pending_statistics
+            mark_months([self.date_deces])
+
             self.mark_as_resolved()
+            bump_data_version()
+            refresh_pending_statistics.delay()
             return True, None
         except ValidationError as e:
             return False, str(e)
         except Exception as e:
             return False, f"Erreur inattendue: {str(e)}"
+
+class SearchExport(models.Model):
+    """Export différé des résultats d'une recherche, écrit dans un fichier par une tâche Celery."""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processing', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échec')
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('parquet', 'Parquet')
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    query = models.TextField(help_text='Paramètres de la recherche (chaîne de requête)')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    compress = models.BooleanField(default=False, help_text='Compression gzip (CSV)')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_written = models.IntegerField(default=0)
+    total_rows = models.IntegerField(null=True, blank=True)
+    file_path = models.CharField(max_length=500, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Export de recherche'
+        verbose_name_plural = 'Exports de recherche'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export {self.pk} ({self.format}, {self.status})"
+
+class LinkageJob(models.Model):
+    """Rapprochement différé d'un fichier d'identités avec les décès."""
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processing', 'En cours'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échec')
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    input_path = models.CharField(max_length=500)
+    output_path = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    identities_processed = models.IntegerField(default=0)
+    identities_matched = models.IntegerField(default=0)
+    identities_per_second = models.FloatField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Rapprochement par lots'
+        verbose_name_plural = 'Rapprochements par lots'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Rapprochement {self.pk} ({self.status})"
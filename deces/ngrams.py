@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from .models import NameTrigram
+
+# Champs de Deces couverts par l'index de trigrammes
+NGRAM_FIELDS = ('nom', 'prenoms')
+# Présent dans le cache une fois l'index reconstruit sur toute la table (commande rebuild_ngram_index)
+INDEX_READY_CACHE_KEY = 'ngrams:index_ready'
+TRIGRAM_BATCH_SIZE = 10000
+
+
+def trigrams(value):
+    """Trigrammes d'une valeur : tous ses sous-mots de 3 caractères."""
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def trigram_rows(field, values):
+    """Lignes NameTrigram à créer pour un ensemble de valeurs d'un champ."""
+    return [
+        NameTrigram(field=field, trigram=trigram, value=value)
+        for value in values if value
+        for trigram in trigrams(value)
+    ]
+
+
+def index_values(field, values):
+    """Ajoute des valeurs à l'index (les couples déjà présents sont ignorés)."""
+    NameTrigram.objects.bulk_create(trigram_rows(field, values), batch_size=TRIGRAM_BATCH_SIZE, ignore_conflicts=True)
+
+
+def uses_database_trigrams():
+    """PostgreSQL indexe directement LIKE '%...%' avec pg_trgm (migration 0014)."""
+    return connection.vendor == 'postgresql'
+
+
+def index_ready():
+    return cache.get(INDEX_READY_CACHE_KEY) is not None
+
+
+def matching_values(field, substring):
+    """Sous-requête des valeurs distinctes d'un champ qui contiennent la sous-chaîne.
+
+    Les valeurs candidates sont celles qui possèdent tous les trigrammes de
+    la sous-chaîne (index (field, trigram)) ; la sous-chaîne est ensuite
+    vérifiée sur ces seules valeurs.
+    """
+    grams = trigrams(substring)
+    return (
+        NameTrigram.objects.filter(field=field, trigram__in=grams, value__contains=substring)
+        .values('value')
+        .annotate(matched=Count('trigram', distinct=True))
+        .filter(matched=len(grams))
+        .values('value')
+    )
+
+
+def contains_filter(field, substring):
+    """Filtre « field contient substring » sur Deces, appuyé sur un index quand c'est possible.
+
+    Sur MariaDB/MySQL/SQLite, la recherche passe par l'index de trigrammes
+    puis par l'index B-tree du champ (IN sur les valeurs trouvées). Les
+    sous-chaînes de moins de 3 caractères et un index pas encore construit
+    retombent sur LIKE '%...%'.
+    """
+    if uses_database_trigrams() or len(substring) < 3 or not index_ready():
+        return Q(**{f'{field}__contains': substring})
+    return Q(**{f'{field}__in': matching_values(field, substring)})
@@ -0,0 +1,150 @@
+from datetime import date
+from django.core import signing
+from django.db.models import F, Q
+
+# Colonnes de la clé primaire composite, utilisées pour départager les lignes de même valeur de tri
+KEY_FIELDS = ('date_deces', 'lieu_deces', 'acte_deces')
+DATE_FIELDS = ('date_naissance', 'date_deces')
+# Au-delà, le nombre de résultats est affiché comme « plus de COUNT_CAP »
+COUNT_CAP = 10000
+CURSOR_SALT = 'deces.pagination'
+
+
+class KeysetPage:
+    """Page de résultats obtenue par pagination par clé (seek), sans OFFSET.
+
+    Les curseurs sont des jetons signés contenant la clé de tri de la
+    première ou de la dernière ligne de la page, à passer dans l'URL.
+    """
+
+    def __init__(self, object_list, number, has_next, has_previous, next_cursor, previous_cursor, count, count_capped, queryset=None):
+        self.object_list = object_list
+        self.queryset = queryset
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_capped = count_capped
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def sort_keys(order_field):
+    """Retourne les colonnes de tri : la colonne demandée puis la clé primaire."""
+    return [order_field] + [field for field in KEY_FIELDS if field != order_field]
+
+
+def ordering(fields, descending):
+    """Ordre SQL des colonnes de tri, NULL en tête en croissant et en queue en décroissant."""
+    if descending:
+        return [F(field).desc(nulls_last=True) for field in fields]
+    return [F(field).asc(nulls_first=True) for field in fields]
+
+
+def seek_filter(keys, descending):
+    """Condition « strictement après » la clé donnée dans l'ordre de tri.
+
+    keys est une liste de (colonne, valeur) ; une valeur None correspond au
+    groupe des NULL, placé en tête en croissant et en queue en décroissant.
+    """
+    clauses = []
+    equal = Q()
+    for field, value in keys:
+        if value is None:
+            if not descending:
+                clauses.append(equal & Q(**{f'{field}__isnull': False}))
+            equal &= Q(**{f'{field}__isnull': True})
+        else:
+            after = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+            if descending:
+                after |= Q(**{f'{field}__isnull': True})
+            clauses.append(equal & after)
+            equal &= Q(**{field: value})
+    condition = Q()
+    for clause in clauses:
+        condition |= clause
+    return condition
+
+
+def encode_cursor(row, fields, descending, number, direction):
+    values = []
+    for field in fields:
+        value = getattr(row, field)
+        values.append(value.isoformat() if isinstance(value, date) else value)
+    return signing.dumps(
+        {'o': fields[0], 'desc': descending, 'v': values, 'p': number, 'd': direction},
+        salt=CURSOR_SALT, compress=True
+    )
+
+
+def decode_cursor(cursor, fields, descending):
+    """Décode un curseur ; retourne None s'il est absent, altéré ou incompatible avec le tri."""
+    if not cursor:
+        return None
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        values = data['v']
+        if data['o'] != fields[0] or data['desc'] != descending or len(values) != len(fields):
+            return None
+        if data['d'] not in ('next', 'prev'):
+            return None
+        keys = [
+            (field, date.fromisoformat(value) if field in DATE_FIELDS and value is not None else value)
+            for field, value in zip(fields, values)
+        ]
+        return keys, int(data['p']), data['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def keyset_paginate(queryset, order_field, descending=False, cursor=None, per_page=20, count_cap=COUNT_CAP):
+    """Pagine un queryset de Deces par clé de tri plutôt que par OFFSET.
+
+    Le temps de réponse ne dépend pas du numéro de page ; le nombre total de
+    résultats est plafonné à count_cap.
+    """
+    fields = sort_keys(order_field)
+    decoded = decode_cursor(cursor, fields, descending)
+    number = 1
+    direction = 'next'
+    page_queryset = queryset.order_by(*ordering(fields, descending))
+
+    if decoded:
+        keys, number, direction = decoded
+        if direction == 'next':
+            page_queryset = page_queryset.filter(seek_filter(keys, descending))
+        else:
+            # Page précédente : parcourir l'ordre inverse puis remettre les lignes à l'endroit
+            page_queryset = queryset.order_by(*ordering(fields, not descending)).filter(seek_filter(keys, not descending))
+
+    page_queryset = page_queryset[:per_page + 1]
+    rows = list(page_queryset)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, decoded is not None
+    has_previous = has_previous and number > 1
+
+    # Comptage plafonné : SELECT COUNT(*) sur une sous-requête limitée
+    count = queryset.order_by()[:count_cap + 1].count()
+
+    return KeysetPage(
+        rows,
+        number,
+        has_next,
+        has_previous,
+        encode_cursor(rows[-1], fields, descending, number + 1, 'next') if has_next and rows else None,
+        encode_cursor(rows[0], fields, descending, number - 1, 'prev') if has_previous and rows else None,
+        min(count, count_cap),
+        count > count_cap,
+        page_queryset,
+    )
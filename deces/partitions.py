@@ -0,0 +1,202 @@
+from datetime import date
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import ExtractYear
+from .models import Deces, ImportChunk, NomPartitionSummary
+
+# Âge maximal retenu pour borner la date de décès à partir de la date de naissance
+MAX_AGE_YEARS = 125
+# Présent dans le cache tant que le résumé par nom reflète la table des décès
+SUMMARY_VALID_CACHE_KEY = 'partitions:summary_valid'
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def invalidate_summary():
+    """Désactive l'utilisation du résumé par nom (import en cours ou terminé, décès modifié)."""
+    cache.delete(SUMMARY_VALID_CACHE_KEY)
+
+
+def imports_running():
+    """Indique si des tranches d'import sont en attente ou en cours (le résumé serait aussitôt périmé)."""
+    return ImportChunk.objects.filter(status__in=['pending', 'processing']).exists()
+
+
+def rebuild_summary():
+    """Reconstruit le résumé des années de décès par nom (INSERT ... SELECT ... GROUP BY).
+
+    Le résumé n'est réactivé que si aucune tranche d'import n'est en attente
+    ou en cours : la clôture du dernier import le reconstruira.
+    """
+    invalidate_summary()
+    summary = (
+        Deces.objects.filter(nom__isnull=False)
+        .order_by()
+        .values('nom')
+        .annotate(annee_min=Min(ExtractYear('date_deces')), annee_max=Max(ExtractYear('date_deces')), total=Count('*'))
+        .values_list('nom', 'annee_min', 'annee_max', 'total')
+    )
+    sql, params = summary.query.sql_with_params()
+    table = NomPartitionSummary._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(f'INSERT INTO {table} (nom, annee_min, annee_max, total) {sql}', params)
+    if not imports_running():
+        cache.set(SUMMARY_VALID_CACHE_KEY, True, None)
+    return NomPartitionSummary.objects.count()
+
+
+def implicit_bounds(nom=None, date_naissance_debut=None, date_naissance_fin=None):
+    """Déduit des bornes de date de décès à partir des autres critères de recherche.
+
+    - un décès n'est pas antérieur à la naissance : date_deces >= date_naissance_debut ;
+    - personne ne vit plus de MAX_AGE_YEARS ans : date_deces < date_naissance_fin + MAX_AGE_YEARS ;
+    - pour un nom exact, le résumé par nom donne les années de décès extrêmes ;
+      un nom absent du résumé n'apporte aucune borne (le résumé peut être en
+      retard sur la table).
+
+    Returns:
+        (borne inférieure, borne supérieure exclue, liste des justifications) ;
+        une borne inférieure égale à la borne supérieure signifie « aucun résultat ».
+    """
+    lower = upper = None
+    reasons = []
+    naissance_debut = parse_date(date_naissance_debut)
+    naissance_fin = parse_date(date_naissance_fin)
+
+    if naissance_debut:
+        lower = naissance_debut
+        reasons.append(f'date de naissance ≥ {naissance_debut} ⇒ date de décès ≥ {naissance_debut}')
+    if naissance_fin:
+        upper = date(min(naissance_fin.year + MAX_AGE_YEARS + 1, 9999), 1, 1)
+        reasons.append(f'date de naissance ≤ {naissance_fin} ⇒ date de décès < {upper} (âge maximal {MAX_AGE_YEARS} ans)')
+
+    if nom and cache.get(SUMMARY_VALID_CACHE_KEY):
+        summary = NomPartitionSummary.objects.filter(nom=nom).first()
+        if summary is None:
+            reasons.append(f'nom {nom} absent du résumé par partition ⇒ pas de borne déduite du nom')
+            return lower, upper, reasons
+        summary_lower = date(summary.annee_min, 1, 1)
+        summary_upper = date(min(summary.annee_max + 1, 9999), 1, 1)
+        lower = max(lower, summary_lower) if lower else summary_lower
+        upper = min(upper, summary_upper) if upper else summary_upper
+        reasons.append(f'nom {nom} présent de {summary.annee_min} à {summary.annee_max} ({summary.total} décès)')
+
+    return lower, upper, reasons
+
+
+def prune_partitions(queryset, nom=None, date_naissance_debut=None, date_naissance_fin=None):
+    """Ajoute au queryset des bornes sur date_deces pour permettre l'élagage des partitions.
+
+    Les bornes n'écartent que des décès qui ne peuvent pas correspondre aux
+    critères (pour des données cohérentes) : le résultat est inchangé.
+    """
+    lower, upper, reasons = implicit_bounds(nom, date_naissance_debut, date_naissance_fin)
+    if lower and upper and lower >= upper:
+        return queryset.none(), reasons
+    if lower:
+        queryset = queryset.filter(date_deces__gte=lower)
+    if upper:
+        queryset = queryset.filter(date_deces__lt=upper)
+    return queryset, reasons
+
+
+def explain_partitions(queryset):
+    """Retourne le plan d'exécution de la requête, avec les partitions parcourues sur MariaDB/MySQL."""
+    if connection.vendor != 'mysql':
+        return queryset.explain()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        # EXPLAIN PARTITIONS sur MariaDB, la colonne partitions est toujours présente sur MySQL 8
+        keyword = 'EXPLAIN PARTITIONS' if connection.mysql_is_mariadb else 'EXPLAIN'
+        cursor.execute(f'{keyword} {sql}', params)
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+    return '\n'.join(
+        ', '.join(f'{column}={value}' for column, value in zip(columns, row))
+        for row in rows
+    )
+
+
+# Maintenance des partitions (MariaDB/MySQL)
+
+DECES_TABLE = Deces._meta.db_table
+FUTURE_PARTITION = 'p_future'
+# Nombre d'années à l'avance pour lesquelles une partition doit exister
+PARTITION_YEARS_AHEAD = 1
+
+
+def list_partitions():
+    """Retourne les partitions de deces_deces avec leur nombre de lignes et leur taille.
+
+    Les nombres de lignes d'information_schema sont des estimations du moteur.
+    Retourne une liste vide si la table n'est pas partitionnée.
+    """
+    if connection.vendor != 'mysql':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH '
+            'FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+            'ORDER BY PARTITION_ORDINAL_POSITION',
+            [DECES_TABLE]
+        )
+        return [
+            {
+                'name': name,
+                'less_than': description,
+                'rows': rows or 0,
+                'data_length': data_length or 0,
+                'index_length': index_length or 0,
+            }
+            for name, description, rows, data_length, index_length in cursor.fetchall()
+        ]
+
+
+def missing_partition_years(partitions, through_year):
+    """Années sans partition dédiée jusqu'à through_year inclus (actuellement dans p_future)."""
+    bounds = [int(p['less_than']) for p in partitions if p['less_than'].isdigit()]
+    if not bounds:
+        return []
+    # La dernière partition annuelle contient les années < max(bounds)
+    return list(range(max(bounds), through_year + 1))
+
+
+def split_future_sql(years):
+    """Requête qui découpe p_future en une partition par année, suivie d'une nouvelle p_future."""
+    definitions = [f'PARTITION p{year} VALUES LESS THAN ({year + 1})' for year in years]
+    definitions.append(f'PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE')
+    return f'ALTER TABLE {DECES_TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({", ".join(definitions)})'
+
+
+def ensure_partitions(through_year=None, dry_run=False):
+    """Crée les partitions annuelles manquantes jusqu'à through_year en découpant p_future.
+
+    Par défaut, les partitions sont créées jusqu'à l'année courante plus
+    PARTITION_YEARS_AHEAD. Les lignes déjà présentes dans p_future sont
+    redistribuées par REORGANIZE PARTITION.
+
+    Returns:
+        (liste des partitions avant maintenance, requête exécutée ou prévue, ou None)
+    """
+    partitions = list_partitions()
+    if not any(p['name'] == FUTURE_PARTITION for p in partitions):
+        # Table non partitionnée (SQLite, PostgreSQL, MySQL sans la migration 0002)
+        return partitions, None
+    if through_year is None:
+        through_year = date.today().year + PARTITION_YEARS_AHEAD
+    years = missing_partition_years(partitions, through_year)
+    if not years:
+        return partitions, None
+    sql = split_future_sql(years)
+    if not dry_run:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    return partitions, sql
@@ -0,0 +1,102 @@
+import re
+import unicodedata
+import pandas as pd
+
+# Longueur maximale des clés phonétiques
+PHONETIC_LENGTH = 8
+
+# Règles de la clé phonétique, appliquées dans l'ordre sur la forme normalisée
+# (majuscules sans accents ni séparateurs). Inspirées de Soundex/Phonex pour
+# le français : graphies équivalentes unifiées, lettres finales muettes et
+# voyelles (hors initiale) supprimées, lettres doublées réduites.
+PHONETIC_RULES = [
+    (r'PH', 'F'),
+    (r'GU(?=[EI])', 'G'),
+    (r'QU?', 'K'),
+    (r'C(?=[EIY])', 'S'),
+    (r'C(?!H)', 'K'),
+    (r'(?<!C)H', ''),
+    (r'EAU|AU', 'O'),
+    (r'AI|EI', 'E'),
+    (r'Y', 'I'),
+    (r'W', 'V'),
+    (r'Z', 'S'),
+    (r'BV', 'V'),
+    (r'GN', 'N'),
+    (r'(?<=.)[TDSX]+$', ''),
+    (r'(?<=.)E+$', ''),
+    (r'(?<=.)[AEIOU]', ''),
+    (r'(.)\1+', r'\1'),
+]
+_COMPILED_RULES = [(re.compile(pattern), replacement) for pattern, replacement in PHONETIC_RULES]
+_NON_LETTERS = re.compile(r'[^A-Z]')
+
+
+def normalize(value):
+    """Forme normalisée d'un nom : majuscules sans accents, sans espaces, tirets ni apostrophes."""
+    if not value:
+        return None
+    folded = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii').upper()
+    return _NON_LETTERS.sub('', folded) or None
+
+
+def _apply_rules(key):
+    for pattern, replacement in _COMPILED_RULES:
+        key = pattern.sub(replacement, key)
+    return key[:PHONETIC_LENGTH] or None
+
+
+def phonetic(value):
+    """Clé phonétique d'un nom (LEFEVRE, LEFÈVRE et LEFEBVRE donnent LFVR)."""
+    key = normalize(value)
+    if not key:
+        return None
+    return _apply_rules(key)
+
+
+def first_prenom(prenoms):
+    return prenoms.split()[0] if prenoms and prenoms.split() else None
+
+
+def name_keys(nom, prenoms):
+    """Formes normalisées et clés phonétiques du nom et du premier prénom."""
+    prenom = first_prenom(prenoms)
+    return {
+        'nom_normalise': normalize(nom),
+        'nom_phonetique': phonetic(nom),
+        'prenom_normalise': normalize(prenom),
+        'prenom_phonetique': phonetic(prenom),
+    }
+
+
+def normalize_series(values):
+    """Version vectorisée de normalize pour une série pandas."""
+    folded = (
+        values.astype(object).where(values.notna(), '')
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.upper().str.replace(_NON_LETTERS.pattern, '', regex=True)
+    ).astype(object)
+    return folded.where(folded != '', None)
+
+
+def phonetic_series(values):
+    """Version vectorisée de phonetic pour une série pandas."""
+    keys = normalize_series(values)
+    # Les règles utilisent des assertions et des références arrière que le moteur
+    # d'expressions régulières de pyarrow (chaînes par défaut de pandas 3) ne gère
+    # pas : elles sont appliquées avec re, une fois par valeur distincte
+    rules = {key: _apply_rules(key) for key in keys.dropna().unique()}
+    phonetic_keys = keys.map(rules).astype(object)
+    return phonetic_keys.where(phonetic_keys.notna(), None)
+
+
+def name_keys_frame(nom, prenoms):
+    """Version vectorisée de name_keys pour des séries de noms et de prénoms."""
+    prenom = prenoms.astype(object).where(prenoms.notna(), '').str.split().str[0]
+    keys = pd.DataFrame({
+        'nom_normalise': normalize_series(nom),
+        'nom_phonetique': phonetic_series(nom),
+        'prenom_normalise': normalize_series(prenom),
+        'prenom_phonetique': phonetic_series(prenom),
+    }, index=nom.index).astype(object)
+    return keys.where(keys.notna(), None)
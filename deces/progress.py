@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Canal pub/sub des événements de progression de tous les imports
+CHANNEL = 'imports:progress'
+KEY_PREFIX = 'imports:progress'
+# Compteurs incrémentés par les workers à chaque bloc validé
+COUNTERS = ('records_processed', 'records_inserted', 'records_updated', 'records_unchanged')
+# L'état d'un import abandonné finit par disparaître de Redis
+SNAPSHOT_TTL = 24 * 3600
+REDIS_TIMEOUT = 0.5
+# Délai de reconnexion (ms) indiqué au navigateur
+RETRY_MS = 3000
+
+_client = None
+
+
+def redis_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.PROGRESS_REDIS_URL, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+        )
+    return _client
+
+
+def _key(import_id):
+    return f'{KEY_PREFIX}:{import_id}'
+
+
+def _event(import_id, values):
+    """Événement compact (mêmes clés que la réponse JSON de import_status) à partir du hash Redis."""
+    from .models import ImportHistory
+
+    values = {key.decode(): value.decode() for key, value in values.items()}
+    event = {'id': int(import_id), 'status': values.get('status', 'processing')}
+    event['status_display'] = dict(ImportHistory.STATUS_CHOICES).get(event['status'], event['status'])
+    for field in ('total_records', 'pending_errors', *COUNTERS):
+        if field in values:
+            event[field] = int(values[field])
+    return event
+
+
+def _publish(import_id, pipeline_steps):
+    key = _key(import_id)
+    try:
+        pipeline = redis_client().pipeline(transaction=True)
+        pipeline_steps(pipeline, key)
+        pipeline.expire(key, SNAPSHOT_TTL)
+        pipeline.hgetall(key)
+        values = pipeline.execute()[-1]
+        redis_client().publish(CHANNEL, json.dumps(_event(import_id, values)))
+    except redis.RedisError as e:
+        # La base reste la référence : seule la progression en direct est perdue
+        logger.warning(f'Progression de l\'import {import_id} non publiée : {str(e)}')
+
+
+def publish(import_id, **fields):
+    """Remplace l'état publié d'un import (statut, totaux) et le diffuse aux navigateurs abonnés."""
+    _publish(import_id, lambda pipeline, key: pipeline.hset(key, mapping={
+        field: value for field, value in fields.items() if value is not None
+    }))
+
+
+def advance(import_id, **increments):
+    """Ajoute la progression d'un bloc validé aux compteurs de l'import et la diffuse.
+
+    Les tranches d'un même import avancent en parallèle : HINCRBY évite le
+    verrou qu'imposerait la mise à jour de la ligne ImportHistory à chaque bloc.
+    """
+    def steps(pipeline, key):
+        for field, value in increments.items():
+            if value:
+                pipeline.hincrby(key, field, value)
+    _publish(import_id, steps)
+
+
+def snapshot(import_id):
+    """Dernier état publié d'un import, None si Redis ne le connaît pas (ou est indisponible)."""
+    try:
+        values = redis_client().hgetall(_key(import_id))
+    except redis.RedisError:
+        return None
+    return _event(import_id, values) if values else None
+
+
+def _format(event):
+    return f'event: progress\ndata: {json.dumps(event)}\n\n'
+
+
+async def stream(import_ids):
+    """Flux Server-Sent Events des progressions des imports demandés (tous si la liste est vide).
+
+    L'état courant de chaque import est envoyé à l'abonnement, puis chaque
+    événement publié par les workers. Un commentaire est envoyé toutes les
+    IMPORT_EVENTS_HEARTBEAT secondes pour garder la connexion ouverte ; le
+    flux se termine après IMPORT_EVENTS_MAX_DURATION secondes et le
+    navigateur se reconnecte.
+    """
+    client = aioredis.Redis.from_url(settings.PROGRESS_REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT)
+    pubsub = client.pubsub()
+    try:
+        # S'abonner avant de lire l'état courant : aucun événement n'est perdu entre les deux
+        await pubsub.subscribe(CHANNEL)
+        yield f'retry: {RETRY_MS}\n\n'
+        for import_id in import_ids:
+            values = await client.hgetall(_key(import_id))
+            if values:
+                yield _format(_event(import_id, values))
+
+        deadline = time.monotonic() + settings.IMPORT_EVENTS_MAX_DURATION
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=settings.IMPORT_EVENTS_HEARTBEAT)
+            if message is None:
+                yield ': ping\n\n'
+                continue
+            event = json.loads(message['data'])
+            if not import_ids or event['id'] in import_ids:
+                yield _format(event)
+    finally:
+        # Exécuté aussi quand le serveur ASGI annule le flux à la déconnexion du navigateur
+        await pubsub.aclose()
+        await client.aclose()
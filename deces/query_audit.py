@@ -0,0 +1,176 @@
+import json
+import re
+from urllib.parse import unquote_plus
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.http import QueryDict
+from .filters import ORDER_FIELDS, has_search_criteria, search_queryset
+from .pagination import COUNT_CAP, ordering, sort_keys
+
+# Taille de page de la recherche (voir keyset_paginate)
+PAGE_SIZE = 20
+SEARCH_PATH_PATTERN = re.compile(r'/search/\?(\S+)')
+SQL_PATTERN = re.compile(r'\b(SELECT\s.*)$', re.IGNORECASE)
+SQLITE_INDEX_PATTERN = re.compile(r'USING (?:COVERING )?INDEX (\S+)|USING (INTEGER )?PRIMARY KEY')
+
+
+def parse_log_line(line):
+    """Interprète une ligne du journal de requêtes.
+
+    Sont reconnues : les requêtes SQL (une par ligne, y compris dans un
+    journal général MariaDB), les URL de recherche (journal d'accès du
+    serveur web) et les chaînes de paramètres de recherche brutes.
+
+    Returns:
+        ('sql', requête) ou ('search', QueryDict), None pour une ligne ignorée
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    match = SQL_PATTERN.search(line)
+    if match:
+        return 'sql', match.group(1).rstrip(';')
+    match = SEARCH_PATH_PATTERN.search(line)
+    query_string = match.group(1) if match else line
+    params = QueryDict(query_string.split('#')[0].strip('"'))
+    if not has_search_criteria(params):
+        return None
+    return 'search', params
+
+
+def search_statements(params):
+    """Requêtes SQL exécutées par la recherche : première page triée et comptage plafonné.
+
+    Returns:
+        Liste de (libellé, SQL, paramètres)
+    """
+    queryset, _ = search_queryset(params)
+    order_field = ORDER_FIELDS.get(params.get('order_by'), 'nom')
+    descending = params.get('order_dir') == 'desc'
+    page = queryset.order_by(*ordering(sort_keys(order_field), descending))[:PAGE_SIZE + 1]
+    # Même forme que queryset[:COUNT_CAP + 1].count() : COUNT(*) sur une sous-requête limitée
+    count_sql, count_params = queryset.order_by().values_list('date_deces')[:COUNT_CAP + 1].query.sql_with_params()
+    return [
+        ('page', *page.query.sql_with_params()),
+        ('count', f'SELECT COUNT(*) FROM ({count_sql}) subquery', count_params),
+    ]
+
+
+def _explain_mysql(cursor, sql, params, analyze):
+    # ANALYZE exécute la requête et ajoute le nombre de lignes réellement lues (r_rows)
+    if analyze and connection.mysql_is_mariadb:
+        keyword = 'ANALYZE'
+    else:
+        keyword = 'EXPLAIN PARTITIONS' if connection.mysql_is_mariadb else 'EXPLAIN'
+    cursor.execute(f'{keyword} {sql}', params)
+    columns = [column[0] for column in cursor.description]
+    steps = []
+    for row in cursor.fetchall():
+        step = dict(zip(columns, row))
+        rows = step.get('r_rows') if step.get('r_rows') is not None else step.get('rows')
+        steps.append({
+            'table': step.get('table'),
+            'index': step.get('key'),
+            'access': step.get('type'),
+            'rows': int(float(rows)) if rows is not None else None,
+            'partitions': step.get('partitions'),
+            'detail': step.get('Extra') or '',
+        })
+    return steps
+
+
+def _postgresql_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _postgresql_nodes(child)
+
+
+def _explain_postgresql(cursor, sql, params, analyze):
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    steps = []
+    for node in _postgresql_nodes(plan[0]['Plan']):
+        if 'Relation Name' not in node:
+            continue
+        rows = node.get('Actual Rows', node.get('Plan Rows'))
+        steps.append({
+            'table': node['Relation Name'],
+            'index': node.get('Index Name'),
+            'access': node['Node Type'],
+            'rows': int(rows) if rows is not None else None,
+            'partitions': None,
+            'detail': node.get('Filter') or node.get('Index Cond') or '',
+        })
+    return steps
+
+
+def _explain_sqlite(cursor, sql, params, analyze):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    steps = []
+    for row in cursor.fetchall():
+        detail = row[-1]
+        if not detail.startswith(('SCAN', 'SEARCH')):
+            continue
+        match = SQLITE_INDEX_PATTERN.search(detail)
+        index = None
+        if match:
+            index = match.group(1) or 'PRIMARY'
+        steps.append({
+            'table': detail.split()[1],
+            'index': index,
+            'access': detail.split()[0],
+            # SQLite n'estime pas le nombre de lignes lues
+            'rows': None,
+            'partitions': None,
+            'detail': detail,
+        })
+    return steps
+
+
+def explain(sql, params=None, analyze=False):
+    """Plan d'exécution d'une requête : une étape par table lue, avec l'index utilisé et les lignes examinées.
+
+    Le nombre de lignes est l'estimation de l'optimiseur, ou le nombre réel
+    avec analyze (MariaDB et PostgreSQL, la requête est alors exécutée).
+    """
+    explainers = {'mysql': _explain_mysql, 'postgresql': _explain_postgresql, 'sqlite': _explain_sqlite}
+    if connection.vendor not in explainers:
+        raise NotImplementedError(f'EXPLAIN non pris en charge pour {connection.vendor}')
+    with connection.cursor() as cursor:
+        return explainers[connection.vendor](cursor, sql, params, analyze)
+
+
+def replay(lines, analyze=False):
+    """Rejoue un journal de requêtes avec EXPLAIN.
+
+    Returns:
+        Itérateur de dictionnaires {'line', 'label', 'source', 'steps', 'error'}
+    """
+    for number, line in enumerate(lines, start=1):
+        entry = parse_log_line(line)
+        if entry is None:
+            continue
+        kind, value = entry
+        if kind == 'sql':
+            statements = [('sql', value, None)]
+            source = value
+        else:
+            source = unquote_plus(value.urlencode())
+            try:
+                statements = search_statements(value)
+            except EmptyResultSet:
+                yield {'line': number, 'label': 'search', 'source': source, 'steps': [], 'error': 'Requête vide, aucune ligne lue'}
+                continue
+            except Exception as e:
+                yield {'line': number, 'label': 'search', 'source': source, 'steps': [], 'error': str(e)}
+                continue
+        for label, sql, params in statements:
+            try:
+                steps = explain(sql, params, analyze)
+                error = None
+            except Exception as e:
+                steps, error = [], str(e)
+            yield {'line': number, 'label': label, 'source': source, 'steps': steps, 'error': error}
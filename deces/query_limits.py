@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Codes d'erreur d'une requête interrompue par la limite de durée
+MARIADB_STATEMENT_TIMEOUT = 1969
+MYSQL_QUERY_TIMEOUT = 3024
+POSTGRESQL_QUERY_CANCELED = '57014'
+# Nombre d'instructions de la machine virtuelle SQLite entre deux vérifications du délai
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class QueryTimeout(DatabaseError):
+    """Requête SQL interrompue après avoir dépassé sa durée maximale."""
+
+
+def _is_timeout(error):
+    cause = error.__cause__ or error
+    code = cause.args[0] if cause.args else None
+    if code in (MARIADB_STATEMENT_TIMEOUT, MYSQL_QUERY_TIMEOUT) or code == 'interrupted':
+        return True
+    return POSTGRESQL_QUERY_CANCELED in (getattr(cause, 'pgcode', None), getattr(cause, 'sqlstate', None))
+
+
+class StatementTimeout:
+    """Wrapper d'exécution (connection.execute_wrapper) limitant la durée de chaque SELECT.
+
+    MariaDB : SET STATEMENT max_statement_time=... FOR, MySQL : indication
+    MAX_EXECUTION_TIME, SQLite : gestionnaire de progression qui interrompt
+    la requête. PostgreSQL utilise statement_timeout (voir statement_timeout).
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        wrapper = context['connection']
+        keyword = sql.lstrip()[:6].upper()
+        is_select = keyword == 'SELECT' or keyword.startswith('WITH')
+        if is_select and wrapper.vendor == 'mysql':
+            if wrapper.mysql_is_mariadb:
+                sql = f'SET STATEMENT max_statement_time={self.seconds:g} FOR {sql}'
+            elif keyword == 'SELECT':
+                sql = f'SELECT /*+ MAX_EXECUTION_TIME({int(self.seconds * 1000)}) */{sql.lstrip()[6:]}'
+        elif is_select and wrapper.vendor == 'sqlite':
+            deadline = time.monotonic() + self.seconds
+            wrapper.connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as e:
+            if _is_timeout(e):
+                raise QueryTimeout(f'Requête interrompue après {self.seconds:g}s') from e
+            raise
+        finally:
+            if is_select and wrapper.vendor == 'sqlite':
+                wrapper.connection.set_progress_handler(None, 0)
+
+
+@contextmanager
+def statement_timeout(seconds):
+    """Limite la durée de chaque requête SQL exécutée dans le bloc (aucune limite si seconds vaut 0)."""
+    if not seconds:
+        yield
+        return
+    with ExitStack() as stack:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET statement_timeout = %s', [int(seconds * 1000)])
+            stack.callback(_reset_postgresql_timeout)
+        stack.enter_context(connection.execute_wrapper(StatementTimeout(seconds)))
+        yield
+
+
+def _reset_postgresql_timeout():
+    with connection.cursor() as cursor:
+        cursor.execute('RESET statement_timeout')
+
+
+def cancel_query(wrapper):
+    """Interrompt la requête en cours sur une connexion utilisée par un autre thread."""
+    raw = wrapper.connection
+    if raw is None:
+        return
+    if wrapper.vendor == 'sqlite':
+        raw.interrupt()
+    elif wrapper.vendor == 'postgresql':
+        raw.cancel()
+    elif wrapper.vendor == 'mysql':
+        # KILL QUERY depuis une autre connexion : la connexion d'origine reste utilisable
+        killer = connections.create_connection(wrapper.alias)
+        try:
+            with killer.cursor() as cursor:
+                cursor.execute('KILL QUERY %s', [raw.thread_id()])
+        finally:
+            killer.close()
+
+
+async def run_query(func, *args, timeout=0):
+    """Exécute func (code ORM synchrone) depuis une vue asynchrone, avec une durée maximale par requête SQL.
+
+    func s'exécute dans le thread de la requête HTTP (sync_to_async). Si le
+    client se déconnecte, le serveur ASGI annule la vue : la requête SQL en
+    cours est alors interrompue au lieu de continuer à occuper la base.
+    """
+    state = {}
+
+    def target():
+        state['connection'] = connections[DEFAULT_DB_ALIAS]
+        try:
+            with statement_timeout(timeout):
+                return func(*args)
+        finally:
+            state.pop('connection', None)
+
+    try:
+        return await sync_to_async(target)()
+    except asyncio.CancelledError:
+        wrapper = state.get('connection')
+        if wrapper is not None:
+            logger.info('Client déconnecté, interruption de la requête SQL en cours')
+            try:
+                await sync_to_async(cancel_query, thread_sensitive=False)(wrapper)
+            except DatabaseError as e:
+                logger.warning(f'Interruption de la requête SQL impossible : {str(e)}')
+        raise
@@ -0,0 +1,107 @@
+import hashlib
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from .pagination import KeysetPage
+
+# Version des données de la table des décès : change à chaque bloc d'import validé, import clôturé ou erreur réimportée
+DATA_VERSION_CACHE_KEY = 'search:data_version'
+HITS_CACHE_KEY = 'search:hits'
+MISSES_CACHE_KEY = 'search:misses'
+# Les pages d'une version périmée ne sont plus lues ; elles expirent d'elles-mêmes
+RESULT_TIMEOUT = 24 * 3600
+# Paramètres sans effet sur les résultats
+IGNORED_PARAMS = ('debug', 'page')
+
+
+def data_version():
+    version = cache.get(DATA_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(DATA_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(DATA_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_data_version():
+    """Invalide toutes les pages de résultats en cache (après validation de la transaction en cours)."""
+    transaction.on_commit(lambda: cache.set(DATA_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+
+def result_key(params):
+    """Clé de cache d'une page de résultats : version des données et empreinte des paramètres.
+
+    Les paramètres sont triés et les valeurs vides ignorées, pour que
+    ?nom=X&sexe= et ?sexe=&nom=X donnent la même clé.
+    """
+    canonical = sorted(
+        (key, value.strip())
+        for key, values in params.lists() if key not in IGNORED_PARAMS
+        for value in values if value.strip()
+    )
+    digest = hashlib.sha256(repr(canonical).encode('utf-8')).hexdigest()
+    return f'search:page:{data_version()}:{digest}'
+
+
+def _count(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Compteur expulsé entre add et incr
+        cache.set(key, 1, None)
+
+
+def get_page(key):
+    """Page de résultats en cache (dictionnaire) ou None, en comptant succès et échecs."""
+    page = cache.get(key)
+    _count(HITS_CACHE_KEY if page is not None else MISSES_CACHE_KEY)
+    return page
+
+
+def set_page(key, page):
+    cache.set(key, page, RESULT_TIMEOUT)
+
+
+def dump_page(page):
+    """Représentation d'une KeysetPage à mettre en cache : lignes de la page, curseurs et nombre plafonné.
+
+    Les valeurs des lignes (clé primaire comprise) sont conservées pour
+    afficher la page sans aucune requête.
+    """
+    fields = [field.attname for field in page.object_list[0]._meta.concrete_fields] if page.object_list else []
+    return {
+        'rows': [[getattr(row, field) for field in fields] for row in page.object_list],
+        'fields': fields,
+        'number': page.number,
+        'has_next': page.has_next,
+        'has_previous': page.has_previous,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'count': page.count,
+        'count_capped': page.count_capped,
+    }
+
+
+def load_page(data, model):
+    """Reconstruit une KeysetPage à partir de sa représentation en cache."""
+    rows = [model(**dict(zip(data['fields'], values))) for values in data['rows']]
+    return KeysetPage(
+        rows, data['number'], data['has_next'], data['has_previous'],
+        data['next_cursor'], data['previous_cursor'], data['count'], data['count_capped']
+    )
+
+
+def stats():
+    hits = cache.get(HITS_CACHE_KEY, 0)
+    misses = cache.get(MISSES_CACHE_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'data_version': data_version(),
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_CACHE_KEY, MISSES_CACHE_KEY])
@@ -0,0 +1,169 @@
+import hashlib
+from datetime import date
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, DateField, F, IntegerField, Max, Min, Sum, Value, When
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear, TruncMonth
+from django.db.models.lookups import LessThan
+from .models import Deces, DecesStat, DecesStatPending
+from .search_cache import data_version
+
+# Tranches d'âge de AGE_BAND_WIDTH ans, la dernière regroupe les AGE_BAND_MAX ans et plus
+AGE_BAND_WIDTH = 5
+AGE_BAND_MAX = 100
+# Dimensions des agrégats exposées par l'API
+DIMENSIONS = ('annee', 'mois', 'dep', 'sexe', 'tranche_age')
+RESULT_TIMEOUT = 24 * 3600
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def age_band_label(band):
+    if band is None:
+        return 'inconnu'
+    if band >= AGE_BAND_MAX:
+        return f'{AGE_BAND_MAX} ans et plus'
+    return f'{band}-{band + AGE_BAND_WIDTH - 1} ans'
+
+
+def age_expression():
+    """Âge au décès en années révolues, calculé en SQL."""
+    anniversaire_passe = LessThan(
+        ExtractMonth('date_deces') * 100 + ExtractDay('date_deces'),
+        ExtractMonth('date_naissance') * 100 + ExtractDay('date_naissance')
+    )
+    return (
+        ExtractYear('date_deces') - ExtractYear('date_naissance')
+        - Case(When(anniversaire_passe, then=Value(1)), default=Value(0), output_field=IntegerField())
+    )
+
+
+def age_band_expression():
+    """Borne inférieure de la tranche d'âge, NULL si la date de naissance est inconnue."""
+    whens = [When(date_naissance__isnull=True, then=Value(None))]
+    whens += [
+        When(age__lt=band + AGE_BAND_WIDTH, then=Value(band))
+        for band in range(0, AGE_BAND_MAX, AGE_BAND_WIDTH)
+    ]
+    return Case(*whens, default=Value(AGE_BAND_MAX), output_field=IntegerField())
+
+
+def refresh_range(start, end):
+    """Recalcule les agrégats des décès de start (inclus) à end (exclu) par INSERT ... SELECT.
+
+    Le recalcul remplace les agrégats de la période : il est exact quelles que
+    soient les lignes insérées ou mises à jour, et la borne sur date_deces
+    limite la lecture aux partitions concernées.
+    """
+    rollup = (
+        Deces.objects.filter(date_deces__gte=start, date_deces__lt=end)
+        .order_by()
+        .alias(age=age_expression())
+        .annotate(
+            stat_mois=TruncMonth('date_deces', output_field=DateField()),
+            stat_dep=F('lieu_deces_dep'),
+            stat_tranche=age_band_expression(),
+        )
+        .values_list('stat_mois', 'stat_dep', 'sexe', 'stat_tranche')
+        .annotate(total=Count('*'))
+    )
+    sql, params = rollup.query.sql_with_params()
+    table = DecesStat._meta.db_table
+    with transaction.atomic():
+        DecesStat.objects.filter(mois__gte=start, mois__lt=end).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {table} (mois, dep, sexe, tranche_age, total) {sql}', params)
+
+
+def mark_months(dates):
+    """Signale les mois de décès modifiés (à appeler dans la transaction qui modifie les décès).
+
+    Un mois déjà signalé reçoit un nouveau jeton : un recalcul en cours, qui a
+    lu l'ancien, ne retirera pas le signalement.
+    """
+    months = sorted({month_start(value) for value in dates if value})
+    options = {}
+    # SQLite et PostgreSQL exigent la cible du conflit, MariaDB la refuse
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['mois']
+    DecesStatPending.objects.bulk_create(
+        [DecesStatPending(mois=mois) for mois in months], update_conflicts=True, update_fields=['token'], **options
+    )
+
+
+def refresh_pending():
+    """Recalcule les agrégats des mois signalés. Retourne le nombre de mois recalculés.
+
+    Le signalement n'est retiré que si son jeton n'a pas changé depuis sa
+    lecture : un mois de nouveau signalé par une tranche validée pendant le
+    recalcul reste à recalculer.
+    """
+    pending = list(DecesStatPending.objects.order_by('mois').values_list('mois', 'token'))
+    for mois, token in pending:
+        with transaction.atomic():
+            refresh_range(mois, next_month(mois))
+            DecesStatPending.objects.filter(mois=mois, token=token).delete()
+    return len(pending)
+
+
+def rebuild_stats(stdout=None):
+    """Reconstruit toutes les tables d'agrégats, année par année. Retourne le nombre d'années traitées."""
+    bounds = Deces.objects.aggregate(first=Min('date_deces'), last=Max('date_deces'))
+    DecesStat.objects.all().delete()
+    DecesStatPending.objects.all().delete()
+    if not bounds['first']:
+        return 0
+    years = range(bounds['first'].year, bounds['last'].year + 1)
+    for year in years:
+        refresh_range(date(year, 1, 1), date(year + 1, 1, 1))
+        if stdout:
+            stdout.write(f'Année {year} agrégée')
+    return len(years)
+
+
+def aggregate(dimension, annee_debut=None, annee_fin=None, dep=None, sexe=None, tranche_age=None):
+    """Nombre de décès par valeur d'une dimension, lu dans la table d'agrégats.
+
+    Les résultats sont mis en cache jusqu'au prochain changement des données.
+
+    Returns:
+        Liste de dictionnaires {'valeur', 'total'} triée par valeur
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f'Dimension inconnue : {dimension}')
+    filters = {}
+    if annee_debut:
+        filters['mois__gte'] = date(int(annee_debut), 1, 1)
+    if annee_fin:
+        filters['mois__lt'] = date(int(annee_fin) + 1, 1, 1)
+    if dep:
+        filters['dep'] = dep
+    if sexe:
+        filters['sexe'] = sexe
+    if tranche_age not in (None, ''):
+        filters['tranche_age'] = int(tranche_age)
+
+    digest = hashlib.sha256(repr(sorted(filters.items())).encode('utf-8')).hexdigest()
+    cache_key = f'stats:{data_version()}:{dimension}:{digest}'
+    results = cache.get(cache_key)
+    if results is not None:
+        return results
+
+    queryset = DecesStat.objects.filter(**filters)
+    if dimension == 'annee':
+        queryset = queryset.annotate(valeur=ExtractYear('mois'))
+    else:
+        queryset = queryset.annotate(valeur=F(dimension))
+    rows = queryset.order_by().values('valeur').annotate(total=Sum('total')).order_by(F('valeur').asc(nulls_last=True))
+    results = [
+        {'valeur': row['valeur'].isoformat() if isinstance(row['valeur'], date) else row['valeur'], 'total': row['total']}
+        for row in rows
+    ]
+    cache.set(cache_key, results, RESULT_TIMEOUT)
+    return results
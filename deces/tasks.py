@@ -1,15 +1,29 @@
+import io
 import os
 import csv
 import uuid
 import hashlib
 import shutil
-import tempfile
+import time
 import zipfile
 import pandas as pd
-from datetime import datetime
-from celery import shared_task
-from deces.models import Deces, ImportHistory, DecesImportError
-import requests
+from datetime import datetime, timedelta
+from celery import shared_task, chord
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from deces.models import Deces, ImportHistory, ImportChunk, DecesImportError, SearchExport, LinkageJob
+from deces.loaders import get_loader, resolve_engine
+from deces.phonetics import name_keys, name_keys_frame
+from deces.partitions import invalidate_summary, rebuild_summary, ensure_partitions
+from deces.stats import mark_months, refresh_pending
+from deces.filters import search_queryset
+from deces.export import iter_batches, export_stream, extension
+from deces.linkage import match_identities, read_identities_csv, write_results_csv
+from deces import downloads, metrics, progress
+from deces.search_cache import bump_data_version
+from django.http import QueryDict
 from celery.utils.log import get_task_logger
 
 logger = get_task_logger(__name__)
@@ -17,6 +31,13 @@ logger = get_task_logger(__name__)
 # Configuration pour l'optimisation des imports
 BATCH_SIZE = 5000  # Nombre d'enregistrements à insérer en une fois
 CHUNK_SIZE = 10000  # Nombre de lignes à lire du CSV en une fois
+VECTORIZED_PARSING = True  # Parser chaque chunk en colonnes plutôt que ligne par ligne
+READ_BUFFER_SIZE = 1024 * 1024  # Taille des blocs lus dans le ZIP
+RANGE_SIZE = 64 * 1024 * 1024  # Taille (octets) des tranches de CSV réparties entre les workers
+CHUNK_MAX_RETRIES = 3  # Nombre de relances automatiques d'une tranche après une erreur de base de données
+MAX_ERRORS = 100  # Nombre minimal d'erreurs tolérées par CSV (voir IMPORT_ERROR_BUDGET_RATIO)
+ERROR_BATCH_SIZE = 1000  # Nombre d'erreurs d'import insérées en une fois
+CHUNK_STALE_AFTER = 15 * 60  # Délai (secondes) sans point de contrôle après lequel une tranche en cours est reprenable
 
 def parse_insee_date(date_str):
     """Convertit une date INSEE (AAAAMMJJ) en objet date."""
@@ -43,8 +64,17 @@ def parse_insee_date(date_str):
         return None
 
 class ParseError(Exception):
-    """Exception levée lorsqu'une erreur survient lors du parsing d'une ligne."""
-    pass
+    """Exception levée lorsqu'une erreur survient lors du parsing d'une ligne.
+
+    Le code correspond à DecesImportError.REASON_CHOICES.
+    """
+
+    def __init__(self, message, code='format'):
+        super().__init__(message)
+        self.code = code
+
+# Erreurs d'une ligne mal formée : ParseError, ou exception imprévue du parsing (enregistrée comme « inattendue »)
+ROW_ERRORS = (ParseError, ValueError, TypeError, KeyError, AttributeError, IndexError)
 
 def parse_row(row, no_error=False):
     """Parse une ligne du CSV et retourne un dictionnaire de données valides.
@@ -76,7 +106,7 @@ def parse_row(row, no_error=False):
     nom_complet = row.get('nomprenom', '')
     if not nom_complet or '*' not in nom_complet:
         if not no_error:
-            raise ParseError(f'Format de nomprenom invalide (doit contenir *) : {nom_complet}')
+            raise ParseError(f'Format de nomprenom invalide (doit contenir *) : {nom_complet}', 'nomprenom')
         return result
     
     # Nettoyer et séparer nom et prénoms
@@ -87,7 +117,7 @@ def parse_row(row, no_error=False):
         result['prenoms'] = prenoms.strip() or None
     except ValueError:
         if not no_error:
-            raise ParseError(f'Format nomprenom invalide (pas de *) : {nom_complet}')
+            raise ParseError(f'Format nomprenom invalide (pas de *) : {nom_complet}', 'nomprenom')
         return result
     
     # Vérifier et nettoyer les champs obligatoires
@@ -104,7 +134,7 @@ def parse_row(row, no_error=False):
         date_naissance = parse_insee_date(dn)
         result['date_naissance'] = date_naissance
         if not date_naissance and not no_error:
-            raise ParseError(f'Date de naissance invalide : {dn}')
+            raise ParseError(f'Date de naissance invalide : {dn}', 'date_naissance')
 
     if dd == "00000000":
         result['date_deces'] = None
@@ -112,11 +142,11 @@ def parse_row(row, no_error=False):
         date_deces = parse_insee_date(dd)
         result['date_deces'] = date_deces
         if not date_deces and not no_error:
-            raise ParseError(f'Date de décès invalide : {dd}')
+            raise ParseError(f'Date de décès invalide : {dd}', 'date_deces')
 
     # Vérifier les valeurs obligatoires
     if not all([result['sexe'], result['date_deces']]) and not no_error:
-        raise ParseError(f'Champs obligatoires manquants : sexe={result["sexe"]}, date_deces={result["date_deces"]}')
+        raise ParseError(f'Champs obligatoires manquants : sexe={result["sexe"]}, date_deces={result["date_deces"]}', 'champs_obligatoires')
 
     # Nettoyer les autres champs
     result['lieu_naissance'] = str(row.get('lieunaiss', '')).strip() or None
@@ -126,6 +156,338 @@ def parse_row(row, no_error=False):
 
     return result
 
+# Champs de Deces produits par parse_chunk
+PARSED_FIELDS = (
+    'nom', 'prenoms', 'sexe', 'date_naissance', 'lieu_naissance', 'lieu_naissance_nom',
+    'date_deces', 'lieu_deces', 'acte_deces',
+)
+
+def _column(chunk, name):
+    """Retourne la colonne demandée, ou une colonne vide si elle est absente du CSV."""
+    if name in chunk.columns:
+        return chunk[name].astype(object)
+    return pd.Series('', index=chunk.index, dtype=object)
+
+def _text_column(chunk, name):
+    """Équivalent vectorisé de `str(row.get(name, '')).strip() or None`."""
+    column = _column(chunk, name)
+    # str(NaN) vaut 'nan' dans parse_row : on conserve ce comportement
+    column = column.where(column.notna(), 'nan').str.strip()
+    return column.where(column != '', None)
+
+def parse_insee_dates(dates):
+    """Version vectorisée de parse_insee_date pour une série de dates AAAAMMJJ.
+
+    Seules les dates composées exactement de 8 chiffres sont converties ; les
+    autres valeurs (et les dates hors de la plage supportée par pandas) sont
+    renvoyées à None pour être traitées ligne par ligne.
+    """
+    dates = dates.where(dates.notna(), '').str.strip('"')
+    # L'année 0000 n'existe pas en Python : la ligne sera rejetée par parse_row
+    well_formed = dates.str.fullmatch(r'(?!0000)\d{8}').fillna(False).astype(bool)
+    # Un jour ou un mois à 00 est ramené à 01
+    month = dates.str[4:6].replace('00', '01')
+    day = dates.str[6:8].replace('00', '01')
+    fixed = (dates.str[:4] + month + day).where(well_formed, None)
+    parsed = pd.to_datetime(fixed, format='%Y%m%d', errors='coerce')
+    return pd.Series(parsed.dt.date, index=dates.index, dtype=object).where(parsed.notna(), None)
+
+def parse_chunk(chunk):
+    """Parse un chunk complet du CSV de façon vectorisée.
+
+    Applique les mêmes règles que parse_row sur des colonnes entières. Les
+    lignes que les contrôles vectorisés ne peuvent pas valider sont écartées
+    pour être reprises par parse_row, qui produit le message d'erreur.
+
+    Args:
+        chunk: Le DataFrame lu par pd.read_csv (dtype=str)
+
+    Returns:
+        Un tuple (DataFrame des lignes valides avec les champs de Deces,
+        index des lignes à traiter ligne par ligne)
+    """
+    if chunk.empty:
+        # Bloc sans ligne (plage de lignes vides) : split(expand=True) ne produirait aucune colonne
+        return pd.DataFrame(columns=PARSED_FIELDS, dtype=object), chunk.index
+
+    nomprenom = _column(chunk, 'nomprenom')
+    has_star = nomprenom.str.contains('*', regex=False).fillna(False).astype(bool)
+
+    # Séparer nom et prénoms (format: <NOM>*<PRENOM 1> [PRENOM 2] [PRENOM 3]/)
+    parts = nomprenom.where(has_star, '*').str.strip('"/').str.split('*', n=1, expand=True)
+    nom = parts[0].str.strip()
+    prenoms = parts[1].str.strip()
+
+    sexe = _column(chunk, 'sexe')
+    valid_sexe = sexe.isin(['1', '2'])
+
+    datenaiss = _column(chunk, 'datenaiss')
+    unknown_naissance = datenaiss == '00000000'
+    date_naissance = parse_insee_dates(datenaiss).where(~unknown_naissance, None)
+    valid_naissance = unknown_naissance | date_naissance.notna()
+
+    datedeces = _column(chunk, 'datedeces')
+    date_deces = parse_insee_dates(datedeces)
+    valid_deces = (datedeces != '00000000') & date_deces.notna()
+
+    valid = has_star & valid_sexe & valid_naissance & valid_deces
+
+    parsed = pd.DataFrame({
+        'nom': nom.where(nom != '', None),
+        'prenoms': prenoms.where(prenoms != '', None),
+        'sexe': sexe,
+        'date_naissance': date_naissance,
+        'lieu_naissance': _text_column(chunk, 'lieunaiss'),
+        'lieu_naissance_nom': _text_column(chunk, 'commnaiss'),
+        'date_deces': date_deces,
+        'lieu_deces': _text_column(chunk, 'lieudeces'),
+        'acte_deces': _text_column(chunk, 'actedeces'),
+    }, index=chunk.index, dtype=object)
+
+    return parsed[valid], chunk.index[~valid]
+
+def iter_csv_range(path, start, end):
+    """Lit une plage d'un CSV par blocs de CHUNK_SIZE lignes.
+
+    La plage doit commencer et finir sur une limite de ligne. Chaque bloc est
+    parsé avec la ligne d'en-tête du fichier.
+
+    Yields:
+        Des tuples (DataFrame, position dans le CSV à la fin du bloc)
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        offset = start
+        while offset < end:
+            lines = []
+            while offset < end and len(lines) < CHUNK_SIZE:
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+                offset += len(line)
+            if not lines:
+                break
+            chunk = pd.read_csv(io.BytesIO(header + b''.join(lines)), sep=';', dtype=str)
+            yield chunk, offset
+
+def get_csv_path(import_history_id):
+    """Chemin du CSV décompressé partagé entre les tâches d'un import."""
+    return os.path.join(settings.IMPORT_WORK_DIR, f'import-{import_history_id}.csv')
+
+def extract_member(zip_ref, csv_file, path):
+    """Décompresse un CSV du ZIP sur disque en une passe.
+
+    Le MD5 et le nombre de lignes sont calculés pendant la copie, sans charger
+    le fichier en mémoire.
+
+    Returns:
+        Un tuple (MD5, nombre d'enregistrements hors en-tête)
+    """
+    md5 = hashlib.md5()
+    lines = 0
+    last_block = b''
+    with zip_ref.open(csv_file) as source, open(path, 'wb') as target:
+        for block in iter(lambda: source.read(READ_BUFFER_SIZE), b''):
+            md5.update(block)
+            lines += block.count(b'\n')
+            target.write(block)
+            last_block = block
+    if last_block and not last_block.endswith(b'\n'):
+        lines += 1
+    return md5.hexdigest(), max(lines - 1, 0)
+
+def split_csv_ranges(path, range_size):
+    """Découpe un CSV en plages d'octets d'environ range_size, alignées sur les fins de ligne.
+
+    La ligne d'en-tête est exclue des plages.
+    """
+    ranges = []
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+        while start < file_size:
+            f.seek(min(start + range_size, file_size))
+            # Aller jusqu'à la fin de la ligne en cours
+            f.readline()
+            end = min(f.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+class ImportErrorSink:
+    """Collecte les lignes rejetées d'un import et les enregistre par lots.
+
+    Les erreurs sont insérées avec bulk_create au plus tard à chaque flush(),
+    appelé dans la transaction du point de contrôle. Le budget d'erreurs est
+    une proportion du nombre de lignes du CSV (avec un minimum de MAX_ERRORS).
+    En mode compact, seule la ligne brute et le code de la cause sont stockés.
+    """
+
+    def __init__(self, import_history, compact=False):
+        self.import_history = import_history
+        self.compact = compact
+        self.buffer = []
+        # Les erreurs déjà enregistrées (autres tranches, blocs validés) comptent dans le budget
+        self.error_count = DecesImportError.objects.filter(import_history=import_history).count()
+        self.budget = max(MAX_ERRORS, int(import_history.total_records * settings.IMPORT_ERROR_BUDGET_RATIO))
+
+    def add(self, row, error, import_chunk=None):
+        """Enregistre une ligne rejetée et arrête l'import si le budget est dépassé."""
+        self.error_count += 1
+        reason = error.code if isinstance(error, ParseError) else 'inattendue'
+        logger.debug(f'Ligne rejetée ({reason}) : {str(error)}')
+
+        if self.compact:
+            raw_data = {'line': ';'.join('' if pd.isna(v) else str(v) for v in row.values)}
+            parsed_data = {}
+        else:
+            # Convertir les données en format JSON-compatible
+            raw_data = {k: None if pd.isna(v) else str(v) for k, v in row.to_dict().items()}
+            # Essayer de récupérer les données partielles
+            try:
+                parsed_data = parse_row(row, no_error=True)
+            except Exception:
+                parsed_data = {}
+
+        self.buffer.append(DecesImportError(
+            raw_data=raw_data,
+            error_message=str(error),
+            reason=reason,
+            import_history=self.import_history,
+            import_chunk=import_chunk,
+            **parsed_data
+        ))
+        if len(self.buffer) >= ERROR_BATCH_SIZE:
+            self.flush()
+
+        if self.error_count > self.budget:
+            raise Exception(f'Trop d\'erreurs ({self.error_count}, budget {self.budget}), import arrêté')
+
+    def flush(self):
+        """Insère les erreurs en attente."""
+        if self.buffer:
+            DecesImportError.objects.bulk_create(self.buffer)
+            self.buffer = []
+
+def import_rows(import_history, import_chunk, loader):
+    """Parse et charge une tranche à partir de son dernier point de contrôle.
+
+    Chaque bloc de CHUNK_SIZE lignes est traité dans une transaction qui
+    contient les insertions, les erreurs, la progression et le point de
+    contrôle de la tranche : après un arrêt brutal, la reprise repart
+    exactement du dernier bloc validé.
+
+    Returns:
+        Le nombre de lignes importées lors de cet appel
+    """
+    records_processed = 0
+    errors = ImportErrorSink(import_history, compact=settings.IMPORT_ERROR_COMPACT)
+    start = import_chunk.committed_offset or import_chunk.start_offset
+    csv_path = get_csv_path(import_history.pk)
+
+    for chunk, offset in iter_csv_range(csv_path, start, import_chunk.end_offset):
+        # Numéroter les lignes depuis le début de la tranche pour les logs
+        chunk.index += import_chunk.records_read
+        chunk_processed = 0
+        chunk_errors = errors.error_count
+        batches = loader.batch_count
+        counts = (loader.inserted, loader.updated, loader.unchanged)
+        flush_seconds = loader.flush_seconds
+        block_start = time.perf_counter()
+
+        with transaction.atomic():
+            # Parsing vectorisé du chunk, les lignes rejetées sont reprises ligne par ligne
+            if VECTORIZED_PARSING:
+                parsed_chunk, fallback_index = parse_chunk(chunk)
+                # Clés de recherche normalisées et phonétiques, calculées sur les colonnes entières
+                parsed_chunk = parsed_chunk.join(name_keys_frame(parsed_chunk['nom'], parsed_chunk['prenoms']))
+            else:
+                parsed_chunk, fallback_index = chunk.iloc[0:0], chunk.index
+
+            # Le chargeur insère par lot quand il atteint BATCH_SIZE
+            for parsed_data in parsed_chunk.to_dict('records'):
+                loader.add(parsed_data)
+                chunk_processed += 1
+
+            for index, row in chunk.loc[fallback_index].iterrows():
+                try:
+                    # Parser la ligne
+                    parsed_data = parse_row(row)
+                    parsed_data.update(name_keys(parsed_data['nom'], parsed_data['prenoms']))
+                except ROW_ERRORS as e:
+                    errors.add(row, e, import_chunk)
+                    continue
+                # Hors du try : une erreur d'écriture d'un lot (DatabaseError) fait échouer la tranche
+                loader.add(parsed_data)
+                chunk_processed += 1
+            # Parsing : durée du bloc hors écriture des lots déjà pleins
+            parse_seconds = time.perf_counter() - block_start - (loader.flush_seconds - flush_seconds)
+
+            # Insérer les derniers enregistrements et erreurs du chunk
+            loader.flush()
+            errors.flush()
+            # Mois de décès des lignes écrites, dont les statistiques seront recalculées
+            mark_months(loader.months)
+            loader.months = set()
+
+            # Point de contrôle et progression, validés avec les insertions
+            inserted, updated, unchanged = (
+                total - previous for total, previous in zip((loader.inserted, loader.updated, loader.unchanged), counts)
+            )
+            import_chunk.committed_offset = offset
+            import_chunk.records_read += len(chunk)
+            import_chunk.records_processed += chunk_processed
+            import_chunk.records_inserted += inserted
+            import_chunk.records_updated += updated
+            import_chunk.records_unchanged += unchanged
+            import_chunk.batch_count += loader.batch_count - batches
+            import_chunk.save(update_fields=[
+                'committed_offset', 'records_read', 'records_processed', 'records_inserted',
+                'records_updated', 'records_unchanged', 'batch_count', 'updated_at'
+            ])
+            if inserted or updated:
+                # Lignes écrites : les pages de résultats en cache sont périmées dès la validation du bloc
+                bump_data_version()
+        # Progression en direct publiée après validation ; l'ImportHistory n'est mis à jour
+        # qu'en fin de tranche, sans verrouiller sa ligne dans la transaction de chaque bloc
+        progress.advance(
+            import_history.pk, records_processed=chunk_processed, records_inserted=inserted,
+            records_updated=updated, records_unchanged=unchanged
+        )
+        records_processed += chunk_processed
+        metrics.record_stage('parse', parse_seconds, rows=len(chunk))
+        metrics.record_stage('insert', loader.flush_seconds - flush_seconds, rows=chunk_processed)
+        if errors.error_count > chunk_errors:
+            logger.warning(f'{errors.error_count - chunk_errors} ligne(s) rejetée(s) dans le bloc (total {errors.error_count}/{errors.budget})')
+
+    return records_processed
+
+def ensure_csv_available(import_history):
+    """Vérifie que le CSV décompressé d'un import est présent, sinon le récupère depuis le ZIP.
+
+    Le répertoire de travail peut avoir été vidé (redéploiement) : le CSV est
+    alors décompressé à nouveau depuis le ZIP en cache (revalidé, ou
+    téléchargé s'il n'y est plus) et n'est réutilisé que si son MD5 est
+    identique à celui de l'import d'origine.
+    """
+    csv_path = get_csv_path(import_history.pk)
+    if os.path.exists(csv_path):
+        return csv_path
+
+    logger.info(f'CSV de l\'import {import_history.pk} absent, récupération depuis {import_history.zip_url}')
+    os.makedirs(settings.IMPORT_WORK_DIR, exist_ok=True)
+    with metrics.stage('download'):
+        zip_path = downloads.fetch(import_history.zip_url)
+    with metrics.stage('hash'), zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        md5_hash, records = extract_member(zip_ref, import_history.csv_filename, csv_path)
+    if md5_hash != import_history.md5_hash:
+        os.unlink(csv_path)
+        raise Exception(f'Le fichier {import_history.csv_filename} a changé depuis l\'import initial (MD5 {md5_hash})')
+    return csv_path
+
 def clean_previous_import(csv_filename, md5_hash):
     """Nettoie les données d'un import précédent."""
     try:
@@ -138,9 +500,22 @@ def clean_previous_import(csv_filename, md5_hash):
         return False
 
 @shared_task(bind=True)
-def process_insee_file(self, zip_url, zip_filename):
+def process_insee_file(self, zip_url, zip_filename, engine='orm'):
+    """Télécharge un ZIP INSEE et répartit l'import de ses CSV entre les workers.
+
+    Le ZIP est conservé dans le cache de téléchargement (ZIP_CACHE_DIR) : une
+    relance ne le télécharge à nouveau que s'il a changé sur le serveur, et
+    un téléchargement interrompu reprend là où il s'est arrêté. Chaque CSV
+    est lu directement dans l'archive en cache, décompressé une fois dans
+    IMPORT_WORK_DIR puis découpé en
+    tranches importées en parallèle (un chord Celery par CSV) ; le callback
+    finalize_csv_import clôture l'ImportHistory correspondant. Un CSV dont
+    l'import a été interrompu reprend à partir de ses points de contrôle.
+    """
     logger.info(f'Démarrage du traitement pour {zip_filename}')
-    
+    os.makedirs(settings.IMPORT_WORK_DIR, exist_ok=True)
+    engine = resolve_engine(engine)
+
     try:
         # Télécharger le fichier ZIP
         logger.info('Téléchargement du fichier ZIP')
@@ -151,164 +526,364 @@ def process_insee_file(self, zip_url, zip_filename):
             md5_hash="unknown",
             status='downloading'
         )
-        zip_import_history.save()
-        response = requests.get(zip_url, stream=True)
-        response.raise_for_status()
-
-        # Sauvegarder le fichier ZIP temporairement
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    downloaded_size += len(chunk)
-                    temp_zip.write(chunk)
-                    if total_size:
-                        progress = (downloaded_size / total_size) * 100
-                        logger.debug(f'Téléchargement : {progress:.1f}%')
-            temp_zip.flush()
-            logger.info('Fichier ZIP téléchargé avec succès')
-            zip_import_history.delete()
-        # Extraire et traiter chaque fichier CSV
-        with zipfile.ZipFile(temp_zip.name, 'r') as zip_ref:
+        with metrics.stage('download') as timer:
+            zip_path = downloads.fetch(zip_url)
+        logger.info(f'ZIP disponible en {timer.duration:.1f}s')
+        zip_import_history.delete()
+
+        # Garde-fou : les partitions annuelles doivent exister avant d'importer les nouveaux décès
+        try:
+            ensure_partitions()
+        except DatabaseError as e:
+            logger.warning(f'Maintenance des partitions impossible, les décès récents iront dans p_future : {str(e)}')
+
+        # Extraire chaque fichier CSV et lancer l'import de ses tranches
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             csv_files = [f for f in zip_ref.namelist() if f.endswith('.csv')]
-            
+
             for csv_file in csv_files:
                 logger.info(f'Traitement du fichier {csv_file}')
-                records_processed = 0
                 # Créer un enregistrement ImportHistory pour ce CSV
                 import_history = ImportHistory.objects.create(
                     zip_url=zip_url,
                     zip_filename=zip_filename,
                     csv_filename=csv_file,
                     md5_hash="unknown",
-                    status='checking'
+                    status='checking',
+                    engine=engine
                 )
-                import_history.save()
-                # Calculer le MD5 du fichier CSV
-                with zip_ref.open(csv_file) as f:
-                    md5_hash = hashlib.md5(f.read()).hexdigest()
-              
+
+                # Décompresser le CSV en calculant son MD5 (une seule lecture du ZIP)
+                csv_path = get_csv_path(import_history.pk)
+                with metrics.stage('hash') as timer:
+                    md5_hash, records = extract_member(zip_ref, csv_file, csv_path)
+                logger.info(f'{csv_file} décompressé et empreinte MD5 calculée en {timer.duration:.1f}s')
+
                 # Vérifier si le fichier a déjà été traité
-                if ImportHistory.objects.filter(csv_filename=csv_file, md5_hash=md5_hash).exists():
-                    logger.info(f'Le fichier {csv_file} a déjà été traité')
+                previous_import = ImportHistory.objects.filter(csv_filename=csv_file, md5_hash=md5_hash).first()
+                if previous_import:
                     import_history.delete()
+                    if previous_import.status == 'completed':
+                        logger.info(f'Le fichier {csv_file} a déjà été traité')
+                        os.unlink(csv_path)
+                    else:
+                        logger.info(f'Reprise de l\'import interrompu {previous_import.pk} pour {csv_file}')
+                        os.replace(csv_path, get_csv_path(previous_import.pk))
+                        resume_import(previous_import.pk)
                     continue
-                
+
                 import_history.md5_hash = md5_hash
-                import_history.save()
-
-                # Extraire et traiter le fichier CSV
-                with zip_ref.open(csv_file) as f:
-                    # Utiliser chunks pour lire le CSV par morceaux
-                    df = pd.read_csv(f, sep=';', dtype=str)
-                    records = len(df)
-                    import_history.total_records = records
-                    import_history.status = 'processing'
-                    import_history.save()
-                    logger.info(f'Nombre total d\'enregistrements à traiter : {records}')
-                    f.seek(0)  # Revenir au début du fichier
-                    chunks = pd.read_csv(f, sep=';', dtype=str, chunksize=CHUNK_SIZE)
-                    error_count = 0
-                    deces_batch = []
-
-                    for chunk in chunks:
-                        for index, row in chunk.iterrows():
-                            try:
-                                # Parser la ligne
-                                parsed_data = parse_row(row)
-                                
-                                # Créer l'objet Deces
-                                deces = Deces(
-                                    nom=parsed_data['nom'],
-                                    prenoms=parsed_data['prenoms'],
-                                    sexe=parsed_data['sexe'],
-                                    date_naissance=parsed_data['date_naissance'],
-                                    lieu_naissance=parsed_data['lieu_naissance'],
-                                    lieu_naissance_nom=parsed_data['lieu_naissance_nom'],
-                                    date_deces=parsed_data['date_deces'],
-                                    lieu_deces=parsed_data['lieu_deces'],
-                                    acte_deces=parsed_data['acte_deces']
-                                )
-                                deces_batch.append(deces)
-                                records_processed += 1
-
-                                # Insérer par lot quand on atteint BATCH_SIZE
-                                if len(deces_batch) >= BATCH_SIZE:
-                                    Deces.objects.bulk_create(deces_batch, update_conflicts=True, update_fields=[
-                                        'lieu_naissance', 'lieu_naissance_nom'
-                                    ])
-                                    deces_batch = []
-                            except (ParseError, Exception) as e:
-                                error_count += 1
-                                error_type = 'parsing' if isinstance(e, ParseError) else 'inattendue'
-                                logger.error(f'Erreur de {error_type} ligne {index+1}: {str(e)}\nDonnées: {row}')
-                                
-                                # Essayer de récupérer les données partielles
-                                try:
-                                    parsed_data = parse_row(row, no_error=True)
-                                except Exception:
-                                    parsed_data = {}
-                                
-                                # Convertir les données en format JSON-compatible
-                                raw_data = {}
-                                for k, v in row.to_dict().items():
-                                    if pd.isna(v):
-                                        raw_data[k] = None
-                                    else:
-                                        raw_data[k] = str(v)
-                                
-                                # Sauvegarder l'erreur dans DecesImportError
-                                DecesImportError.objects.create(
-                                    raw_data=raw_data,
-                                    error_message=str(e),
-                                    import_history=import_history,
-                                    **parsed_data
-                                )
-                                
-                                if error_count > 100:
-                                    raise Exception(f'Trop d\'erreurs ({error_count}), import arrêté')
-                            
-                            if index % 1000 == 0:
-                                import_history.records_processed = records_processed
-                                import_history.save()
-                                logger.info(f'Progression : {records_processed}/{records} ({(records_processed/records*100):.1f}%)')
-                        
-                        # Insérer les derniers enregistrements du chunk
-                        if deces_batch:
-                            Deces.objects.bulk_create(deces_batch, update_conflicts=True, update_fields=[
-                                        'lieu_naissance', 'lieu_naissance_nom'
-                                    ])
-                            deces_batch = []
-
-                    import_history.total_records = records
-                    import_history.records_processed = records_processed
-                    import_history.status = 'completed'
-                    import_history.save()
-
-                    if records_processed < records * 0.9:  # Si moins de 90% des enregistrements ont été traités
-                        raise Exception(f'Import incomplet : seulement {records_processed}/{records} enregistrements traités')
-                    logger.info(f'Import terminé : {records_processed} enregistrements traités, {error_count} erreurs')
+                import_history.total_records = records
+                import_history.status = 'processing'
+                import_history.save(update_fields=['md5_hash', 'total_records', 'status'])
+                import_history.publish_progress()
+                logger.info(f'Nombre total d\'enregistrements à traiter : {records}')
+
+                import_chunks = create_chunks(import_history)
+                logger.info(f'{csv_file} découpé en {len(import_chunks)} tranche(s)')
+                dispatch_chunks(import_history, import_chunks)
 
     except Exception as e:
         logger.error(f'Erreur lors du traitement : {str(e)}')
-        # Si une erreur survient pendant le traitement d'un CSV spécifique,
+        # Si une erreur survient pendant la préparation d'un CSV spécifique,
         # on marque uniquement cet import comme échoué
-        if 'import_history' in locals():
-            import_history.status = 'failed'
-            import_history.error_message = str(e)
-            import_history.save()
+        if 'import_history' in locals() and import_history.status != 'processing':
+            import_history.update_status('failed', str(e))
         raise
 
-    finally:
-        # Nettoyer les fichiers temporaires
-        try:
-            if os.path.exists(temp_zip.name):
-                try:
-                    os.unlink(temp_zip.name)
-                except Exception as e:
-                    logger.warning(f'Erreur lors du nettoyage du fichier temporaire {temp_zip.name}: {str(e)}')
-        except Exception as e:
-            logger.error(f'Erreur lors du nettoyage des fichiers temporaires : {str(e)}')
-
+    # Le ZIP reste dans le cache, les CSV décompressés sont supprimés par finalize_csv_import
     logger.info('Traitement du ZIP terminé')
+
+def create_chunks(import_history):
+    """Découpe le CSV décompressé d'un import en tranches."""
+    return ImportChunk.objects.bulk_create([
+        ImportChunk(import_history=import_history, start_offset=start, end_offset=end)
+        for start, end in split_csv_ranges(get_csv_path(import_history.pk), RANGE_SIZE)
+    ])
+
+def dispatch_chunks(import_history, import_chunks):
+    """Lance l'import des tranches en parallèle, suivi de la clôture de l'import."""
+    # Le résumé par nom ne reflète plus la table pendant l'import
+    invalidate_summary()
+    callback = finalize_csv_import.si(import_history.pk)
+    # Une tranche en échec définitif empêche l'appel du callback : son callback
+    # d'erreur clôture alors l'import, une fois toutes les tranches terminées
+    callback.on_error(fail_csv_import.s(import_history.pk))
+    if not import_chunks:
+        callback.delay()
+        return
+    chord(import_csv_chunk.si(import_chunk.pk) for import_chunk in import_chunks)(callback)
+
+def claim_chunk(chunk_id):
+    """Réserve une tranche pour ce worker.
+
+    Une tranche peut être prise si elle est en attente, en échec, ou en cours
+    sans point de contrôle depuis CHUNK_STALE_AFTER secondes (worker arrêté).
+    Le verrou repose sur un UPDATE conditionnel, ce qui évite qu'une reprise
+    traite deux fois la même tranche.
+    """
+    stale_limit = timezone.now() - timedelta(seconds=CHUNK_STALE_AFTER)
+    return ImportChunk.objects.filter(pk=chunk_id).filter(
+        Q(status__in=['pending', 'failed']) | Q(status='processing', updated_at__lt=stale_limit)
+    ).update(status='processing', error_message='', updated_at=timezone.now()) == 1
+
+@shared_task(bind=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=CHUNK_MAX_RETRIES)
+def import_csv_chunk(self, chunk_id):
+    """Importe une tranche de CSV depuis son dernier point de contrôle."""
+    if not claim_chunk(chunk_id):
+        logger.info(f'Tranche {chunk_id} déjà terminée ou en cours de traitement')
+        return
+
+    import_chunk = ImportChunk.objects.select_related('import_history').get(pk=chunk_id)
+    import_history = import_chunk.import_history
+    start = import_chunk.committed_offset or import_chunk.start_offset
+    logger.info(f'Import de {import_history.csv_filename} [{start}-{import_chunk.end_offset}]')
+
+    loader = get_loader(import_history.engine, BATCH_SIZE)
+    started = time.monotonic()
+    try:
+        records_processed = import_rows(import_history, import_chunk, loader)
+    except Exception as e:
+        logger.error(f'Erreur lors de l\'import de la tranche {import_chunk.pk} : {str(e)}')
+        import_chunk.status = 'failed'
+        import_chunk.error_message = str(e)
+        import_chunk.save(update_fields=['status', 'error_message', 'updated_at'])
+        retrying = isinstance(e, DatabaseError) and self.request.retries < self.max_retries
+        if not retrying:
+            # Les autres tranches continuent : le statut de l'import est fixé par
+            # le callback d'erreur du chord (fail_csv_import) une fois toutes terminées
+            save_progress(import_history)
+        raise
+
+    import_chunk.status = 'completed'
+    import_chunk.save(update_fields=['status', 'updated_at'])
+    save_progress(import_history)
+    elapsed = time.monotonic() - started
+    refresh_statistics()
+    logger.info(f'Tranche {import_chunk.pk} terminée : {import_chunk.records_processed}/{import_chunk.records_read} enregistrements')
+    logger.info(
+        f'Tranche {import_chunk.pk} : {import_chunk.records_inserted} insérés, '
+        f'{import_chunk.records_updated} mis à jour, {import_chunk.records_unchanged} inchangés'
+    )
+    logger.info(f'Débit du moteur {loader.engine} : {records_processed / max(elapsed, 1e-6):.0f} lignes/s')
+
+def chunk_totals(import_history):
+    """Reporte sur l'import (sans l'enregistrer) les compteurs cumulés de ses tranches.
+
+    Returns:
+        Le nombre de lignes lues dans les tranches
+    """
+    totals = import_history.importchunk_set.aggregate(
+        read=Sum('records_read'), processed=Sum('records_processed'),
+        inserted=Sum('records_inserted'), updated=Sum('records_updated'), unchanged=Sum('records_unchanged')
+    )
+    import_history.records_processed = totals['processed'] or 0
+    import_history.records_inserted = totals['inserted'] or 0
+    import_history.records_updated = totals['updated'] or 0
+    import_history.records_unchanged = totals['unchanged'] or 0
+    return totals['read'] or 0
+
+def save_progress(import_history):
+    """Point de contrôle de la progression d'un import : ses compteurs en base suivent ceux de ses tranches."""
+    chunk_totals(import_history)
+    import_history.save(update_fields=list(progress.COUNTERS))
+
+@shared_task
+def finalize_csv_import(import_history_id):
+    """Clôture un import une fois toutes ses tranches terminées."""
+    import_history = ImportHistory.objects.get(pk=import_history_id)
+    import_chunks = import_history.importchunk_set.all()
+    if import_chunks.exclude(status__in=['completed', 'failed']).exists():
+        # Des tranches sont encore traitées par une reprise, elle clôturera l'import
+        return
+
+    records = chunk_totals(import_history)
+    records_processed = import_history.records_processed
+    failed_chunks = import_chunks.filter(status='failed').count()
+
+    import_history.total_records = records
+    error_count = import_history.decesimporterror_set.count()
+
+    # Nouveaux décès importés : reconstruire le résumé utilisé pour l'élagage des partitions
+    rebuild_partition_summary.delay()
+    # Mois restés signalés après un échec de recalcul en fin de tranche
+    refresh_statistics()
+
+    fields = ['total_records', *progress.COUNTERS]
+    if failed_chunks:
+        import_history.update_status('failed', f'{failed_chunks} tranche(s) non terminée(s)', fields)
+        logger.error(f'Import de {import_history.csv_filename} incomplet : {failed_chunks} tranche(s) en échec')
+    else:
+        if records_processed < records * 0.9:  # Si moins de 90% des enregistrements ont été traités
+            import_history.update_status('failed', f'Import incomplet : seulement {records_processed}/{records} enregistrements traités', fields)
+        else:
+            import_history.update_status('completed', fields=fields)
+        logger.info(f'Import terminé : {records_processed} enregistrements traités, {error_count} erreurs')
+        logger.info(
+            f'{import_history.records_inserted} insérés, {import_history.records_updated} mis à jour, '
+            f'{import_history.records_unchanged} inchangés'
+        )
+
+    # Supprimé même en cas d'échec : une reprise le décompresse à nouveau
+    # depuis le ZIP en cache (ensure_csv_available)
+    csv_path = get_csv_path(import_history.pk)
+    if os.path.exists(csv_path):
+        os.unlink(csv_path)
+
+@shared_task
+def fail_csv_import(request, exc, traceback, import_history_id):
+    """Callback d'erreur du chord des tranches : appelé à la place de finalize_csv_import
+    quand une tranche a échoué sans nouvelle tentative, une fois les autres terminées."""
+    logger.error(f'Tranche(s) de l\'import {import_history_id} en échec : {exc}')
+    finalize_csv_import(import_history_id)
+
+def refresh_statistics():
+    """Recalcule les agrégats des mois modifiés ; en cas d'échec, ils restent signalés pour la tranche suivante.
+
+    Returns:
+        Le nombre de mois recalculés
+    """
+    start = time.time()
+    try:
+        months = refresh_pending()
+    except DatabaseError as e:
+        logger.warning(f'Recalcul des statistiques reporté : {str(e)}')
+        return 0
+    if months:
+        logger.info(f'Statistiques recalculées pour {months} mois en {time.time() - start:.1f}s')
+    return months
+
+@shared_task
+def refresh_pending_statistics():
+    """Recalcule les agrégats des mois signalés hors d'un import (réimport d'une ligne en erreur)."""
+    if refresh_statistics():
+        # Les statistiques en cache sont indexées sur la version des données
+        bump_data_version()
+
+@shared_task
+def rebuild_partition_summary():
+    """Reconstruit le résumé des années de décès par nom."""
+    start = time.time()
+    count = rebuild_summary()
+    logger.info(f'Résumé par nom reconstruit : {count} noms en {time.time() - start:.1f}s')
+
+@shared_task
+def maintain_partitions():
+    """Tâche périodique : crée à l'avance les partitions annuelles de deces_deces."""
+    partitions, sql = ensure_partitions()
+    if sql:
+        logger.info(f'Partitions créées : {sql}')
+    for partition in partitions:
+        logger.info(f'Partition {partition["name"]} (< {partition["less_than"]}) : {partition["rows"]} lignes, '
+                    f'{(partition["data_length"] + partition["index_length"]) / 1024 / 1024:.1f} Mo')
+
+@shared_task
+def export_search_results(export_id):
+    """Écrit les résultats d'une recherche dans un fichier d'export, en mettant à jour la progression à chaque lot."""
+    search_export = SearchExport.objects.get(pk=export_id)
+    exports = SearchExport.objects.filter(pk=export_id)
+    path = os.path.join(settings.EXPORT_DIR, f'export-{export_id}.{extension(search_export.format, search_export.compress)}')
+    partial_path = f'{path}.part'
+    try:
+        queryset, _ = search_queryset(QueryDict(search_export.query))
+        limit = settings.EXPORT_ASYNC_MAX_ROWS
+        total_rows = min(queryset.order_by()[:limit + 1].count(), limit)
+        exports.update(status='processing', total_rows=total_rows)
+
+        def tracked(batches):
+            written = 0
+            for rows in batches:
+                yield rows
+                written += len(rows)
+                exports.update(rows_written=written)
+
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        with open(partial_path, 'wb') as f:
+            for data in export_stream(tracked(iter_batches(queryset, limit)), search_export.format, search_export.compress):
+                f.write(data)
+        os.replace(partial_path, path)
+    except Exception as e:
+        logger.error(f'Erreur lors de l\'export {export_id} : {str(e)}')
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        exports.update(status='failed', error_message=str(e), completed_at=timezone.now())
+        raise
+
+    exports.update(status='completed', file_path=path, completed_at=timezone.now())
+    logger.info(f'Export {export_id} terminé : {total_rows} lignes dans {path}')
+
+@shared_task
+def run_linkage(job_id):
+    """Rapproche un fichier d'identités avec les décès, les résultats étant écrits au fur et à mesure."""
+    job = LinkageJob.objects.get(pk=job_id)
+    jobs = LinkageJob.objects.filter(pk=job_id)
+    path = os.path.join(settings.EXPORT_DIR, f'linkage-{job_id}-resultats.csv')
+    partial_path = f'{path}.part'
+    jobs.update(status='processing')
+    started = time.monotonic()
+    progress = {'processed': 0, 'matched': 0}
+
+    def tracked(results):
+        for row in results:
+            yield row
+            progress['processed'] += 1
+            progress['matched'] += row['statut'] == 'trouve'
+            if progress['processed'] % 1000 == 0:
+                jobs.update(identities_processed=progress['processed'], identities_matched=progress['matched'])
+
+    try:
+        with open(job.input_path, 'rb') as source, open(partial_path, 'w', encoding='utf-8', newline='') as output:
+            write_results_csv(tracked(match_identities(read_identities_csv(source))), output)
+        os.replace(partial_path, path)
+    except Exception as e:
+        logger.error(f'Erreur lors du rapprochement {job_id} : {str(e)}')
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+        jobs.update(status='failed', error_message=str(e), completed_at=timezone.now())
+        raise
+
+    rate = progress['processed'] / max(time.monotonic() - started, 1e-6)
+    jobs.update(
+        status='completed', output_path=path, completed_at=timezone.now(),
+        identities_processed=progress['processed'], identities_matched=progress['matched'],
+        identities_per_second=rate
+    )
+    logger.info(f'Rapprochement {job_id} terminé : {progress["matched"]}/{progress["processed"]} identités trouvées ({rate:.0f} identités/s)')
+
+def is_resumable(import_history):
+    """Indique si un import interrompu peut être repris."""
+    return import_history.status in ['processing', 'failed'] and import_history.md5_hash != 'unknown'
+
+@shared_task
+def resume_import(import_history_id):
+    """Reprend un import interrompu à partir des points de contrôle de ses tranches.
+
+    Seules les tranches non terminées sont relancées ; chacune repart de son
+    dernier bloc validé. Un import antérieur au découpage en tranches est
+    découpé à cette occasion.
+    """
+    import_history = ImportHistory.objects.get(pk=import_history_id)
+    if not is_resumable(import_history):
+        logger.info(f'L\'import {import_history.pk} ({import_history.status}) ne peut pas être repris')
+        return
+
+    try:
+        ensure_csv_available(import_history)
+    except Exception as e:
+        logger.error(f'Reprise de l\'import {import_history.pk} impossible : {str(e)}')
+        import_history.update_status('failed', str(e))
+        raise
+
+    import_chunks = list(import_history.importchunk_set.exclude(status='completed'))
+    if not import_history.importchunk_set.exists():
+        import_chunks = create_chunks(import_history)
+
+    chunk_totals(import_history)
+    import_history.status = 'processing'
+    import_history.error_message = ''
+    import_history.completed_at = None
+    import_history.save(update_fields=['status', 'error_message', 'completed_at', *progress.COUNTERS])
+    # Les compteurs publiés repartent de l'état validé des tranches
+    import_history.publish_progress()
+    logger.info(f'Reprise de {len(import_chunks)} tranche(s) de {import_history.csv_filename}')
+    dispatch_chunks(import_history, import_chunks)
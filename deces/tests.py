@@ -1,3 +1,1286 @@
-from django.test import TestCase
+import asyncio
+import fcntl
+import hashlib
+import http.server
+import io
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from types import SimpleNamespace
+from datetime import date, timedelta
+from unittest import mock
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from deces.models import (
+    Commune, Deces, DecesImportError, DecesStat, DecesStatPending, Departement, ImportChunk, ImportHistory,
+    NomPartitionSummary, Pays, Region, SearchExport
+)
+from deces.benchmarks import report
+from deces.benchmarks.generator import INSEE_HEADER, CogReference, generate_rows, write_insee_csv
+from deces.loaders import DECES_FIELDS, BulkLoader, OrmLoader, last_by_key
+from deces.filters import search_queryset
+from deces.fingerprints import FINGERPRINT_FIELDS, row_fingerprint
+from deces import (
+    autocomplete, downloads, export, geography, linkage, metrics, ngrams, pagination, partitions, phonetics, query_audit,
+    query_limits, search_cache, stats, tasks
+)
 
-# Create your tests here.
+# Les tests n'ont pas besoin du serveur Redis configuré pour le cache
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# ni de celui de la progression en direct des imports
+without_progress = mock.patch('deces.progress._publish', lambda import_id, pipeline_steps: None)
+
+
+def make_deces(**fields):
+    values = {
+        'nom': 'DUPONT', 'prenoms': 'JEAN', 'sexe': '1', 'date_naissance': date(1930, 5, 1),
+        'lieu_naissance': '75056', 'date_deces': date(2020, 3, 1), 'lieu_deces': '75056', 'acte_deces': '1',
+    }
+    values.update(fields)
+    return Deces.objects.create(**values)
+
+
+def make_import(**fields):
+    values = {'zip_url': 'http://example.com/deces.zip', 'csv_filename': 'deces.csv', 'md5_hash': '0' * 32}
+    values.update(fields)
+    return ImportHistory.objects.create(**values)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PartitionSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bounds_from_birth_dates(self):
+        lower, upper, reasons = partitions.implicit_bounds(date_naissance_debut='1930-01-01', date_naissance_fin='1939-12-31')
+        self.assertEqual(lower, date(1930, 1, 1))
+        self.assertEqual(upper, date(1939 + partitions.MAX_AGE_YEARS + 1, 1, 1))
+        self.assertEqual(len(reasons), 2)
+
+    def test_bounds_from_summary(self):
+        make_deces(date_deces=date(2019, 6, 1))
+        make_deces(date_deces=date(2021, 6, 1), acte_deces='2')
+        partitions.rebuild_summary()
+        lower, upper, _ = partitions.implicit_bounds(nom='DUPONT')
+        self.assertEqual((lower, upper), (date(2019, 1, 1), date(2022, 1, 1)))
+
+    def test_name_missing_from_summary_does_not_empty_results(self):
+        partitions.rebuild_summary()
+        NomPartitionSummary.objects.all().delete()
+        make_deces(nom='MARTIN')
+        cache.set(partitions.SUMMARY_VALID_CACHE_KEY, True, None)
+        lower, upper, _ = partitions.implicit_bounds(nom='MARTIN')
+        self.assertEqual((lower, upper), (None, None))
+        queryset, _ = partitions.prune_partitions(Deces.objects.filter(nom='MARTIN'), nom='MARTIN')
+        self.assertEqual(queryset.count(), 1)
+
+    def test_deces_write_invalidates_summary(self):
+        partitions.rebuild_summary()
+        self.assertTrue(cache.get(partitions.SUMMARY_VALID_CACHE_KEY))
+        deces = make_deces()
+        self.assertIsNone(cache.get(partitions.SUMMARY_VALID_CACHE_KEY))
+        partitions.rebuild_summary()
+        deces.delete()
+        self.assertIsNone(cache.get(partitions.SUMMARY_VALID_CACHE_KEY))
+
+    def test_summary_stays_invalid_while_chunks_run(self):
+        import_history = make_import()
+        chunk = ImportChunk.objects.create(import_history=import_history, start_offset=0, end_offset=10, status='processing')
+        partitions.rebuild_summary()
+        self.assertIsNone(cache.get(partitions.SUMMARY_VALID_CACHE_KEY))
+        chunk.status = 'completed'
+        chunk.save()
+        partitions.rebuild_summary()
+        self.assertTrue(cache.get(partitions.SUMMARY_VALID_CACHE_KEY))
+
+
+class FailingLoader(OrmLoader):
+    """Chargeur dont l'écriture d'un lot plein échoue, comme lors d'une coupure de la base."""
+
+    def add(self, data):
+        raise OperationalError('connexion perdue')
+
+
+@without_progress
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportErrorSinkTests(TestCase):
+    def row(self):
+        return pd.Series({'nomprenom': 'SANS ETOILE', 'sexe': '1'})
+
+    def test_budget_is_a_ratio_with_a_minimum(self):
+        with self.settings(IMPORT_ERROR_BUDGET_RATIO=0.01):
+            self.assertEqual(tasks.ImportErrorSink(make_import(total_records=1000000)).budget, 10000)
+            small = make_import(total_records=10, csv_filename='petit.csv')
+            self.assertEqual(tasks.ImportErrorSink(small).budget, tasks.MAX_ERRORS)
+
+    def test_budget_counts_saved_errors_and_stops_the_import(self):
+        import_history = make_import(total_records=10)
+        DecesImportError.objects.bulk_create([
+            DecesImportError(raw_data={}, error_message='format', import_history=import_history)
+            for _ in range(tasks.MAX_ERRORS)
+        ])
+        errors = tasks.ImportErrorSink(import_history)
+        self.assertEqual(errors.error_count, tasks.MAX_ERRORS)
+        with self.assertRaisesMessage(Exception, 'Trop d\'erreurs'):
+            errors.add(self.row(), tasks.ParseError('format invalide', 'nomprenom'))
+
+    def test_reason_comes_from_parse_error_code(self):
+        import_history = make_import()
+        errors = tasks.ImportErrorSink(import_history, compact=True)
+        errors.add(self.row(), tasks.ParseError('format invalide', 'nomprenom'))
+        errors.add(self.row(), ValueError('valeur imprévue'))
+        errors.flush()
+        self.assertEqual(
+            sorted(import_history.decesimporterror_set.values_list('reason', flat=True)), ['inattendue', 'nomprenom']
+        )
+
+    def test_loader_database_errors_are_not_row_errors(self):
+        with tempfile.TemporaryDirectory() as work_dir, self.settings(IMPORT_WORK_DIR=work_dir), \
+                mock.patch.object(tasks, 'VECTORIZED_PARSING', False):
+            import_history = make_import(total_records=3)
+            csv_path = tasks.get_csv_path(import_history.pk)
+            write_insee_csv(csv_path, generate_rows(3, CogReference(), error_rate=0))
+            (start, end), = tasks.split_csv_ranges(csv_path, tasks.RANGE_SIZE)
+            import_chunk = ImportChunk.objects.create(import_history=import_history, start_offset=start, end_offset=end)
+            # Lignes valides parsées une à une : l'erreur vient de l'écriture du lot
+            with self.assertRaises(OperationalError):
+                tasks.import_rows(import_history, import_chunk, FailingLoader(tasks.BATCH_SIZE))
+        self.assertFalse(DecesImportError.objects.exists())
+
+
+class ParseChunkTests(SimpleTestCase):
+    """parse_chunk applique les règles de parse_row ; les lignes qu'il écarte sont reprises par parse_row."""
+
+    ROWS = [
+        ['DUPONT*JEAN PIERRE/', '1', '19300512', '75056', 'PARIS', '', '20200301', '75056', '1'],
+        ['DUPONT*JEAN/', '1', '19300012', '75056', 'PARIS', '', '20200301', '75056', '2'],  # mois inconnu
+        ['DUPONT*JEAN/', '2', '19300500', '75056', 'PARIS', '', '20200300', '75056', '3'],  # jours inconnus
+        ['DUPONT*JEAN/', '1', '00000000', '99134', 'MADRID', 'ESPAGNE', '20200301', '75056', '4'],
+        ['*JEAN/', '1', '19300512', '75056', 'PARIS', '', '20200301', '75056', '5'],  # nom vide
+        ['DUPONT JEAN/', '1', '19300512', '75056', 'PARIS', '', '20200301', '75056', '6'],
+        ['DUPONT*JEAN/', '3', '19300512', '75056', 'PARIS', '', '20200301', '75056', '7'],
+        ['DUPONT*JEAN/', '1', '19300512', '75056', 'PARIS', '', '00000000', '75056', '8'],
+        ['DUPONT*JEAN/', '1', '19301345', '75056', 'PARIS', '', '20200301', '75056', '9'],
+        [None, '1', '19300512', '75056', 'PARIS', '', '20200301', '75056', '10'],
+    ]
+
+    def assert_parity(self, chunk):
+        parsed, fallback_index = tasks.parse_chunk(chunk)
+        self.assertEqual(len(parsed) + len(fallback_index), len(chunk))
+        for index, record in parsed.to_dict('index').items():
+            self.assertEqual(record, tasks.parse_row(chunk.loc[index]), f'ligne {index}')
+        return parsed, fallback_index
+
+    def test_edge_cases(self):
+        chunk = pd.DataFrame(self.ROWS, columns=INSEE_HEADER)
+        parsed, fallback_index = self.assert_parity(chunk)
+        self.assertEqual(list(parsed.index), [0, 1, 2, 3, 4])
+        self.assertEqual(parsed.loc[1, 'date_naissance'], date(1930, 1, 12))
+        self.assertEqual(parsed.loc[2, 'date_deces'], date(2020, 3, 1))
+        self.assertIsNone(parsed.loc[3, 'date_naissance'])
+        self.assertIsNone(parsed.loc[4, 'nom'])
+
+        codes = []
+        for index in fallback_index:
+            with self.assertRaises(tasks.ROW_ERRORS) as context:
+                tasks.parse_row(chunk.loc[index])
+            codes.append(getattr(context.exception, 'code', 'inattendue'))
+        self.assertEqual(codes, ['nomprenom', 'champs_obligatoires', 'champs_obligatoires', 'date_naissance', 'inattendue'])
+
+    def test_empty_chunk(self):
+        # Bloc réduit à des lignes vides ou de fin de fichier
+        chunk = pd.DataFrame(columns=INSEE_HEADER, dtype=str)
+        parsed, fallback_index = tasks.parse_chunk(chunk)
+        self.assertTrue(parsed.empty)
+        self.assertEqual(list(parsed.columns), list(tasks.PARSED_FIELDS))
+        self.assertEqual(len(fallback_index), 0)
+
+    def test_generated_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/deces.csv'
+            write_insee_csv(path, generate_rows(2000, CogReference(), error_rate=0.05))
+            chunk = pd.read_csv(path, sep=';', dtype=str)
+        parsed, fallback_index = self.assert_parity(chunk)
+        self.assertGreater(len(fallback_index), 0)
+        for index in fallback_index:
+            with self.assertRaises(tasks.ParseError):
+                tasks.parse_row(chunk.loc[index])
+
+
+class CsvRangeTests(SimpleTestCase):
+    """Les tranches couvrent chaque ligne du CSV exactement une fois, en-tête exclu."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/deces.csv'
+        write_insee_csv(self.path, generate_rows(500, CogReference(), error_rate=0))
+        with open(self.path, 'rb') as f:
+            self.header_size = len(f.readline())
+            self.size = self.header_size + len(f.read())
+
+    def read_range(self, start, end):
+        return [frame for frame, _ in tasks.iter_csv_range(self.path, start, end)]
+
+    def test_ranges_are_contiguous_and_line_aligned(self):
+        ranges = tasks.split_csv_ranges(self.path, 1000)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[0][0], self.header_size)
+        self.assertEqual(ranges[-1][1], self.size)
+        with open(self.path, 'rb') as f:
+            for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, next_start)
+                f.seek(end - 1)
+                self.assertEqual(f.read(1), b'\n')
+
+    def test_every_row_is_read_once(self):
+        frames = [
+            frame for start, end in tasks.split_csv_ranges(self.path, 1000) for frame in self.read_range(start, end)
+        ]
+        rows = pd.concat(frames, ignore_index=True)
+        pd.testing.assert_frame_equal(rows, pd.read_csv(self.path, sep=';', dtype=str))
+
+    def test_single_range_larger_than_file(self):
+        self.assertEqual(tasks.split_csv_ranges(self.path, self.size * 2), [(self.header_size, self.size)])
+
+    def test_blocks_and_checkpoint_offsets(self):
+        with mock.patch.object(tasks, 'CHUNK_SIZE', 200):
+            blocks = list(tasks.iter_csv_range(self.path, self.header_size, self.size))
+        self.assertEqual([len(frame) for frame, _ in blocks], [200, 200, 100])
+        self.assertEqual(blocks[-1][1], self.size)
+        # Reprise depuis le point de contrôle du premier bloc
+        with mock.patch.object(tasks, 'CHUNK_SIZE', 200):
+            resumed = list(tasks.iter_csv_range(self.path, blocks[0][1], self.size))
+        self.assertEqual(sum(len(frame) for frame, _ in resumed), 300)
+
+    def test_header_only_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'nomprenom;sexe\n')
+        self.assertEqual(tasks.split_csv_ranges(self.path, 1000), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Dates de naissance en double et inconnues : le départage se fait sur la clé primaire
+        for number in range(25):
+            make_deces(
+                nom=f'NOM{number % 4}',
+                date_naissance=None if number % 5 == 0 else date(1930 + number % 3, 1, 1),
+                date_deces=date(2020, 1, 1 + number % 7),
+                acte_deces=str(number),
+            )
+
+    def expected(self, field, descending):
+        def key(deces):
+            return tuple(getattr(deces, name) for name in pagination.sort_keys(field))
+        rows = list(Deces.objects.all())
+        nulls = [row for row in rows if getattr(row, field) is None]
+        values = sorted((row for row in rows if getattr(row, field) is not None), key=key, reverse=descending)
+        nulls.sort(key=key, reverse=descending)
+        return [row.pk for row in (values + nulls if descending else nulls + values)]
+
+    def walk(self, field, descending):
+        pages = []
+        cursor = None
+        while True:
+            page = pagination.keyset_paginate(Deces.objects.all(), field, descending, cursor, per_page=4)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_follow_sort_order_with_nulls(self):
+        for field in ('date_naissance', 'nom', 'date_deces'):
+            for descending in (False, True):
+                with self.subTest(field=field, descending=descending):
+                    pages = self.walk(field, descending)
+                    self.assertEqual([row.pk for page in pages for row in page], self.expected(field, descending))
+                    self.assertEqual([page.number for page in pages], list(range(1, len(pages) + 1)))
+
+    def test_previous_cursor_returns_previous_page(self):
+        pages = self.walk('date_naissance', False)
+        for previous, page in zip(pages, pages[1:]):
+            back = pagination.keyset_paginate(Deces.objects.all(), 'date_naissance', False, page.previous_cursor, per_page=4)
+            self.assertEqual([row.pk for row in back], [row.pk for row in previous])
+            self.assertEqual(back.number, previous.number)
+        self.assertFalse(pages[0].has_previous)
+
+    def test_seek_filter_is_strictly_after(self):
+        rows = list(Deces.objects.order_by(*pagination.ordering(pagination.sort_keys('date_naissance'), False)))
+        for position, row in enumerate(rows):
+            keys = [(field, getattr(row, field)) for field in pagination.sort_keys('date_naissance')]
+            after = Deces.objects.filter(pagination.seek_filter(keys, False))
+            self.assertEqual({deces.pk for deces in after}, {deces.pk for deces in rows[position + 1:]})
+
+    def test_capped_count(self):
+        page = pagination.keyset_paginate(Deces.objects.all(), 'nom', count_cap=10)
+        self.assertEqual((page.count, page.count_capped), (10, True))
+
+
+class CursorTests(SimpleTestCase):
+    fields = pagination.sort_keys('date_naissance')
+
+    def row(self):
+        return Deces(date_naissance=date(1930, 5, 1), date_deces=date(2020, 3, 1), lieu_deces='75056', acte_deces='12')
+
+    def test_round_trip(self):
+        cursor = pagination.encode_cursor(self.row(), self.fields, False, 3, 'next')
+        keys, number, direction = pagination.decode_cursor(cursor, self.fields, False)
+        self.assertEqual(keys, [
+            ('date_naissance', date(1930, 5, 1)), ('date_deces', date(2020, 3, 1)), ('lieu_deces', '75056'), ('acte_deces', '12')
+        ])
+        self.assertEqual((number, direction), (3, 'next'))
+
+    def test_rejects_tampered_or_foreign_cursors(self):
+        cursor = pagination.encode_cursor(self.row(), self.fields, False, 3, 'next')
+        self.assertIsNone(pagination.decode_cursor(cursor[:-2] + 'xx', self.fields, False))
+        self.assertIsNone(pagination.decode_cursor(cursor, self.fields, True))
+        self.assertIsNone(pagination.decode_cursor(cursor, pagination.sort_keys('nom'), False))
+        self.assertIsNone(pagination.decode_cursor('pas-un-curseur', self.fields, False))
+        self.assertIsNone(pagination.decode_cursor('', self.fields, False))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TrigramSearchTests(TestCase):
+    NOMS = ['MARTIN', 'MARTINEZ', 'DUMARTINET', 'BERNARD', 'ANANAS', 'LE GALL', 'MA']
+
+    def setUp(self):
+        cache.clear()
+        for number, nom in enumerate(self.NOMS):
+            make_deces(nom=nom, prenoms='JEAN MARIE', acte_deces=str(number))
+        cache.set(ngrams.INDEX_READY_CACHE_KEY, True, None)
+
+    def search(self, substring):
+        return sorted(Deces.objects.filter(ngrams.contains_filter('nom', substring)).values_list('nom', flat=True))
+
+    def test_trigrams(self):
+        self.assertEqual(ngrams.trigrams('MARTIN'), {'MAR', 'ART', 'RTI', 'TIN'})
+        self.assertEqual(ngrams.trigrams('AAAA'), {'AAA'})
+        self.assertEqual(ngrams.trigrams('MA'), set())
+        self.assertEqual(ngrams.trigram_rows('nom', {None, ''}), [])
+
+    def test_matches_like_contains(self):
+        for substring in ('MARTIN', 'ARTI', 'TINE', 'ANA', 'NANA', 'E GA', 'ZZZ', 'NAS'):
+            with self.subTest(substring=substring):
+                expected = sorted(nom for nom in self.NOMS if substring in nom)
+                self.assertEqual(self.search(substring), expected)
+
+    def test_uses_the_index_for_long_substrings(self):
+        self.assertEqual(ngrams.contains_filter('nom', 'ART').children[0][0], 'nom__in')
+
+    def test_short_substrings_fall_back_to_like(self):
+        self.assertEqual(ngrams.contains_filter('nom', 'MA'), Q(nom__contains='MA'))
+        self.assertEqual(self.search('MA'), ['DUMARTINET', 'MA', 'MARTIN', 'MARTINEZ'])
+
+    def test_index_not_ready_falls_back_to_like(self):
+        cache.delete(ngrams.INDEX_READY_CACHE_KEY)
+        self.assertEqual(ngrams.contains_filter('nom', 'MARTIN'), Q(nom__contains='MARTIN'))
+        self.assertEqual(self.search('MARTIN'), ['DUMARTINET', 'MARTIN', 'MARTINEZ'])
+
+
+class PhoneticsTests(SimpleTestCase):
+    def test_normalize(self):
+        self.assertEqual(phonetics.normalize("Lefèvre"), 'LEFEVRE')
+        self.assertEqual(phonetics.normalize("D'ALEMBERT-LE ROND"), 'DALEMBERTLEROND')
+        self.assertIsNone(phonetics.normalize(''))
+        self.assertIsNone(phonetics.normalize("-' "))
+
+    def test_equivalent_spellings_share_a_key(self):
+        for names in (
+            ['LEFEVRE', 'LEFEBVRE', 'LEFÈVRE'],
+            ['DUPONT', 'DUPOND'],
+            ['PHILIPPE', 'FILIPE'],
+            ['GUÉRIN', 'GERIN'],
+            ['MOREAU', 'MORO'],
+            ['THOMAS', 'TOMAS'],
+            ['LE GALL', 'LEGAL'],
+        ):
+            with self.subTest(names=names):
+                self.assertEqual(len({phonetics.phonetic(name) for name in names}), 1)
+
+    def test_distinct_names_keep_distinct_keys(self):
+        keys = [phonetics.phonetic(name) for name in ('MARTIN', 'BERNARD', 'DUPONT', 'LEFEVRE', 'DURAND')]
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertEqual(phonetics.phonetic('LEFEBVRE'), 'LFVR')
+        self.assertLessEqual(len(phonetics.phonetic('SAINT-MARTIN DE LA FONTAINE')), phonetics.PHONETIC_LENGTH)
+
+    def test_name_keys(self):
+        self.assertEqual(phonetics.name_keys('Lefèbvre', 'Jean-Pierre Marie'), {
+            'nom_normalise': 'LEFEBVRE', 'nom_phonetique': 'LFVR',
+            'prenom_normalise': 'JEANPIERRE', 'prenom_phonetique': phonetics.phonetic('JEANPIERRE'),
+        })
+        self.assertEqual(set(phonetics.name_keys(None, None).values()), {None})
+
+    def test_vectorized_keys_match_scalar_keys(self):
+        noms = ['LEFÈVRE', 'DUPOND', None, '', "D'ARC", 'LE GALL']
+        prenoms = ['JEAN PIERRE', None, 'MARIE', '  ', 'JEANNE', 'ANNE-SOPHIE']
+        frame = phonetics.name_keys_frame(pd.Series(noms, dtype=object), pd.Series(prenoms, dtype=object))
+        for position, (nom, prenom) in enumerate(zip(noms, prenoms)):
+            self.assertEqual(frame.iloc[position].to_dict(), phonetics.name_keys(nom, prenom), f'{nom} {prenom}')
+
+
+class FingerprintTests(SimpleTestCase):
+    DATA = {
+        'nom': 'DUPONT', 'prenoms': 'JEAN', 'sexe': '1', 'date_naissance': date(1930, 5, 1), 'lieu_naissance': '75056',
+        'lieu_naissance_nom': None, 'date_deces': date(2020, 3, 1), 'lieu_deces': '75056', 'acte_deces': '12',
+    }
+
+    def test_stable_signed_64_bits(self):
+        fingerprint = row_fingerprint(self.DATA)
+        self.assertEqual(fingerprint, row_fingerprint(dict(self.DATA)))
+        self.assertTrue(-2 ** 63 <= fingerprint < 2 ** 63)
+
+    def test_every_file_field_counts(self):
+        fingerprint = row_fingerprint(self.DATA)
+        for field in FINGERPRINT_FIELDS:
+            with self.subTest(field=field):
+                changed = dict(self.DATA, **{field: date(1999, 1, 1) if 'date' in field else 'X'})
+                self.assertNotEqual(row_fingerprint(changed), fingerprint)
+
+    def test_derived_fields_are_ignored(self):
+        derived = dict(self.DATA, nom_phonetique='DPN', lieu_deces_libelle='Paris', empreinte=1)
+        self.assertEqual(row_fingerprint(derived), row_fingerprint(self.DATA))
+
+    def test_values_do_not_shift_between_fields(self):
+        self.assertNotEqual(
+            row_fingerprint(dict(self.DATA, nom='DUPONTJ', prenoms='EAN')), row_fingerprint(self.DATA)
+        )
+
+    def test_csv_row_and_saved_deces_agree(self):
+        # Une ligne relue du fichier a l'empreinte enregistrée par Deces.save : elle sera reconnue inchangée
+        row = pd.Series(dict(zip(INSEE_HEADER, ['DUPONT*JEAN/', '1', '19300501', '75056', '', '', '20200301', '75056', '12'])))
+        self.assertEqual(row_fingerprint(tasks.parse_row(row)), row_fingerprint(self.DATA))
+
+
+@without_progress
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchCacheVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.version = search_cache.data_version()
+
+    def import_file(self, import_history):
+        with tempfile.TemporaryDirectory() as work_dir, self.settings(IMPORT_WORK_DIR=work_dir):
+            csv_path = tasks.get_csv_path(import_history.pk)
+            write_insee_csv(csv_path, generate_rows(50, CogReference(), error_rate=0))
+            (start, end), = tasks.split_csv_ranges(csv_path, tasks.RANGE_SIZE)
+            import_chunk = ImportChunk.objects.create(import_history=import_history, start_offset=start, end_offset=end)
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.import_rows(import_history, import_chunk, OrmLoader(tasks.BATCH_SIZE))
+
+    def test_each_committed_block_bumps_the_version(self):
+        import_history = make_import(total_records=50)
+        self.import_file(import_history)
+        version = search_cache.data_version()
+        self.assertNotEqual(version, self.version)
+        # Réimport à l'identique : aucune ligne écrite, les pages en cache restent valides
+        self.import_file(import_history)
+        self.assertEqual(search_cache.data_version(), version)
+
+    def test_failed_import_bumps_the_version(self):
+        import_history = make_import()
+        with self.captureOnCommitCallbacks(execute=True):
+            import_history.update_status('failed', 'Tranche en échec')
+        self.assertNotEqual(search_cache.data_version(), self.version)
+
+
+class StagingRecorder(BulkLoader):
+    """Chargeur natif qui relit le fichier de staging au lieu de le charger (pas de MariaDB ni de PostgreSQL ici)."""
+
+    def prepare_staging_table(self, cursor):
+        self.staged = []
+
+    def load_staging_file(self, cursor, path):
+        with open(path, encoding='utf-8') as staging_file:
+            self.staged = [line.rstrip('\n').split('\t') for line in staging_file]
+
+    def merge_partition(self, cursor, year):
+        pass
+
+
+class BulkLoaderTests(TestCase):
+    def row(self, acte, nom):
+        return {'date_deces': date(2020, 3, 1), 'lieu_deces': '75056', 'acte_deces': acte, 'nom': nom}
+
+    def test_last_by_key_keeps_the_last_row_read(self):
+        rows = [self.row('1', 'PREMIER'), self.row('2', 'AUTRE'), self.row('1', 'DERNIER')]
+        self.assertEqual([row['nom'] for row in last_by_key(rows)], ['DERNIER', 'AUTRE'])
+
+    def test_staging_file_has_unique_keys(self):
+        fields = dict.fromkeys(DECES_FIELDS)
+        loader = StagingRecorder(tasks.BATCH_SIZE)
+        loader.write([dict(fields, **self.row('1', 'PREMIER')), dict(fields, **self.row('1', 'DERNIER'))])
+        self.assertEqual(len(loader.staged), 1)
+        self.assertEqual(loader.staged[0][DECES_FIELDS.index('nom')], 'DERNIER')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_ENABLED=False)
+class ImportProgressAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.import_history = make_import(status='completed')
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.user = User.objects.create_user('utilisateur')
+
+    async def test_events_are_staff_only(self):
+        self.assertEqual((await self.async_client.get('/import/events/')).status_code, 403)
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual((await self.async_client.get('/import/events/')).status_code, 403)
+
+    async def test_status_is_staff_only(self):
+        url = f'/import/{self.import_history.pk}/status/'
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'completed')
+
+
+class ParquetExportTests(SimpleTestCase):
+    @unittest.skipUnless(export.parquet_supported(), 'pyarrow absent')
+    def test_stream_reads_back_as_parquet(self):
+        import pyarrow.parquet as pq
+
+        row = tuple(date(2020, 3, 1) if field in export.DATE_FIELDS else 'X' for field in export.EXPORT_FIELDS)
+        data = b''.join(export.export_stream([[row] * 3, [row] * 2], 'parquet'))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column_names, list(export.EXPORT_FIELDS))
+        self.assertEqual(pq.ParquetFile(io.BytesIO(data)).num_row_groups, 2)
+
+
+class MetricsSummaryTests(SimpleTestCase):
+    def test_sum_and_count_come_from_cumulative_totals(self):
+        window = [{'duration': 0.5}, {'duration': 1.5}]
+        described = metrics._describe(window, metrics.STAGE_MEASURES, {'duration:sum': 42.0, 'duration:count': 100.0})
+        self.assertEqual(described['duration']['p50'], 0.5)
+        self.assertEqual(described['duration']['sum'], 42.0)
+        self.assertEqual(described['duration']['count'], 100)
+
+
+def asgi_get(path, query_string=b'', cookie=None, progress=lambda: None):
+    """Sert une requête GET par ASGIHandler et retourne les messages envoyés au serveur ASGI,
+    chacun avec l'état de progress() au moment de son envoi."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'query_string': query_string, 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(b'host', b'testserver')] + ([(b'cookie', cookie.encode())] if cookie else []),
+    }
+    sent = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Future()
+
+    async def send(message):
+        sent.append(dict(message, progress=progress()))
+
+    async_to_sync(ASGIHandler())(scope, receive, send)
+    return sent
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_ENABLED=False)
+class AsgiStreamingTests(TestCase):
+    def test_search_export_streams_batch_by_batch(self):
+        for acte in '12345':
+            make_deces(acte_deces=acte)
+        batches_read = []
+
+        def counted_batches(queryset, limit):
+            for rows in export.iter_batches(queryset, limit, batch_size=2):
+                batches_read.append(len(rows))
+                yield rows
+
+        with mock.patch('deces.views.iter_batches', counted_batches):
+            sent = asgi_get('/search/export/', b'nom=DUPONT', progress=lambda: len(batches_read))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(batches_read, [2, 2, 1])
+        # Chaque lot part avant que le suivant ne soit lu
+        body = [message for message in sent if message['type'] == 'http.response.body' and message.get('body')]
+        self.assertEqual([message['progress'] for message in body], [0, 1, 2, 3])
+        self.assertEqual(b''.join(message['body'] for message in body).decode().count('DUPONT'), 5)
+
+    def test_export_download_is_read_in_blocks(self):
+        user = User.objects.create_user('utilisateur')
+        content = os.urandom(export.FILE_BLOCK_SIZE * 3 + 10)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        search_export = SearchExport.objects.create(user=user, query='nom=DUPONT', status='completed', file_path=f.name)
+        self.client.force_login(user)
+
+        blocks_read = []
+        real_chunks = export.file_chunks
+
+        def counted_chunks(path):
+            for data in real_chunks(path, block_size=export.FILE_BLOCK_SIZE // 4):
+                blocks_read.append(len(data))
+                yield data
+
+        with mock.patch('deces.views.file_chunks', counted_chunks):
+            sent = asgi_get(
+                f'/search/export/{search_export.pk}/download/',
+                cookie=f'sessionid={self.client.cookies["sessionid"].value}', progress=lambda: len(blocks_read)
+            )
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'Content-Length', str(len(content)).encode()), sent[0]['headers'])
+        body = [message for message in sent if message['type'] == 'http.response.body' and message.get('body')]
+        self.assertEqual([message['progress'] for message in body], list(range(1, 14)))
+        self.assertEqual(b''.join(message['body'] for message in body), content)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IndexAuditTests(TestCase):
+    def index_for(self, *fields):
+        return next(index.name for index in Deces._meta.indexes if tuple(index.fields) == fields)
+
+    def count_plan(self, line):
+        entries = [entry for entry in query_audit.replay([line]) if entry['label'] == 'count']
+        self.assertEqual(len(entries), 1)
+        self.assertIsNone(entries[0]['error'])
+        return [step for step in entries[0]['steps'] if step['table'] == Deces._meta.db_table]
+
+    def test_each_search_path_uses_its_index(self):
+        paths = {
+            'nom=dupont': ('nom', 'prenoms'),
+            'prenoms=jean': ('prenoms',),
+            'lieu_deces=75056&lieu_deces_type=commune': ('lieu_deces', 'date_deces'),
+            'lieu_naissance=75&lieu_naissance_type=departement': ('lieu_naissance_dep', 'date_naissance'),
+            'nom=dupond&nom_mode=phonetique': ('nom_phonetique', 'date_naissance'),
+        }
+        for line, fields in paths.items():
+            with self.subTest(line):
+                self.assertEqual([step['index'] for step in self.count_plan(line)], [self.index_for(*fields)])
+
+    def test_sort_and_region_filters_have_no_index(self):
+        indexed = {field for index in Deces._meta.indexes for field in index.fields}
+        self.assertFalse(indexed & {'sexe', 'lieu_naissance_reg', 'lieu_deces_reg', 'lieu_naissance_libelle', 'lieu_deces_libelle'})
+
+    def test_log_lines(self):
+        self.assertEqual(query_audit.parse_log_line('# commentaire'), None)
+        kind, params = query_audit.parse_log_line('1.2.3.4 - - "GET /search/?nom=MARTIN&sexe=2 HTTP/1.1" 200')
+        self.assertEqual((kind, params['nom'], params['sexe']), ('search', 'MARTIN', '2'))
+        self.assertEqual(query_audit.parse_log_line('Query\tSELECT 1;'), ('sql', 'SELECT 1'))
+        self.assertIsNone(query_audit.parse_log_line('order_by=nom'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StatsTests(TestCase):
+    def test_pending_months_are_rolled_up(self):
+        make_deces(acte_deces='1', date_naissance=date(1930, 5, 1), date_deces=date(2020, 3, 1))
+        make_deces(acte_deces='2', date_naissance=date(1930, 2, 1), date_deces=date(2020, 3, 20))
+        make_deces(acte_deces='3', date_naissance=None, sexe='2', date_deces=date(2020, 4, 2))
+        stats.mark_months([date(2020, 3, 1), date(2020, 3, 20), date(2020, 4, 2)])
+
+        self.assertEqual(stats.refresh_pending(), 2)
+        self.assertFalse(DecesStatPending.objects.exists())
+        # Anniversaire du 1er mai pas encore passé le 1er mars : 89 ans, tranche 85-89 ; 90 ans le 20 mars
+        self.assertEqual(stats.aggregate('tranche_age'), [
+            {'valeur': 85, 'total': 1}, {'valeur': 90, 'total': 1}, {'valeur': None, 'total': 1},
+        ])
+        self.assertEqual(stats.aggregate('mois', sexe='1'), [{'valeur': '2020-03-01', 'total': 2}])
+
+    def test_month_marked_again_during_refresh_stays_pending(self):
+        make_deces(date_deces=date(2020, 3, 1))
+        stats.mark_months([date(2020, 3, 1)])
+        refresh_range = stats.refresh_range
+
+        def refresh_with_concurrent_import(start, end):
+            refresh_range(start, end)
+            # Une tranche valide de nouvelles lignes du même mois pendant le recalcul
+            make_deces(acte_deces='2', date_deces=date(2020, 3, 15))
+            stats.mark_months([date(2020, 3, 15)])
+
+        with mock.patch('deces.stats.refresh_range', refresh_with_concurrent_import):
+            stats.refresh_pending()
+        self.assertEqual(list(DecesStatPending.objects.values_list('mois', flat=True)), [date(2020, 3, 1)])
+        stats.refresh_pending()
+        self.assertEqual(DecesStat.objects.get().total, 2)
+
+    @without_progress
+    def test_error_retry_defers_refresh_to_celery(self):
+        import_history = make_import()
+        error = DecesImportError.objects.create(
+            import_history=import_history, raw_data={}, error_message='date invalide',
+            nom='DUPONT', prenoms='JEAN', sexe='1', date_naissance=date(1930, 5, 1), lieu_naissance='75056',
+            date_deces=date(2020, 3, 1), lieu_deces='75056', acte_deces='1',
+        )
+        with mock.patch('deces.tasks.refresh_pending_statistics.delay') as delay:
+            self.assertEqual(error.retry_import(), (True, None))
+        delay.assert_called_once_with()
+        self.assertEqual(list(DecesStatPending.objects.values_list('mois', flat=True)), [date(2020, 3, 1)])
+        self.assertFalse(DecesStat.objects.exists())
+
+
+@without_progress
+@override_settings(CACHES=LOCMEM_CACHES)
+class ChunkFailureTests(TestCase):
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.enterContext(override_settings(IMPORT_WORK_DIR=work_dir.name))
+        self.import_history = make_import(status='processing')
+        self.chunks = ImportChunk.objects.bulk_create([
+            ImportChunk(import_history=self.import_history, start_offset=0, end_offset=100),
+            ImportChunk(import_history=self.import_history, start_offset=100, end_offset=200),
+        ])
+        with open(tasks.get_csv_path(self.import_history.pk), 'w') as f:
+            f.write(';'.join(INSEE_HEADER) + '\n')
+
+    def test_failed_chunk_leaves_siblings_running(self):
+        with mock.patch('deces.tasks.import_rows', side_effect=ValueError('ligne illisible')):
+            result = tasks.import_csv_chunk.apply(args=[self.chunks[0].pk])
+        self.assertTrue(result.failed())
+        self.assertEqual(ImportChunk.objects.get(pk=self.chunks[0].pk).status, 'failed')
+        self.import_history.refresh_from_db()
+        self.assertEqual(self.import_history.status, 'processing')
+
+    def test_chord_error_callback_closes_import(self):
+        with mock.patch('deces.tasks.chord') as chord:
+            tasks.dispatch_chunks(self.import_history, self.chunks)
+        callback = chord.return_value.call_args.args[0]
+        ImportChunk.objects.filter(pk=self.chunks[0].pk).update(status='completed')
+        ImportChunk.objects.filter(pk=self.chunks[1].pk).update(status='failed')
+
+        # Ce que fait Celery quand une tranche du chord a échoué
+        with mock.patch('deces.tasks.rebuild_partition_summary.delay'):
+            try:
+                raise ValueError('ligne illisible')
+            except ValueError as e:
+                tasks.import_csv_chunk.backend.chord_error_from_stack(callback, e)
+        self.import_history.refresh_from_db()
+        self.assertEqual(self.import_history.status, 'failed')
+        self.assertEqual(self.import_history.error_message, '1 tranche(s) non terminée(s)')
+        self.assertFalse(os.path.exists(tasks.get_csv_path(self.import_history.pk)))
+
+
+class ArchiveHandler(http.server.BaseHTTPRequestHandler):
+    """Serveur du ZIP distant : requêtes conditionnelles, plages, réponse tronquée ou plage refusée."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        body = server.body
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        server.requests.append((self.headers.get('If-None-Match'), self.headers.get('Range'), self.headers.get('If-Range')))
+        if self.headers.get('Range') and server.refuse_range:
+            server.refuse_range = False
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(body)}')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        if server.cut:
+            # Connexion coupée au milieu du corps
+            self.wfile.write(body[start:start + server.cut])
+            self.wfile.flush()
+            server.cut = None
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+
+def zip_archive(content):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('deces.csv', content)
+    return buffer.getvalue()
+
+
+class DownloadCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.enterContext(override_settings(ZIP_CACHE_DIR=cache_dir.name))
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ArchiveHandler)
+        self.server.body = zip_archive(os.urandom(3 * downloads.DOWNLOAD_BLOCK_SIZE))
+        self.server.cut = None
+        self.server.refuse_range = False
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/deces.zip'
+        self.paths = downloads._paths(downloads.entry_key(self.url))
+
+    @property
+    def etag(self):
+        return f'"{hashlib.md5(self.server.body).hexdigest()}"'
+
+    def fetch_contents(self, url=None):
+        with open(downloads.fetch(url or self.url), 'rb') as f:
+            return f.read()
+
+    def leave_partial(self, data, etag):
+        """Fichier partiel laissé par une tâche précédente, avec le validateur de son téléchargement."""
+        os.makedirs(downloads.cache_dir(), exist_ok=True)
+        with open(self.paths['part'], 'wb') as f:
+            f.write(data)
+        downloads._write_meta(self.paths, {'url': self.url, 'etag': etag})
+
+    def test_unchanged_archive_is_revalidated(self):
+        self.fetch_contents()
+        self.server.requests.clear()
+        self.assertEqual(self.fetch_contents(), self.server.body)
+        self.assertEqual(self.server.requests, [(self.etag, None, None)])
+
+    def test_partial_download_resumes_with_if_range(self):
+        self.leave_partial(self.server.body[:1000], self.etag)
+        self.assertEqual(self.fetch_contents(), self.server.body)
+        self.assertEqual(self.server.requests, [(None, 'bytes=1000-', self.etag)])
+        self.assertFalse(os.path.exists(self.paths['part']))
+
+    def test_changed_archive_replaces_partial_file(self):
+        self.leave_partial(b'ancien contenu', '"ancien"')
+        self.assertEqual(self.fetch_contents(), self.server.body)
+        self.assertEqual(self.server.requests, [(None, 'bytes=14-', '"ancien"')])
+
+    def test_refused_range_restarts_download(self):
+        self.leave_partial(self.server.body[:1000], self.etag)
+        self.server.refuse_range = True
+        self.assertEqual(self.fetch_contents(), self.server.body)
+        self.assertEqual(self.server.requests, [(None, 'bytes=1000-', self.etag), (None, None, None)])
+
+    def test_truncated_body_is_retried_from_last_block(self):
+        cut = self.server.cut = downloads.DOWNLOAD_BLOCK_SIZE + 100
+        self.assertEqual(self.fetch_contents(), self.server.body)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1][2], self.etag)
+        resumed_at = int(self.server.requests[1][1].split('=')[1].rstrip('-'))
+        self.assertTrue(0 < resumed_at <= cut)
+
+    def test_eviction_skips_locked_entry(self):
+        first, second, third = (f'{self.url}?v={version}' for version in range(3))
+        for url in (first, second, third):
+            self.fetch_contents(url)
+        locked_paths = downloads._paths(downloads.entry_key(first))
+        with open(locked_paths['lock'], 'w') as lock_file:
+            # Téléchargement en cours dans un autre worker
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.assertEqual(downloads.evict(keep=downloads.entry_key(third), max_size=0), 1)
+        self.assertEqual([entry['url'] for entry in downloads.entries()], [first, third])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_ENABLED=False)
+class LinkageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_deces(nom='DUPONT', prenoms='JEAN PIERRE', sexe='1', date_naissance=date(1930, 5, 1), lieu_naissance='75056')
+        cls.user = User.objects.create_user('utilisateur')
+
+    def identity(self, **fields):
+        values = {'id': 'a', 'nom': 'Dupont', 'prenoms': 'Jean', 'sexe': '1', 'date_naissance': '01/05/1930', 'lieu_naissance': '75056'}
+        values.update(fields)
+        return values
+
+    def test_scores_and_statuses(self):
+        results = list(linkage.match_identities([
+            self.identity(),
+            # Homonyme : même bloc, aucun prénom commun
+            self.identity(id='b', prenoms='Paul'),
+            self.identity(id='c', date_naissance='19300501', sexe='2', lieu_naissance=''),
+            self.identity(id='d', date_naissance=''),
+        ]))
+        self.assertEqual([(row['id'], row['statut'], row['score']) for row in results], [
+            ('a', 'trouve', 1.0), ('b', 'non_trouve', 0.6), ('c', 'trouve', 0.9), ('d', 'incomplet', None),
+        ])
+        self.assertEqual((results[0]['candidats'], results[0]['date_deces']), (1, '2020-03-01'))
+
+    def test_batches_keep_input_order(self):
+        records = [self.identity(id=str(position), nom=nom) for position, nom in enumerate(['DUPONT', 'MARTIN'] * 3)]
+        results = list(linkage.match_identities(records, batch_size=4))
+        self.assertEqual([row['id'] for row in results], [str(position) for position in range(6)])
+        self.assertEqual([row['statut'] for row in results], ['trouve', 'non_trouve'] * 3)
+
+    def test_csv_delimiter_is_detected(self):
+        rows = list(linkage.read_identities_csv(io.BytesIO('\ufeffID,Nom,Prenoms\n1,DUPONT,"JEAN; PIERRE"\n'.encode())))
+        self.assertEqual(rows, [{'id': '1', 'nom': 'DUPONT', 'prenoms': 'JEAN; PIERRE'}])
+
+    def post(self, payload):
+        self.client.force_login(self.user)
+        return self.client.post('/linkage/', payload, content_type='application/json')
+
+    def test_view_matches_identities(self):
+        response = self.post({'identities': [self.identity()]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['matched'], 1)
+
+    def test_view_rejects_identities_that_are_not_objects(self):
+        response = self.post(['a', 1])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('objet', response.json()['error'])
+
+    @override_settings(LINKAGE_MAX_IDENTITIES=2)
+    def test_view_rejects_too_many_identities(self):
+        self.assertEqual(self.post([self.identity()] * 3).status_code, 400)
+        self.client.force_login(self.user)
+        csv_file = io.BytesIO(b'nom;date_naissance\n' + b'DUPONT;19300501\n' * 3)
+        csv_file.name = 'identites.csv'
+        self.assertEqual(self.client.post('/linkage/', {'file': csv_file}).status_code, 400)
+
+
+@without_progress
+@override_settings(CACHES=LOCMEM_CACHES)
+class SinglePassExtractionTests(TestCase):
+    CSV = ';'.join(INSEE_HEADER) + '\n' + 'DUPONT*JEAN/;1;19300512;75056;PARIS;;20200301;75056;1\n' * 3 + 'MARTIN*ANNE/;2;19400101;13055;MARSEILLE;;20210101;13055;2'
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+        self.enterContext(override_settings(IMPORT_WORK_DIR=work_dir.name))
+        self.zip_path = os.path.join(work_dir.name, 'deces.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as archive:
+            archive.writestr('deces-2021.csv', self.CSV)
+
+    def test_member_is_copied_hashed_and_counted_in_one_pass(self):
+        path = os.path.join(self.work_dir, 'copie.csv')
+        # Blocs plus petits qu'une ligne : les fins de ligne sont comptées à cheval sur les blocs
+        with mock.patch('deces.tasks.READ_BUFFER_SIZE', 7), zipfile.ZipFile(self.zip_path) as archive:
+            md5_hash, records = tasks.extract_member(archive, 'deces-2021.csv', path)
+        self.assertEqual(md5_hash, hashlib.md5(self.CSV.encode()).hexdigest())
+        # Dernière ligne sans fin de ligne
+        self.assertEqual(records, 4)
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), self.CSV)
+
+    def test_already_imported_csv_is_skipped_after_hashing(self):
+        make_import(csv_filename='deces-2021.csv', md5_hash=hashlib.md5(self.CSV.encode()).hexdigest(), status='completed')
+        with mock.patch('deces.downloads.fetch', return_value=self.zip_path), \
+                mock.patch('deces.tasks.dispatch_chunks') as dispatch_chunks:
+            tasks.process_insee_file.apply(args=['http://example.com/deces.zip', 'deces.zip'])
+        dispatch_chunks.assert_not_called()
+        self.assertEqual(ImportHistory.objects.count(), 1)
+        self.assertEqual([name for name in os.listdir(self.work_dir) if name.endswith('.csv')], [])
+
+    def test_new_csv_is_counted_and_split_from_the_extracted_copy(self):
+        with mock.patch('deces.downloads.fetch', return_value=self.zip_path), \
+                mock.patch('deces.tasks.dispatch_chunks') as dispatch_chunks:
+            tasks.process_insee_file.apply(args=['http://example.com/deces.zip', 'deces.zip'])
+        import_history, import_chunks = dispatch_chunks.call_args.args
+        self.assertEqual((import_history.status, import_history.total_records), ('processing', 4))
+        self.assertEqual(import_history.md5_hash, hashlib.md5(self.CSV.encode()).hexdigest())
+        self.assertEqual(len(import_chunks), 1)
+        self.assertEqual(import_chunks[0].end_offset, len(self.CSV.encode()))
+
+
+@without_progress
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckpointResumeTests(TestCase):
+    LINES = [
+        'DUPONT*JEAN/;1;19300512;75056;PARIS;;20200301;75056;1\n',
+        'MARTIN*ANNE/;2;19400101;13055;MARSEILLE;;20210101;13055;2\n',
+        'DURAND*PAUL/;1;19450707;69123;LYON;;20220202;69123;3\n',
+    ]
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.enterContext(override_settings(IMPORT_WORK_DIR=work_dir.name))
+        self.import_history = make_import(md5_hash='a' * 32, status='failed')
+        self.header = (';'.join(INSEE_HEADER) + '\n').encode()
+        with open(tasks.get_csv_path(self.import_history.pk), 'wb') as f:
+            f.write(self.header + ''.join(self.LINES).encode())
+        self.end = len(self.header) + len(''.join(self.LINES).encode())
+
+    def chunk(self, **fields):
+        return ImportChunk.objects.create(import_history=self.import_history, start_offset=len(self.header), end_offset=self.end, **fields)
+
+    def test_claim_is_exclusive_until_the_chunk_goes_stale(self):
+        import_chunk = self.chunk()
+        self.assertTrue(tasks.claim_chunk(import_chunk.pk))
+        self.assertFalse(tasks.claim_chunk(import_chunk.pk))
+        stale = timezone.now() - timedelta(seconds=tasks.CHUNK_STALE_AFTER + 1)
+        ImportChunk.objects.filter(pk=import_chunk.pk).update(updated_at=stale)
+        self.assertTrue(tasks.claim_chunk(import_chunk.pk))
+        ImportChunk.objects.filter(pk=import_chunk.pk).update(status='completed')
+        self.assertFalse(tasks.claim_chunk(import_chunk.pk))
+
+    def test_chunk_restarts_after_its_last_committed_block(self):
+        # Premier bloc (une ligne) validé avant l'arrêt du worker
+        make_deces(nom='DUPONT', prenoms='JEAN', date_deces=date(2020, 3, 1), acte_deces='1')
+        import_chunk = self.chunk(
+            status='failed', committed_offset=len(self.header) + len(self.LINES[0]), records_read=1, records_processed=1,
+        )
+        with mock.patch('deces.tasks.CHUNK_SIZE', 1):
+            tasks.import_csv_chunk.apply(args=[import_chunk.pk])
+        import_chunk.refresh_from_db()
+        self.assertEqual((import_chunk.status, import_chunk.committed_offset), ('completed', self.end))
+        self.assertEqual((import_chunk.records_read, import_chunk.records_inserted), (3, 2))
+        self.assertEqual(sorted(Deces.objects.values_list('acte_deces', flat=True)), ['1', '2', '3'])
+
+    def test_resume_dispatches_only_unfinished_chunks(self):
+        self.chunk(status='completed', records_read=2, records_processed=2)
+        failed = self.chunk(status='failed')
+        self.assertTrue(tasks.is_resumable(self.import_history))
+        with mock.patch('deces.tasks.dispatch_chunks') as dispatch_chunks:
+            tasks.resume_import(self.import_history.pk)
+        self.assertEqual(dispatch_chunks.call_args.args[1], [failed])
+        self.import_history.refresh_from_db()
+        self.assertEqual((self.import_history.status, self.import_history.records_processed), ('processing', 2))
+
+
+def create_cog():
+    """Extrait du COG : Paris et Lyon, leurs départements et régions, et l'Italie."""
+    idf = Region.objects.create(reg='11', cheflieu='75056', tncc='1', ncc='ILE DE FRANCE', nccenr='Île-de-France', libelle='Île-de-France')
+    ara = Region.objects.create(reg='84', cheflieu='69123', tncc='1', ncc='AUVERGNE RHONE ALPES', nccenr='Auvergne-Rhône-Alpes', libelle='Auvergne-Rhône-Alpes')
+    paris = Departement.objects.create(dep='75', reg=idf, cheflieu='75056', tncc='0', ncc='PARIS', nccenr='Paris', libelle='Paris')
+    rhone = Departement.objects.create(dep='69', reg=ara, cheflieu='69123', tncc='2', ncc='RHONE', nccenr='Rhône', libelle='Rhône')
+    for com, dep, reg, nom in (('75056', paris, idf, 'Paris'), ('69123', rhone, ara, 'Lyon')):
+        Commune.objects.create(
+            typecom='COM', com=com, reg=reg, dep=dep, ctcd='', arr='', tncc='0',
+            ncc=nom.upper(), nccenr=nom, libelle=nom, can='',
+        )
+    Pays.objects.create(cog='99127', actual='1', libcog='ITALIE', libenr='RÉPUBLIQUE ITALIENNE')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GeographyRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_cog()
+        self.registry = geography.GeographyRegistry()
+        # Le référentiel global est rechargé depuis la base après le test
+        self.addCleanup(geography.invalidate_geography)
+
+    def test_lookups_are_served_from_memory_after_the_first_load(self):
+        with self.assertNumQueries(4):
+            commune = self.registry.get_commune('69123')
+        self.assertEqual((commune.libelle, commune.dep.libelle, commune.reg.reg), ('Lyon', 'Rhône', '84'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get_lieu('99127').libcog, 'ITALIE')
+            self.assertEqual(self.registry.get_departement('75').reg.libelle, 'Île-de-France')
+            self.assertIsNone(self.registry.get_commune('13055'))
+
+    def test_new_version_reloads_after_the_check_interval(self):
+        self.registry.get_commune('75056')
+        Commune.objects.filter(com='75056').update(libelle='Paris (ville)')
+        geography.invalidate_geography()
+        # La nouvelle version n'est lue qu'à la vérification suivante
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get_commune('75056').libelle, 'Paris')
+        self.registry.checked_at -= geography.VERSION_CHECK_INTERVAL
+        with self.assertNumQueries(4):
+            self.assertEqual(self.registry.get_commune('75056').libelle, 'Paris (ville)')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LieuLabelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_cog()
+        geography.invalidate_geography()
+        self.addCleanup(geography.invalidate_geography)
+
+    def test_save_denormalizes_communes_and_foreign_birthplaces(self):
+        deces = make_deces(lieu_naissance='99127', lieu_naissance_nom='ROME', lieu_deces='69123')
+        deces.refresh_from_db()
+        self.assertEqual(
+            (deces.lieu_naissance_libelle, deces.lieu_naissance_dep, deces.lieu_naissance_reg),
+            ('ROME, ITALIE', None, None),
+        )
+        self.assertEqual((deces.lieu_deces_libelle, deces.lieu_deces_dep, deces.lieu_deces_reg), ('Lyon, Rhône', '69', '84'))
+
+    def test_departement_and_region_filters_use_denormalized_codes(self):
+        make_deces(lieu_deces='75056', acte_deces='1')
+        make_deces(lieu_deces='69123', acte_deces='2')
+        results, _ = search_queryset({'nom': 'DUPONT', 'lieu_deces': '69', 'lieu_deces_type': 'departement'})
+        self.assertEqual(list(results.values_list('acte_deces', flat=True)), ['2'])
+        results, _ = search_queryset({'nom': 'DUPONT', 'lieu_deces': '11', 'lieu_deces_type': 'region'})
+        self.assertEqual(list(results.values_list('acte_deces', flat=True)), ['1'])
+
+    def test_backfill_fills_rows_saved_before_the_cog_import(self):
+        make_deces(lieu_naissance='99127', lieu_naissance_nom='ROME', acte_deces='1')
+        make_deces(lieu_naissance='99127', lieu_naissance_nom='', acte_deces='2')
+        Deces.objects.update(
+            lieu_naissance_libelle=None, lieu_naissance_dep=None, lieu_naissance_reg=None,
+            lieu_deces_libelle=None, lieu_deces_dep=None, lieu_deces_reg=None,
+        )
+        call_command('backfill_lieux', '--missing', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(Deces.objects.values_list('acte_deces', 'lieu_naissance_libelle', 'lieu_deces_libelle', 'lieu_deces_reg')),
+            [('1', 'ROME, ITALIE', 'Paris, Paris', '11'), ('2', 'ITALIE', 'Paris, Paris', '11')],
+        )
+
+
+class PartitionMaintenanceTests(TestCase):
+    # information_schema.PARTITIONS tel que le renvoie MariaDB après la migration 0002
+    MARIADB_PARTITIONS = [
+        {'name': 'p2023', 'less_than': '2024', 'rows': 10, 'data_length': 0, 'index_length': 0},
+        {'name': 'p2024', 'less_than': '2025', 'rows': 10, 'data_length': 0, 'index_length': 0},
+        {'name': 'p_future', 'less_than': 'MAXVALUE', 'rows': 3, 'data_length': 0, 'index_length': 0},
+    ]
+
+    def test_sqlite_table_is_left_untouched(self):
+        self.assertEqual(partitions.ensure_partitions(2030), ([], None))
+        out = io.StringIO()
+        call_command('maintain_partitions', stdout=out)
+        self.assertIn("n'est pas partitionnée", out.getvalue())
+
+    def test_mariadb_future_partition_is_split_by_year(self):
+        expected = (
+            'ALTER TABLE deces_deces REORGANIZE PARTITION p_future INTO ('
+            'PARTITION p2025 VALUES LESS THAN (2026), PARTITION p2026 VALUES LESS THAN (2027), '
+            'PARTITION p_future VALUES LESS THAN MAXVALUE)'
+        )
+        with mock.patch('deces.partitions.list_partitions', return_value=self.MARIADB_PARTITIONS), \
+                mock.patch('deces.partitions.connection') as database:
+            self.assertEqual(partitions.ensure_partitions(2026, dry_run=True)[1], expected)
+            database.cursor.assert_not_called()
+            self.assertEqual(partitions.ensure_partitions(2026)[1], expected)
+            database.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(expected)
+            # Partitions déjà présentes jusqu'à l'année demandée : rien à faire
+            self.assertIsNone(partitions.ensure_partitions(2024)[1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AutocompleteIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_cog()
+        geography.invalidate_geography()
+        self.addCleanup(geography.invalidate_geography)
+
+    def texts(self, query, **page):
+        results, has_more = autocomplete.get_autocomplete_index().search(query, **page)
+        return [result['text'] for result in results], has_more
+
+    def test_prefix_matches_come_before_substring_matches(self):
+        # « Rhône » commence par RH, « Auvergne-Rhône-Alpes » le contient seulement
+        self.assertEqual(self.texts('rh'), (['Rhône, Auvergne-Rhône-Alpes, France', 'Auvergne-Rhône-Alpes, France'], False))
+        # Même préfixe : communes, puis départements, sans accents ni casse
+        self.assertEqual(self.texts('PÂR')[0], ['Paris, Paris, Île-de-France, France', 'Paris, Île-de-France, France'])
+        self.assertEqual(self.texts('ital')[0], ['ITALIE'])
+
+    def test_pages_follow_the_ranking(self):
+        self.assertEqual(self.texts('rh', offset=0, limit=1), (['Rhône, Auvergne-Rhône-Alpes, France'], True))
+        self.assertEqual(self.texts('rh', offset=1, limit=1), (['Auvergne-Rhône-Alpes, France'], False))
+
+    def test_index_is_rebuilt_when_the_cog_changes(self):
+        index = autocomplete.get_autocomplete_index()
+        self.assertIs(autocomplete.get_autocomplete_index(), index)
+        Pays.objects.create(cog='99109', actual='1', libcog='ALLEMAGNE', libenr='RÉPUBLIQUE FÉDÉRALE D\'ALLEMAGNE')
+        geography.invalidate_geography()
+        self.assertIsNot(autocomplete.get_autocomplete_index(), index)
+        self.assertEqual(self.texts('allem')[0], ['ALLEMAGNE'])
+
+
+class BenchmarkDataTests(SimpleTestCase):
+    def test_same_seed_gives_the_same_file(self):
+        reference = CogReference(seed=1, regions=2, departements_per_region=2, communes_per_departement=10)
+        self.assertEqual(
+            [dep['ncc'] for dep in reference.departements],
+            [dep['ncc'] for dep in CogReference(seed=1, regions=2, departements_per_region=2, communes_per_departement=10).departements],
+        )
+        rows = list(generate_rows(300, reference, seed=5))
+        self.assertEqual(rows, list(generate_rows(300, reference, seed=5)))
+        self.assertNotEqual(rows, list(generate_rows(300, reference, seed=6)))
+
+    def test_rows_reference_the_cog_with_unique_acts(self):
+        reference = CogReference(regions=2, departements_per_region=2, communes_per_departement=10)
+        communes = {commune['com'] for commune in reference.communes} | {pays[0] for pays in reference.pays}
+        rows = list(generate_rows(2000, reference, error_rate=0))
+        self.assertTrue(all(row[3] in communes and row[7] in communes for row in rows))
+        actes = [(row[7], row[6], row[8]) for row in rows]
+        self.assertEqual(len(actes), len(set(actes)))
+
+    def test_error_rate_injects_rows_rejected_by_the_import(self):
+        reference = CogReference(regions=1, departements_per_region=1, communes_per_departement=10)
+        for row in generate_rows(50, reference, error_rate=1):
+            with self.assertRaises(tasks.ParseError):
+                tasks.parse_row(pd.Series(row, index=INSEE_HEADER))
+        for row in generate_rows(50, reference, error_rate=0):
+            tasks.parse_row(pd.Series(row, index=INSEE_HEADER))
+
+    def test_compare_flags_changes_beyond_the_threshold(self):
+        baseline = {'import': {'rows_per_second': 1000, 'seconds': 10.0}, 'search': {'p50_ms': 20.0, 'qps': 50}, 'rows': 100}
+        results = {'import': {'rows_per_second': 800, 'seconds': 8.0}, 'search': {'p50_ms': 21.0, 'qps': 60}, 'rows': 200}
+        self.assertEqual(list(report.compare(baseline, results)), [
+            ('import.rows_per_second', 1000, 800, -0.2, False),
+            ('import.seconds', 10.0, 8.0, -0.2, True),
+            ('search.p50_ms', 20.0, 21.0, 0.05, None),
+            ('search.qps', 50, 60, 0.2, True),
+        ])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncViewTests(TestCase):
+    # Requête sans fin, interrompue uniquement par la limite de durée
+    ENDLESS_QUERY = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n'
+
+    def setUp(self):
+        cache.clear()
+
+    def endless_query(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.ENDLESS_QUERY)
+            return cursor.fetchone()
+
+    def test_run_query_interrupts_a_select_past_its_timeout(self):
+        with self.assertRaises(query_limits.QueryTimeout):
+            async_to_sync(query_limits.run_query)(self.endless_query, timeout=0.05)
+        # La connexion reste utilisable, sans gestionnaire de progression résiduel
+        self.assertEqual(async_to_sync(query_limits.run_query)(Deces.objects.count), 0)
+
+    def test_mariadb_and_mysql_selects_carry_their_limit(self):
+        executed = []
+        execute = lambda sql, params, many, context: executed.append(sql)
+        for is_mariadb in (True, False):
+            wrapper = SimpleNamespace(vendor='mysql', mysql_is_mariadb=is_mariadb)
+            query_limits.StatementTimeout(2.5)(execute, 'SELECT 1', None, False, {'connection': wrapper})
+            query_limits.StatementTimeout(2.5)(execute, 'UPDATE t SET a = 1', None, False, {'connection': wrapper})
+        self.assertEqual(executed, [
+            'SET STATEMENT max_statement_time=2.5 FOR SELECT 1', 'UPDATE t SET a = 1',
+            'SELECT /*+ MAX_EXECUTION_TIME(2500) */ 1', 'UPDATE t SET a = 1',
+        ])
+
+    async def test_search_timeout_answers_503(self):
+        timeout = query_limits.QueryTimeout('Requête interrompue après 10s')
+        with mock.patch('deces.views.keyset_paginate', side_effect=timeout):
+            response = await self.async_client.get('/search/', {'nom': 'DUPONT'})
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.context['search_timeout'])
+
+    async def test_autocomplete_is_served_asynchronously(self):
+        await sync_to_async(create_cog)()
+        await sync_to_async(geography.invalidate_geography)()
+        self.addCleanup(geography.invalidate_geography)
+        response = await self.async_client.get('/autocomplete/lieu/', {'q': 'lyo'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': '69123', 'text': 'Lyon, Rhône, Auvergne-Rhône-Alpes, France', 'type': 'commune'}],
+            'pagination': {'more': False},
+        })
+        response = await self.async_client.get('/autocomplete/lieu/', {'q': 'l'})
+        self.assertEqual(response.json()['results'], [])
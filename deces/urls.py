@@ -8,8 +8,22 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('import/', views.import_data, name='import_data'),
     path('import/<int:import_id>/status/', views.import_status, name='import_status'),
+    path('import/<int:import_id>/resume/', views.import_resume, name='import_resume'),
     path('import/stats/', views.import_stats, name='import_stats'),
+    path('import/events/', views.import_events, name='import_events'),
     path('search/', views.search, name='search'),
+    path('search/cache/stats/', views.search_cache_stats, name='search_cache_stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('search/export/', views.export_search, name='export_search'),
+    path('search/export/async/', views.export_search_async, name='export_search_async'),
+    path('search/export/<int:export_id>/status/', views.export_status, name='export_status'),
+    path('search/export/<int:export_id>/download/', views.export_download, name='export_download'),
+    path('linkage/', views.linkage, name='linkage'),
+    path('linkage/async/', views.linkage_async, name='linkage_async'),
+    path('linkage/<int:job_id>/status/', views.linkage_status, name='linkage_status'),
+    path('linkage/<int:job_id>/download/', views.linkage_download, name='linkage_download'),
+    path('stats/', views.stats, name='stats'),
+    path('stats/api/<str:dimension>/', views.stats_api, name='stats_api'),
     
     # URLs pour la gestion des erreurs d'import
     path('import/errors/', views.ImportErrorListView.as_view(), name='import-error-list'),
@@ -1,5 +1,11 @@
+import os
+import json
+import hmac
+import time
+import redis
+from itertools import islice
 from django.db.models import Sum
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -11,16 +17,48 @@ from django.db.models import Q, Value, CharField, Case, When, OuterRef, Subquery
 from django.db.models.functions import Concat
 from .models import Deces, Commune, Region, Departement, Pays
 from django.views.decorators.cache import cache_page
-from django.core.paginator import Paginator
-from .models import Deces, ImportHistory, DecesImportError
+from .models import Deces, ImportHistory, DecesImportError, SearchExport, LinkageJob
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
-from .tasks import process_insee_file
+from django.conf import settings
+from .tasks import process_insee_file, resume_import, is_resumable, export_search_results, run_linkage
+from .loaders import bulk_load_supported
+from .geography import geography
+from .autocomplete import get_autocomplete_index
+from . import search_cache, metrics, progress
+from .stats import aggregate as aggregate_stats, age_band_label, DIMENSIONS as STATS_DIMENSIONS
+from .pagination import keyset_paginate
+from .partitions import explain_partitions
+from .ngrams import contains_filter
+from .filters import ORDER_FIELDS, search_queryset, has_search_criteria as search_has_criteria
+from .linkage import match_identities, read_identities_csv
+from .export import (
+    iter_batches, export_stream, extension, parquet_supported, file_chunks, async_chunks,
+    CONTENT_TYPES as EXPORT_CONTENT_TYPES
+)
+from django.core.exceptions import EmptyResultSet
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.http import content_disposition_header
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from .query_limits import QueryTimeout, run_query
 from .forms import ImportErrorForm
 
 def rate_limit(key_prefix, limit=60):
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def async_wrapped_view(request, *args, **kwargs):
+                client_ip = request.META.get('HTTP_X_FORWARDED_FOR', request.META.get('REMOTE_ADDR'))
+                cache_key = f"{key_prefix}:{client_ip}"
+                requests = await cache.aget(cache_key, 0)
+
+                if requests >= limit:
+                    return JsonResponse({'error': 'Rate limit exceeded'}, status=429)
+
+                await cache.aset(cache_key, requests + 1, 60)  # Reset after 60 seconds
+                return await view_func(request, *args, **kwargs)
+            return async_wrapped_view
+
         def wrapped_view(request, *args, **kwargs):
             client_ip = request.META.get('HTTP_X_FORWARDED_FOR', request.META.get('REMOTE_ADDR'))
             cache_key = f"{key_prefix}:{client_ip}"
@@ -69,11 +107,14 @@ def import_data(request):
             return JsonResponse({'error': 'URL invalide'}, status=400)
         if not url.startswith('https://www.insee.fr/fr/statistiques/fichier/'):
             return JsonResponse({'error': 'URL invalide'}, status=400)
+        engine = request.POST.get('engine', 'orm')
+        if engine not in dict(ImportHistory.ENGINE_CHOICES):
+            return JsonResponse({'error': 'Moteur d\'import invalide'}, status=400)
 
         try:
-            # Lancer la tâche asynchrone avec l'URL et le nom du fichier
+            # Lancer la tâche asynchrone avec l'URL, le nom du fichier et le moteur de chargement
             filename = url.split('/')[-1]
-            process_insee_file.delay(url, filename)
+            process_insee_file.delay(url, filename, engine)
 
             return JsonResponse({
                 'success': True,
@@ -91,27 +132,112 @@ def import_data(request):
     
     return render(request, 'deces/import.html', {
         'imports': imports,
+        'engines': ImportHistory.ENGINE_CHOICES,
+        'bulk_load_supported': bulk_load_supported(),
         'total_records_processed': stats['processed'] or 0,
         'total_records': stats['total'] or 0
     })
 
+@require_http_methods(['POST'])
+@login_required
+def import_resume(request, import_id):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Vous devez être membre du staff pour reprendre un import.'}, status=403)
+    import_history = get_object_or_404(ImportHistory, id=import_id)
+    if not is_resumable(import_history):
+        return JsonResponse({'error': 'Cet import ne peut pas être repris'}, status=400)
+    resume_import.delay(import_history.pk)
+    return JsonResponse({
+        'success': True,
+        'message': 'Reprise de l\'import lancée à partir du dernier point de contrôle.'
+    })
+
+@login_required
+def search_cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Vous devez être membre du staff pour consulter ces statistiques.'}, status=403)
+    return JsonResponse(search_cache.stats())
+
+def metrics_authorized(request):
+    """Compte staff, ou collecteur présentant le jeton METRICS_TOKEN."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    authorization = request.headers.get('Authorization', '')
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {settings.METRICS_TOKEN}')
+
+@require_http_methods(['GET'])
+def metrics_view(request):
+    """Quantiles des mesures par vue et par étape d'import, au format Prometheus (ou JSON avec ?format=json)."""
+    if not metrics_authorized(request):
+        return JsonResponse({'error': 'Vous devez être membre du staff pour consulter ces mesures.'}, status=403)
+    try:
+        if request.GET.get('format') == 'json':
+            return JsonResponse(metrics.summary())
+        return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except redis.RedisError as e:
+        return JsonResponse({'error': f'Mesures indisponibles : {str(e)}'}, status=503)
+
+def import_status_data(import_id):
+    """Réponse JSON de import_status (code synchrone, exécuté hors de la boucle d'événements)."""
+    import_history = ImportHistory.objects.get(id=import_id)
+    data = {
+        'status': import_history.status,
+        'status_display': import_history.get_status_display(),
+        'records_processed': import_history.records_processed,
+        'total_records': import_history.total_records,
+        'records_inserted': import_history.records_inserted,
+        'records_updated': import_history.records_updated,
+        'records_unchanged': import_history.records_unchanged,
+        'error_message': import_history.error_message,
+        'csv_filename': import_history.csv_filename,
+        # Les erreurs ne sont affichées qu'une fois l'import terminé
+        'pending_errors': import_history.pending_errors if import_history.status == 'completed' else None
+    }
+    if import_history.status == 'processing':
+        # Compteurs en base mis à jour en fin de tranche : la progression en direct est dans Redis
+        live = progress.snapshot(import_history.pk)
+        if live and live['status'] == 'processing':
+            data.update({field: live[field] for field in progress.COUNTERS if field in live})
+    return data
+
 @rate_limit('import_status', limit=300)  # 8 imports × 30 updates/minute = 240 + marge
 @require_http_methods(['GET'])
 @login_required
-def import_status(request, import_id):
+async def import_status(request, import_id):
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'error': 'Vous devez être membre du staff pour suivre un import.'}, status=403)
     try:
-        import_history = ImportHistory.objects.get(id=import_id)
-        return JsonResponse({
-            'status': import_history.status,
-            'status_display': import_history.get_status_display(),
-            'records_processed': import_history.records_processed,
-            'total_records': import_history.total_records,
-            'error_message': import_history.error_message,
-            'csv_filename': import_history.csv_filename,
-            'pending_errors': import_history.pending_errors
-        })
+        data = await run_query(import_status_data, import_id, timeout=settings.STATUS_STATEMENT_TIMEOUT)
     except ImportHistory.DoesNotExist:
         return JsonResponse({'error': 'Import non trouvé'}, status=404)
+    except QueryTimeout as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return JsonResponse(data)
+
+@require_http_methods(['GET'])
+async def import_events(request):
+    """Progression des imports en Server-Sent Events (?ids=1,2 pour ne suivre que certains imports).
+
+    Le flux reste ouvert : il n'est servi que par insee_deces.asgi. Sous WSGI,
+    la réponse 501 fait revenir le navigateur à l'interrogation de import_status.
+    """
+    user = await request.auser()
+    # Comme la page d'import et import_status : réservé au staff
+    if not user.is_authenticated or not user.is_staff:
+        return JsonResponse({'error': 'Vous devez être membre du staff pour suivre un import.'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Flux disponible uniquement sous ASGI'}, status=501)
+    try:
+        import_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value]
+    except ValueError:
+        return JsonResponse({'error': 'Identifiants d\'import invalides'}, status=400)
+
+    response = StreamingHttpResponse(progress.stream(import_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @rate_limit('import_stats', limit=300)
 @require_http_methods(['GET'])
@@ -127,83 +253,77 @@ def import_stats(request):
         'total_records': stats['total'] or 0
     })
 
-def autocomplete_lieu(request):
+def stats_filters(request):
+    """Filtres des statistiques passés en paramètres GET."""
+    return {
+        'annee_debut': request.GET.get('annee_debut') or None,
+        'annee_fin': request.GET.get('annee_fin') or None,
+        'dep': request.GET.get('dep') or None,
+        'sexe': request.GET.get('sexe') or None,
+        'tranche_age': request.GET.get('tranche_age') or None,
+    }
+
+@require_http_methods(['GET'])
+def stats_api(request, dimension):
+    if dimension not in STATS_DIMENSIONS:
+        return JsonResponse({'error': f'Dimension inconnue, valeurs possibles : {", ".join(STATS_DIMENSIONS)}'}, status=404)
+    filters = stats_filters(request)
+    try:
+        results = aggregate_stats(dimension, **filters)
+    except ValueError:
+        return JsonResponse({'error': 'Paramètre invalide'}, status=400)
+    return JsonResponse({
+        'dimension': dimension,
+        'filters': {key: value for key, value in filters.items() if value},
+        'results': results,
+        'total': sum(row['total'] for row in results)
+    })
+
+def stats(request):
+    filters = stats_filters(request)
+    try:
+        by_year = aggregate_stats('annee', **filters)
+        by_sexe = aggregate_stats('sexe', **filters)
+        by_age = aggregate_stats('tranche_age', **filters)
+        by_dep = aggregate_stats('dep', **filters)
+    except ValueError:
+        messages.error(request, 'Paramètre de filtre invalide.')
+        return redirect('deces:stats')
+
+    sexes = {'1': 'Masculin', '2': 'Féminin'}
+    for row in by_sexe:
+        row['libelle'] = sexes.get(row['valeur'], row['valeur'])
+    for row in by_age:
+        row['libelle'] = age_band_label(row['valeur'])
+    for row in by_dep:
+        dept = geography.get_departement(row['valeur']) if row['valeur'] else None
+        row['libelle'] = f"{row['valeur']} - {dept.libelle}" if dept else (row['valeur'] or 'Étranger')
+
+    return render(request, 'deces/stats.html', {
+        'filters': filters,
+        'by_year': by_year,
+        'by_sexe': by_sexe,
+        'by_age': by_age,
+        'by_dep': by_dep,
+        'total': sum(row['total'] for row in by_year),
+        'dimensions': STATS_DIMENSIONS,
+    })
+
+async def autocomplete_lieu(request):
     query = request.GET.get('q', '')
-    page = int(request.GET.get('page', 1))
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     page_size = 30
     if len(query) < 2:
         return JsonResponse({'results': [], 'pagination': {'more': False}})
 
-    # Calculer l'offset pour la pagination
-    offset = (page - 1) * page_size
-
-    # Rechercher dans les communes
-    communes = Commune.objects.filter(
-        Q(libelle__icontains=query) | 
-        Q(ncc__icontains=query)
-    ).select_related('dep', 'reg')[offset:offset + page_size]
-
-    # Vérifier s'il y a plus de résultats
-    has_more = Commune.objects.filter(
-        Q(libelle__icontains=query) | 
-        Q(ncc__icontains=query)
-    ).count() > offset + page_size
-
-    # Rechercher dans les départements
-    departements = Departement.objects.filter(
-        Q(libelle__icontains=query) | 
-        Q(ncc__icontains=query)
-    ).select_related('reg')
-
-    # Rechercher dans les régions
-    regions = Region.objects.filter(
-        Q(libelle__icontains=query) | 
-        Q(ncc__icontains=query)
-    )
-
-    # Rechercher dans les pays
-    pays = Pays.objects.filter(
-        Q(libcog__icontains=query) | 
-        Q(libenr__icontains=query)
-    )
-
-    results = []
-    
-    # Ajouter les communes (uniquement pour la France)
-    communes_results = [{
-        'id': commune.com,
-        'text': f"{commune.libelle}, {commune.dep.libelle}, {commune.reg.libelle}, France",
-        'type': 'commune'
-    } for commune in communes]
-    communes_results.sort(key=lambda x: x['text'])
-    results.extend(communes_results)
-
-    # Ajouter les départements
-    dept_results = [{
-        'id': dept.dep,
-        'text': f"{dept.libelle}, {dept.reg.libelle}, France",
-        'type': 'departement'
-    } for dept in departements]
-    dept_results.sort(key=lambda x: x['text'])
-    results.extend(dept_results)
-
-    # Ajouter les régions
-    region_results = [{
-        'id': region.reg,
-        'text': f"{region.libelle}, France",
-        'type': 'region'
-    } for region in regions]
-    region_results.sort(key=lambda x: x['text'])
-    results.extend(region_results)
-
-    # Ajouter les pays (sauf France qui est déjà incluse dans les autres niveaux)
-    pays_results = [{
-        'id': pays_item.cog,
-        'text': pays_item.libcog,
-        'type': 'pays'
-    } for pays_item in pays if pays_item.cog != '100']
-    pays_results.sort(key=lambda x: x['text'])
-    results.extend(pays_results)
+    # Index en mémoire des communes, départements, régions et pays (hors France) :
+    # préfixes d'abord, puis sous-chaînes, chaque groupe trié par type puis libellé.
+    # Son chargement et la vérification de sa version (base, cache) se font hors de la boucle d'événements
+    index = await sync_to_async(get_autocomplete_index)()
+    results, has_more = index.search(query, offset=(page - 1) * page_size, limit=page_size)
 
     return JsonResponse({
         'results': results,
@@ -270,12 +390,12 @@ class SearchView(ListView):
         # Filtrer par nom
         nom = self.request.GET.get('nom')
         if nom:
-            queryset = queryset.filter(nom__icontains=nom)
+            queryset = queryset.filter(contains_filter('nom', nom.upper()))
         
         # Filtrer par prénom
         prenom = self.request.GET.get('prenom')
         if prenom:
-            queryset = queryset.filter(prenoms__icontains=prenom)
+            queryset = queryset.filter(contains_filter('prenoms', prenom.upper()))
         
         # Filtrer par date de naissance
         date_naissance = self.request.GET.get('date_naissance')
@@ -336,12 +456,28 @@ class SearchView(ListView):
         context['order_dir'] = self.request.GET.get('order_dir', 'asc')
         return context
 
-def search(request):
+async def search(request):
+    """Recherche servie en ASGI : la requête SQL est limitée à SEARCH_STATEMENT_TIMEOUT secondes
+    et interrompue si le client se déconnecte, sans bloquer les autres requêtes."""
+    context = await run_query(search_context, request, timeout=settings.SEARCH_STATEMENT_TIMEOUT)
+    response = await sync_to_async(render)(
+        request, 'deces/search.html', context, status=503 if context['search_timeout'] else 200
+    )
+    # Désactiver le cache pour cette vue
+    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    response['Pragma'] = 'no-cache'
+    response['Expires'] = '0'
+    return response
+
+def search_context(request):
+    """Contexte de la page de recherche (code synchrone, exécuté hors de la boucle d'événements)."""
     # Récupérer les paramètres de recherche
     nom = request.GET.get('nom', '')
     nom_flexible = request.GET.get('nom_flexible')
     prenoms = request.GET.get('prenoms', '')
     prenoms_flexible = request.GET.get('prenoms_flexible')
+    # Correspondance des noms et prénoms : exacte, sans accents ou phonétique
+    nom_mode = request.GET.get('nom_mode', '')
     sexe = request.GET.get('sexe', '')
     date_naissance_debut = request.GET.get('date_naissance_debut', '')
     date_naissance_fin = request.GET.get('date_naissance_fin', '')
@@ -354,7 +490,7 @@ def search(request):
     lieu_deces_id = request.GET.get('lieu_deces')
     lieu_deces_type = request.GET.get('lieu_deces_type')
 
-    page = request.GET.get('page', 1)
+    cursor = request.GET.get('cursor')
     query = request.GET.get('query', '')
     order_by = request.GET.get('order_by', 'nom')
     order_dir = request.GET.get('order_dir', 'asc')
@@ -365,153 +501,62 @@ def search(request):
     
     results = None
     page_obj = None
+    partition_debug = None
+    search_timeout = False
 
-    if has_search_criteria:
-        results = Deces.objects.all()
-
-        # Appliquer les filtres si présents
-        if nom:
-            if nom_flexible == 'on':
-                results = results.filter(nom__contains=nom.upper())
-            else:
-                results = results.filter(nom=nom.upper())
-        if prenoms:
-            if prenoms_flexible == 'on':
-                results = results.filter(prenoms__contains=prenoms.upper())
-            else:
-                results = results.filter(prenoms=prenoms.upper())
-        if sexe:
-            results = results.filter(sexe=sexe)
-        
-        # Filtres de date de naissance
-        if date_naissance_debut:
-            results = results.filter(date_naissance__gte=date_naissance_debut)
-        if date_naissance_fin:
-            results = results.filter(date_naissance__lte=date_naissance_fin)
-        
-        # Filtres de date de décès
-        if date_deces_debut:
-            results = results.filter(date_deces__gte=date_deces_debut)
-        if date_deces_fin:
-            results = results.filter(date_deces__lte=date_deces_fin)
-
-        # Filtres de lieu de naissance
-        if lieu_naissance_id and lieu_naissance_type:
-            if lieu_naissance_type == 'commune':
-                results = results.filter(lieu_naissance=lieu_naissance_id)
-            elif lieu_naissance_type == 'departement':
-                # Récupérer toutes les communes du département
-                commune_list = Commune.objects.filter(dep=lieu_naissance_id).values_list('com', flat=True)
-                results = results.filter(lieu_naissance__in=commune_list)
-            elif lieu_naissance_type == 'region':
-                # Récupérer toutes les communes de la région
-                commune_list = Commune.objects.filter(reg=lieu_naissance_id).values_list('com', flat=True)
-                results = results.filter(lieu_naissance__in=commune_list)
-            elif lieu_naissance_type == 'pays':
-                results = results.filter(lieu_naissance=lieu_naissance_id)
-
-        # Filtres de lieu de décès
-        if lieu_deces_id and lieu_deces_type:
-            if lieu_deces_type == 'commune':
-                results = results.filter(lieu_deces=lieu_deces_id)
-            elif lieu_deces_type == 'departement':
-                # Récupérer toutes les communes du département
-                commune_list = Commune.objects.filter(dep=lieu_deces_id).values_list('com', flat=True)
-                results = results.filter(lieu_deces__in=commune_list)
-            elif lieu_deces_type == 'region':
-                # Récupérer toutes les communes de la région
-                commune_list = Commune.objects.filter(reg=lieu_deces_id).values_list('com', flat=True)
-                results = results.filter(lieu_deces__in=commune_list)
-            elif lieu_deces_type == 'pays':
-                results = results.filter(lieu_deces=lieu_deces_id)
-
-        # Tri des résultats
-        valid_fields = {
-            'nom': 'nom',
-            'prenoms': 'prenoms',
-            'date_naissance': 'date_naissance',
-            'date_deces': 'date_deces',
-            'lieu_deces': 'lieu_deces_nom_resolue',
-            'lieu_naissance': 'lieu_naissance_nom_resolue'
-        }
+    # Tri des résultats
+    valid_fields = ORDER_FIELDS
 
-        # Ajouter les annotations pour le tri sur les noms de lieux
-        results = results.annotate(
-            lieu_naissance_nom_resolue=Case(
-                When(lieu_naissance__startswith='99',
-                     then=Concat(
-                         F('lieu_naissance_nom'),
-                         Value(', '),
-                         Subquery(
-                             Pays.objects.filter(cog=OuterRef('lieu_naissance'))
-                             .values('libcog')[:1]
-                         ),
-                         output_field=CharField()
-                     )),
-                default=Concat(
-                    Subquery(
-                        Commune.objects.filter(com=OuterRef('lieu_naissance'))
-                        .values('libelle')[:1]
-                    ),
-                    Value(', '),
-                    Subquery(
-                        Commune.objects.filter(com=OuterRef('lieu_naissance'))
-                        .values('dep__libelle')[:1]
-                    ),
-                    output_field=CharField()
-                )
-            ),
-            lieu_deces_nom_resolue=Case(
-                When(lieu_deces__startswith='99',
-                     then=Subquery(
-                         Pays.objects.filter(cog=OuterRef('lieu_deces'))
-                         .values('libcog')[:1]
-                     )),
-                default=Concat(
-                    Subquery(
-                        Commune.objects.filter(com=OuterRef('lieu_deces'))
-                        .values('libelle')[:1]
-                    ),
-                    Value(', '),
-                    Subquery(
-                        Commune.objects.filter(com=OuterRef('lieu_deces'))
-                        .values('dep__libelle')[:1]
-                    ),
-                    output_field=CharField()
-                )
-            )
-        )
+    if order_by not in valid_fields:
+        order_by = 'nom'
 
-        if order_by in valid_fields:
-            order_field = valid_fields[order_by]
-            if order_dir == 'desc':
-                order_field = f'-{order_field}'
-            results = results.order_by(order_field)
+    if has_search_criteria:
+        # Les pages de résultats sont mises en cache jusqu'au prochain changement des données
+        # (sauf panneau de débogage, qui a besoin de la requête)
+        debug = bool(request.GET.get('debug')) and request.user.is_staff
+        cache_key = None if debug else search_cache.result_key(request.GET)
+        cached_page = search_cache.get_page(cache_key) if cache_key else None
+        if cached_page is not None:
+            page_obj = search_cache.load_page(cached_page, Deces)
+        else:
+            results, pruning_reasons = search_queryset(request.GET)
 
-        paginator = Paginator(results, 20)
-        page_obj = paginator.get_page(page)
+            try:
+                # Pagination par clé (tri + clé primaire) : pas d'OFFSET ni de COUNT(*) complet
+                page_obj = keyset_paginate(results, valid_fields[order_by], order_dir == 'desc', cursor)
+            except QueryTimeout:
+                search_timeout = True
+
+            # Panneau de débogage (staff) : bornes déduites et plan d'exécution de la page
+            if debug and page_obj is not None:
+                try:
+                    explain = explain_partitions(page_obj.queryset)
+                except EmptyResultSet:
+                    explain = 'Requête vide, aucune partition parcourue'
+                partition_debug = {'reasons': pruning_reasons, 'explain': explain}
+            if cache_key and page_obj is not None:
+                search_cache.set_page(cache_key, search_cache.dump_page(page_obj))
 
     def get_lieu_text(lieu_id, lieu_type):
         if not lieu_id or not lieu_type:
             return None
-        try:
-            if lieu_type == 'commune':
-                commune = Commune.objects.get(com=lieu_id)
-                dept = commune.dep
-                region = dept.reg
-                return f"{commune.libelle}, {dept.libelle}, {region.libelle}, France"
-            elif lieu_type == 'departement':
-                dept = Departement.objects.get(dep=lieu_id)
-                region = dept.reg
-                return f"{dept.libelle}, {region.libelle}, France"
-            elif lieu_type == 'region':
-                region = Region.objects.get(reg=lieu_id)
+        if lieu_type == 'commune':
+            commune = geography.get_commune(lieu_id)
+            if commune and commune.dep and commune.dep.reg:
+                return f"{commune.libelle}, {commune.dep.libelle}, {commune.dep.reg.libelle}, France"
+        elif lieu_type == 'departement':
+            dept = geography.get_departement(lieu_id)
+            if dept and dept.reg:
+                return f"{dept.libelle}, {dept.reg.libelle}, France"
+        elif lieu_type == 'region':
+            region = geography.get_region(lieu_id)
+            if region:
                 return f"{region.libelle}, France"
-            elif lieu_type == 'pays':
-                pays = Pays.objects.get(cog=lieu_id)
+        elif lieu_type == 'pays':
+            pays = geography.get_pays(lieu_id)
+            if pays:
                 return pays.libcog
-        except (Commune.DoesNotExist, Departement.DoesNotExist, Region.DoesNotExist, Pays.DoesNotExist):
-            return None
+        return None
 
     # Récupérer les informations des lieux sélectionnés
     lieu_naissance_id = request.GET.get('lieu_naissance')
@@ -522,6 +567,11 @@ def search(request):
     lieu_deces_type = request.GET.get('lieu_deces_type')
     selected_lieu_deces_text = get_lieu_text(lieu_deces_id, lieu_deces_type)
 
+    # Paramètres de la recherche, repris dans les liens de pagination
+    pagination_query = request.GET.copy()
+    pagination_query.pop('cursor', None)
+    pagination_query.pop('page', None)
+
     context = {
         'nom': nom,
         'prenoms': prenoms,
@@ -531,12 +581,18 @@ def search(request):
         'date_deces_debut': date_deces_debut,
         'date_deces_fin': date_deces_fin,
         'page_obj': page_obj,
+        'search_timeout': search_timeout,
+        'pagination_query': pagination_query.urlencode(),
+        'partition_debug': partition_debug,
+        'parquet_supported': parquet_supported(),
+        'export_max_rows': settings.EXPORT_MAX_ROWS,
         'has_search_criteria': has_search_criteria,
         'query': query,
         'order_by': order_by,
         'order_dir': order_dir,
         'nom_flexible': nom_flexible,
         'prenoms_flexible': prenoms_flexible,
+        'nom_mode': nom_mode,
         'selected_lieu_naissance_text': selected_lieu_naissance_text,
         'selected_lieu_deces_text': selected_lieu_deces_text,
         'lieu_naissance': lieu_naissance_id,
@@ -544,13 +600,201 @@ def search(request):
         'lieu_deces': lieu_deces_id,
         'lieu_deces_type': lieu_deces_type,
     }
-    response = render(request, 'deces/search.html', context)
-    # Désactiver le cache pour cette vue
-    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-    response['Pragma'] = 'no-cache'
-    response['Expires'] = '0'
+    return context
+
+def stream_response(request, chunks, content_type):
+    """Réponse en flux qui garde une mémoire constante sous WSGI comme sous ASGI.
+
+    Sous ASGI, Django lit d'une traite un itérateur synchrone avant d'envoyer
+    la réponse : on lui passe un itérateur asynchrone qui produit les blocs un
+    à un.
+    """
+    if isinstance(request, ASGIRequest):
+        chunks = async_chunks(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+def file_download_response(request, path, filename, content_type):
+    response = stream_response(request, file_chunks(path), content_type)
+    response['Content-Length'] = os.path.getsize(path)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+def export_options(request):
+    """Format et compression demandés pour un export, ou None s'ils ne sont pas valides."""
+    format = request.GET.get('format', 'csv')
+    compress = request.GET.get('compression') == 'gzip'
+    if format not in dict(SearchExport.FORMAT_CHOICES):
+        return None
+    if format == 'parquet' and not parquet_supported():
+        return None
+    return format, compress
+
+@rate_limit('export', limit=settings.EXPORT_RATE_LIMIT)
+@require_http_methods(['GET'])
+def export_search(request):
+    """Exporte les résultats d'une recherche en flux (CSV, CSV gzip ou Parquet)."""
+    if not search_has_criteria(request.GET):
+        return JsonResponse({'error': 'Veuillez saisir au moins un critère de recherche.'}, status=400)
+    options = export_options(request)
+    if options is None:
+        return JsonResponse({'error': 'Format d\'export invalide'}, status=400)
+    format, compress = options
+
+    queryset, _ = search_queryset(request.GET)
+    limit = settings.EXPORT_MAX_ROWS
+    if queryset.order_by()[:limit + 1].count() > limit:
+        return JsonResponse({
+            'error': f'Plus de {limit} résultats : affinez la recherche ou lancez un export différé.'
+        }, status=400)
+
+    file_extension = extension(format, compress)
+    response = stream_response(
+        request, export_stream(iter_batches(queryset, limit), format, compress), EXPORT_CONTENT_TYPES[file_extension]
+    )
+    response['Content-Disposition'] = f'attachment; filename="deces.{file_extension}"'
+    response['Cache-Control'] = 'no-store'
     return response
 
+@require_http_methods(['POST'])
+@login_required
+def export_search_async(request):
+    """Lance l'export différé des résultats d'une recherche (paramètres dans la chaîne de requête)."""
+    if not search_has_criteria(request.GET):
+        return JsonResponse({'error': 'Veuillez saisir au moins un critère de recherche.'}, status=400)
+    options = export_options(request)
+    if options is None:
+        return JsonResponse({'error': 'Format d\'export invalide'}, status=400)
+    format, compress = options
+    query = request.GET.copy()
+    for name in ('format', 'compression', 'cursor', 'page'):
+        query.pop(name, None)
+    search_export = SearchExport.objects.create(user=request.user, query=query.urlencode(), format=format, compress=compress)
+    export_search_results.delay(search_export.pk)
+    return JsonResponse({
+        'success': True,
+        'id': search_export.pk,
+        'status_url': reverse('deces:export_status', args=[search_export.pk]),
+        'message': 'Export lancé.'
+    })
+
+def get_search_export(request, export_id):
+    search_export = get_object_or_404(SearchExport, pk=export_id)
+    if search_export.user_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return search_export
+
+@require_http_methods(['GET'])
+@login_required
+def export_status(request, export_id):
+    search_export = get_search_export(request, export_id)
+    return JsonResponse({
+        'status': search_export.status,
+        'status_display': search_export.get_status_display(),
+        'rows_written': search_export.rows_written,
+        'total_rows': search_export.total_rows,
+        'error_message': search_export.error_message,
+        'download_url': reverse('deces:export_download', args=[search_export.pk]) if search_export.status == 'completed' else None
+    })
+
+@require_http_methods(['GET'])
+@login_required
+def export_download(request, export_id):
+    search_export = get_search_export(request, export_id)
+    if search_export.status != 'completed' or not os.path.exists(search_export.file_path):
+        raise Http404
+    file_extension = extension(search_export.format, search_export.compress)
+    return file_download_response(
+        request, search_export.file_path, f'deces-{search_export.pk}.{file_extension}', EXPORT_CONTENT_TYPES[file_extension]
+    )
+
+def linkage_identities(request):
+    """Identités envoyées en JSON ({"identities": [...]}) ou dans un fichier CSV (champ file).
+
+    Au plus LINKAGE_MAX_IDENTITIES + 1 identités sont lues : la vue refuse
+    celles qui dépassent la limite sans lire tout le fichier.
+    """
+    limit = settings.LINKAGE_MAX_IDENTITIES + 1
+    if 'file' in request.FILES:
+        return list(islice(read_identities_csv(request.FILES['file']), limit))
+    payload = json.loads(request.body)
+    identities = payload.get('identities') if isinstance(payload, dict) else payload
+    if not isinstance(identities, list):
+        raise ValueError('liste d\'identités attendue')
+    identities = identities[:limit]
+    if not all(isinstance(identity, dict) for identity in identities):
+        raise ValueError('chaque identité doit être un objet')
+    return identities
+
+@require_http_methods(['POST'])
+@login_required
+def linkage(request):
+    """Rapproche une liste d'identités avec les décès et retourne un résultat noté par identité."""
+    try:
+        identities = linkage_identities(request)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': f'Données invalides : {str(e)}'}, status=400)
+    if len(identities) > settings.LINKAGE_MAX_IDENTITIES:
+        return JsonResponse({
+            'error': f'Plus de {settings.LINKAGE_MAX_IDENTITIES} identités : utilisez le rapprochement différé.'
+        }, status=400)
+    started = time.monotonic()
+    results = list(match_identities(identities))
+    elapsed = time.monotonic() - started
+    return JsonResponse({
+        'results': results,
+        'matched': sum(row['statut'] == 'trouve' for row in results),
+        'identities_per_second': round(len(results) / max(elapsed, 1e-6))
+    })
+
+@require_http_methods(['POST'])
+@login_required
+def linkage_async(request):
+    """Lance le rapprochement différé d'un fichier CSV d'identités (champ file)."""
+    if 'file' not in request.FILES:
+        return JsonResponse({'error': 'Fichier CSV manquant'}, status=400)
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    job = LinkageJob.objects.create(user=request.user, input_path='')
+    job.input_path = os.path.join(settings.EXPORT_DIR, f'linkage-{job.pk}.csv')
+    with open(job.input_path, 'wb') as f:
+        for chunk in request.FILES['file'].chunks():
+            f.write(chunk)
+    job.save(update_fields=['input_path'])
+    run_linkage.delay(job.pk)
+    return JsonResponse({
+        'success': True,
+        'id': job.pk,
+        'status_url': reverse('deces:linkage_status', args=[job.pk]),
+        'message': 'Rapprochement lancé.'
+    })
+
+def get_linkage_job(request, job_id):
+    job = get_object_or_404(LinkageJob, pk=job_id)
+    if job.user_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return job
+
+@require_http_methods(['GET'])
+@login_required
+def linkage_status(request, job_id):
+    job = get_linkage_job(request, job_id)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'identities_processed': job.identities_processed,
+        'identities_matched': job.identities_matched,
+        'identities_per_second': job.identities_per_second,
+        'error_message': job.error_message,
+        'download_url': reverse('deces:linkage_download', args=[job.pk]) if job.status == 'completed' else None
+    })
+
+@require_http_methods(['GET'])
+@login_required
+def linkage_download(request, job_id):
+    job = get_linkage_job(request, job_id)
+    if job.status != 'completed' or not os.path.exists(job.output_path):
+        raise Http404
+    return file_download_response(request, job.output_path, f'rapprochement-{job.pk}.csv', 'text/csv; charset=utf-8')
+
 class ImportErrorListView(LoginRequiredMixin, ListView):
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_superuser:
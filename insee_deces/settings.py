@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -64,7 +66,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'deces.middleware.StaticFilesMiddleware',  # WhiteNoise, compatible ASGI
+    'deces.instrumentation.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -102,18 +105,36 @@ else:
     SECURE_HSTS_PRELOAD = False
 
 # Cache settings
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': 'redis://redis:6379/1',
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Instrumentation des requêtes HTTP et des étapes de l'import (deces.metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_REDIS_URL = os.getenv('METRICS_REDIS_URL', REDIS_URL)
+# Nombre de mesures conservées par vue et par étape (fenêtre glissante des quantiles)
+METRICS_BUFFER_SIZE = int(os.getenv('METRICS_BUFFER_SIZE', '1000'))
+# Budget de requêtes SQL par requête HTTP au-delà duquel les requêtes sont journalisées
+# (0 : désactivé), et budgets par vue sous la forme "deces:search=10,deces:import_status=2"
+METRICS_QUERY_BUDGET = int(os.getenv('METRICS_QUERY_BUDGET', '0'))
+METRICS_QUERY_BUDGETS = {
+    view: int(budget)
+    for view, budget in (item.split('=') for item in os.getenv('METRICS_QUERY_BUDGETS', '').split(',') if item)
+}
+# Jeton (en-tête Authorization: Bearer) permettant à un collecteur Prometheus de lire les mesures sans compte staff
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 ROOT_URLCONF = 'insee_deces.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Moteur Django standard, avec mesure du temps de rendu (deces.instrumentation)
+        'BACKEND': 'deces.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -165,12 +186,25 @@ WSGI_APPLICATION = 'insee_deces.wsgi.application'
 
 import dj_database_url
 
+# Connexions persistantes : à désactiver (0) pour le serveur ASGI, où chaque requête
+# s'exécute dans son propre thread ; DATABASE_POOL active le pool de connexions
+# de psycopg sur PostgreSQL (sur MariaDB, utiliser un proxy comme MaxScale ou ProxySQL)
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'False').lower() == 'true'
+
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
-        conn_max_age=600
+        conn_max_age=DATABASE_CONN_MAX_AGE
     )
 }
+if DATABASE_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = True
+
+# Autoriser LOAD DATA LOCAL INFILE pour le moteur d'import natif sur MariaDB
+if DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    DATABASES['default'].setdefault('OPTIONS', {})['local_infile'] = 1
 
 
 # Password validation
@@ -206,6 +240,48 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Découpage de p_future avant chaque nouvelle année
+    'maintain-partitions': {
+        'task': 'deces.tasks.maintain_partitions',
+        'schedule': crontab(minute=0, hour=3, day_of_month=1),
+    },
+}
+
+# Répertoire de travail des imports (ZIP téléchargés et CSV décompressés),
+# partagé entre les workers Celery
+IMPORT_WORK_DIR = os.getenv('IMPORT_WORK_DIR', os.path.join(tempfile.gettempdir(), 'insee_deces'))
+# Cache des ZIP téléchargés (par URL) et taille maximale en octets, au-delà de laquelle
+# les archives les moins récemment utilisées sont supprimées
+ZIP_CACHE_DIR = os.getenv('ZIP_CACHE_DIR', os.path.join(IMPORT_WORK_DIR, 'zip_cache'))
+ZIP_CACHE_MAX_SIZE = int(os.getenv('ZIP_CACHE_MAX_SIZE', str(5 * 1024 ** 3)))
+
+# Proportion de lignes rejetées tolérée par CSV avant l'arrêt de l'import
+IMPORT_ERROR_BUDGET_RATIO = float(os.getenv('IMPORT_ERROR_BUDGET_RATIO', '0.01'))
+# Mode compact : les erreurs ne conservent que la ligne brute et le code de la cause
+IMPORT_ERROR_COMPACT = os.getenv('IMPORT_ERROR_COMPACT', 'False').lower() == 'true'
+
+# Progression des imports publiée par les workers (Redis pub/sub) et diffusée en
+# Server-Sent Events : intervalle des messages de maintien et durée maximale d'un flux
+PROGRESS_REDIS_URL = os.getenv('PROGRESS_REDIS_URL', REDIS_URL)
+IMPORT_EVENTS_HEARTBEAT = float(os.getenv('IMPORT_EVENTS_HEARTBEAT', '15'))
+IMPORT_EVENTS_MAX_DURATION = float(os.getenv('IMPORT_EVENTS_MAX_DURATION', '300'))
+
+# Durée maximale (secondes) de chaque requête SQL des vues asynchrones : recherche,
+# et suivi des imports (0 : pas de limite)
+SEARCH_STATEMENT_TIMEOUT = float(os.getenv('SEARCH_STATEMENT_TIMEOUT', '10'))
+STATUS_STATEMENT_TIMEOUT = float(os.getenv('STATUS_STATEMENT_TIMEOUT', '2'))
+
+# Export des résultats de recherche : nombre maximal de lignes d'un export direct
+# (au-delà, passer par un export différé) et d'un export différé
+EXPORT_MAX_ROWS = int(os.getenv('EXPORT_MAX_ROWS', '100000'))
+EXPORT_ASYNC_MAX_ROWS = int(os.getenv('EXPORT_ASYNC_MAX_ROWS', '5000000'))
+# Nombre d'exports directs autorisés par minute et par adresse IP
+EXPORT_RATE_LIMIT = int(os.getenv('EXPORT_RATE_LIMIT', '5'))
+# Nombre maximal d'identités d'un rapprochement par lots synchrone (au-delà, rapprochement différé)
+LINKAGE_MAX_IDENTITIES = int(os.getenv('LINKAGE_MAX_IDENTITIES', '5000'))
+# Répertoire des fichiers d'export et de rapprochement différés, partagé entre les workers Celery et le serveur web
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'insee_deces_exports'))
 
 USE_I18N = True
 
@@ -246,8 +322,7 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
-# Whitenoise pour servir les fichiers statiques en production
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+# Whitenoise pour servir les fichiers statiques en production (deces.middleware.StaticFilesMiddleware)
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type